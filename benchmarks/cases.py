@@ -0,0 +1,404 @@
+"""Benchmark cases: one per public repository method and parameter variant.
+
+A case is a setup function `(context, param) -> call`; only `call()` is timed and
+it returns the number of documents it read or wrote.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pharmagob.mongodb_repositories._count import COUNT_POLICIES
+from pharmagob.mongodb_repositories._search_cache import SearchSessionCache
+from pharmagob.mongodb_repositories._utils import convert_conditions_to_mongo
+from pharmagob.mongodb_repositories.base import BaseMongoDbRepository
+from pharmagob.mongodb_repositories.item_logs import ItemLogRepository
+from pharmagob.mongodb_repositories.items import ItemsRepository
+from pharmagob.mongodb_repositories.location_contents import (
+    LocationContentRepository,
+)
+from pharmagob.mongodb_repositories.locations import LocationRepository
+from pharmagob.mongodb_repositories.shipment_details import ShipmentDetailRepository
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+from pharmagob.mongodb_repositories.stock_transfer_events import (
+    StockTransferEventsRepository,
+)
+
+from .datasets import Samples
+
+PAGE_LIMIT = 50
+PAGE_DEPTHS = (1, 10, 100)
+WRITE_BATCH = 1000
+SCRATCH_COLLECTION = "bench_writes"
+
+Call = Callable[[], int]
+
+
+class Context:
+    """Repositories bound to the seeded database, plus the sample ids."""
+
+    REPOSITORIES: Dict[str, Tuple[type, str]] = {
+        "items": (ItemsRepository, "items"),
+        "locations": (LocationRepository, "locations"),
+        "location_contents": (LocationContentRepository, "location_contents"),
+        "shipments": (ShipmentRepository, "shipments"),
+        "shipment_details": (ShipmentDetailRepository, "shipment_details"),
+        "stock_transfer_events": (
+            StockTransferEventsRepository,
+            "stock_transfer_events",
+        ),
+        "item_logs": (ItemLogRepository, "item_logs"),
+        "writes": (ItemLogRepository, SCRATCH_COLLECTION),
+    }
+
+    def __init__(self, db_manager: Any, samples: Samples, *, random_seed: int = 42):
+        self.db_manager = db_manager
+        self.samples = samples
+        self.rng = random.Random(random_seed)
+        self._repositories: Dict[str, BaseMongoDbRepository] = {}
+
+    def repository(self, name: str) -> Any:
+        if name not in self._repositories:
+            repository_class, collection_name = self.REPOSITORIES[name]
+            self._repositories[name] = repository_class(
+                self.db_manager, collection_name
+            )
+        return self._repositories[name]
+
+    def pick(self, values: Sequence[Any]) -> Any:
+        return self.rng.choice(values)
+
+
+@dataclass
+class Case:
+    name: str
+    setup: Callable[[Context, Any], Call]
+    params: Sequence[Any] = (None,)
+    search: bool = False  # needs Atlas Search indexes
+    database: bool = True
+
+
+def _consume(result: Tuple[Optional[int], Any]) -> int:
+    _, documents = result
+    return sum(1 for _ in documents)
+
+
+def _get(context: Context, _) -> Call:
+    repository = context.repository("location_contents")
+    ids = context.samples.location_content_ids
+    return lambda: int(repository.get(context.pick(ids)) is not None)
+
+
+def _get_many(context: Context, size: int) -> Call:
+    repository = context.repository("location_contents")
+    ids = context.samples.location_content_ids
+
+    def call() -> int:
+        documents = repository.get_many(context.rng.sample(ids, min(size, len(ids))))
+        return sum(document is not None for document in documents)
+
+    return call
+
+
+def _get_paginated(context: Context, page: int) -> Call:
+    repository = context.repository("location_contents")
+    umu_ids = context.samples.umu_ids
+    return lambda: _consume(
+        repository.get_paginated(
+            page,
+            PAGE_LIMIT,
+            umu_id=context.pick(umu_ids),
+            sort=[("expiration_date", repository.ASCENDING_ORDER)],
+        )
+    )
+
+
+def _get_paginated_count(context: Context, count_policy: str) -> Call:
+    repository = context.repository("location_contents")
+    umu_ids = context.samples.umu_ids
+    return lambda: _consume(
+        repository.get_paginated(
+            1,
+            PAGE_LIMIT,
+            umu_id=context.pick(umu_ids),
+            and_conditions=[("quantity", ">", 10)],
+            count_policy=count_policy,
+        )
+    )
+
+
+def _get_paginated_by_cursor(context: Context, page: int) -> Call:
+    repository = context.repository("location_contents")
+    sort = [("expiration_date", repository.ASCENDING_ORDER)]
+    cursor = None
+    for _ in range(page - 1):  # walk once to the token of the requested page
+        cursor, _documents = repository.get_paginated_by_cursor(
+            PAGE_LIMIT, cursor=cursor, sort=sort
+        )
+        if cursor is None:
+            break
+
+    def call() -> int:
+        _next, documents = repository.get_paginated_by_cursor(
+            PAGE_LIMIT, cursor=cursor, sort=sort
+        )
+        return len(documents)
+
+    return call
+
+
+def _iter_all(context: Context, _) -> Call:
+    repository = context.repository("location_contents")
+    umu_ids = context.samples.umu_ids
+    return lambda: sum(1 for _ in repository.iter_all(umu_id=context.pick(umu_ids)))
+
+
+def _find_by_logic_triad(context: Context, _) -> Call:
+    repository = context.repository("location_contents")
+    triads = context.samples.triads
+    return lambda: int(
+        repository.find_by_logic_triad(*context.pick(triads)) is not None
+    )
+
+
+def _get_by_foreign_id(context: Context, _) -> Call:
+    repository = context.repository("items")
+    foreign_ids = context.samples.foreign_ids
+    return lambda: _consume(repository.get_by_foreign_id(context.pick(foreign_ids)))
+
+
+def _get_by_umu_id(context: Context, _) -> Call:
+    repository = context.repository("locations")
+    umu_ids = context.samples.umu_ids
+    return lambda: _consume(
+        repository.get_by_umu_id(context.pick(umu_ids), limit=PAGE_LIMIT)
+    )
+
+
+def _get_review_status(context: Context, _) -> Call:
+    repository = context.repository("shipments")
+    shipment_ids = context.samples.shipment_ids
+    return lambda: int(
+        repository.get_review_status(context.pick(shipment_ids)) is not None
+    )
+
+
+def _get_with_details(context: Context, _) -> Call:
+    repository = context.repository("shipments")
+    shipment_ids = context.samples.shipment_ids
+    return lambda: int(
+        repository.get_with_details(context.pick(shipment_ids)) is not None
+    )
+
+
+def _get_by_shipment_id(context: Context, _) -> Call:
+    repository = context.repository("shipment_details")
+    shipment_ids = context.samples.shipment_ids
+    return lambda: _consume(repository.get_by_shipment_id(context.pick(shipment_ids)))
+
+
+def _get_by_stock_transfer_id(context: Context, _) -> Call:
+    repository = context.repository("stock_transfer_events")
+    transfer_ids = context.samples.stock_transfer_ids
+    return lambda: _consume(
+        repository.get_by_stock_transfer_id(context.pick(transfer_ids))
+    )
+
+
+def _get_latest_by_stock_transfer_ids(context: Context, size: int) -> Call:
+    repository = context.repository("stock_transfer_events")
+    transfer_ids = context.samples.stock_transfer_ids
+
+    def call() -> int:
+        events = repository.get_latest_by_stock_transfer_ids(
+            context.rng.sample(transfer_ids, min(size, len(transfer_ids)))
+        )
+        return sum(event is not None for event in events)
+
+    return call
+
+
+def _logs_get_paginated(context: Context, page: int) -> Call:
+    repository = context.repository("item_logs")
+    umu_ids = context.samples.umu_ids
+    return lambda: _consume(
+        repository.get_paginated(
+            page,
+            PAGE_LIMIT,
+            umu_id=context.pick(umu_ids),
+            sort=[("created_at", repository.DESCENDING_ORDER)],
+        )
+    )
+
+
+def _create_many(context: Context, _) -> Call:
+    repository = context.repository("writes")
+
+    def call() -> int:
+        documents = [
+            {"item_id": f"item-{number}", "action": "created", "created_at": number}
+            for number in range(WRITE_BATCH)
+        ]
+        return repository.create_many(documents, ordered=False).inserted_count
+
+    return call
+
+
+def _set_many(context: Context, _) -> Call:
+    repository = context.repository("writes")
+
+    def call() -> int:
+        documents = [
+            (f"bench-{number}", {"action": "updated", "updated_at": number})
+            for number in range(WRITE_BATCH)
+        ]
+        summary = repository.set_many(documents, ordered=False)
+        return summary.matched_count + summary.upserted_count
+
+    return call
+
+
+def _log(context: Context, _) -> Call:
+    repository = context.repository("writes")
+
+    def call() -> int:
+        for number in range(WRITE_BATCH):
+            repository.log({"item_id": f"item-{number}", "action": "logged"})
+        return repository.flush().inserted_count
+
+    return call
+
+
+CONDITIONS: List[Tuple[str, str, Any]] = [
+    ("umu_id", "=", "umu-0001"),
+    ("quantity", ">", 0),
+    ("quantity", "<=", 100),
+    ("expiration_date", ">=", 1704067200000),
+    ("lot", "in", ["LOT0001", "LOT0002", "LOT0003"]),
+    ("location.id", "not in", ["location-000001"]),
+]
+
+
+def _convert_conditions(_context: Context, _) -> Call:
+    def call() -> int:
+        convert_conditions_to_mongo(CONDITIONS)
+        return 0
+
+    return call
+
+
+def _search_by_item(context: Context, page: int) -> Call:
+    repository = context.repository("location_contents")
+    item_ids = context.samples.item_ids
+    umu_ids = context.samples.umu_ids
+    return lambda: len(
+        repository.search_by_item(
+            context.pick(item_ids)[:8],
+            page=page,
+            limit=PAGE_LIMIT,
+            umu_id=context.pick(umu_ids),
+        )[1]
+    )
+
+
+def _search_by_item_global(context: Context, page: int) -> Call:
+    repository = context.repository("location_contents")
+    item_ids = context.samples.item_ids
+    return lambda: len(
+        repository.search_by_item_global(
+            context.pick(item_ids)[:8], page=page, limit=PAGE_LIMIT
+        )[1]
+    )
+
+
+def _search_by_order_number(context: Context, page: int) -> Call:
+    repository = context.repository("shipments")
+    order_numbers = context.samples.order_numbers
+    return lambda: len(
+        repository.search_by_order_number(
+            context.pick(order_numbers)[:7], page=page, limit=PAGE_LIMIT
+        )[1]
+    )
+
+
+def _search_by_order_number_typeahead(context: Context, cached: bool) -> Call:
+    """One order number typed a character at a time, a search per keystroke."""
+    search_cache = SearchSessionCache() if cached else None
+    repository = ShipmentRepository(
+        context.db_manager, "shipments", search_cache=search_cache
+    )
+    order_numbers = context.samples.order_numbers
+
+    def call() -> int:
+        if search_cache is not None:
+            search_cache.clear()  # a new session each time
+        order_number = context.pick(order_numbers)
+        return sum(
+            len(
+                repository.search_by_order_number(
+                    order_number[:length], limit=PAGE_LIMIT, exact=False
+                )[1]
+            )
+            for length in range(3, len(order_number) + 1)
+        )
+
+    return call
+
+
+CASES: List[Case] = [
+    Case("location_contents.get", _get),
+    Case("location_contents.get_many", _get_many, params=(10, 100, 1000)),
+    Case("location_contents.get_paginated", _get_paginated, params=PAGE_DEPTHS),
+    Case(
+        "location_contents.get_paginated.count",
+        _get_paginated_count,
+        params=COUNT_POLICIES,
+    ),
+    Case(
+        "location_contents.get_paginated_by_cursor",
+        _get_paginated_by_cursor,
+        params=PAGE_DEPTHS,
+    ),
+    Case("location_contents.iter_all", _iter_all),
+    Case("location_contents.find_by_logic_triad", _find_by_logic_triad),
+    Case("items.get_by_foreign_id", _get_by_foreign_id),
+    Case("locations.get_by_umu_id", _get_by_umu_id),
+    Case("shipments.get_review_status", _get_review_status),
+    Case("shipments.get_with_details", _get_with_details),
+    Case("shipment_details.get_by_shipment_id", _get_by_shipment_id),
+    Case("stock_transfer_events.get_by_stock_transfer_id", _get_by_stock_transfer_id),
+    Case(
+        "stock_transfer_events.get_latest_by_stock_transfer_ids",
+        _get_latest_by_stock_transfer_ids,
+        params=(10, 100, 1000),
+    ),
+    Case("item_logs.get_paginated", _logs_get_paginated, params=PAGE_DEPTHS),
+    Case("writes.create_many", _create_many),
+    Case("writes.set_many", _set_many),
+    Case("writes.log", _log),
+    Case("convert_conditions_to_mongo", _convert_conditions, database=False),
+    Case(
+        "location_contents.search_by_item",
+        _search_by_item,
+        params=PAGE_DEPTHS,
+        search=True,
+    ),
+    Case(
+        "location_contents.search_by_item_global",
+        _search_by_item_global,
+        params=PAGE_DEPTHS,
+        search=True,
+    ),
+    Case(
+        "shipments.search_by_order_number",
+        _search_by_order_number,
+        params=PAGE_DEPTHS,
+        search=True,
+    ),
+    Case(
+        "shipments.search_by_order_number.typeahead",
+        _search_by_order_number_typeahead,
+        params=(False, True),
+        search=True,
+    ),
+]
@@ -0,0 +1,234 @@
+"""Deterministic synthetic datasets shaped like the production collections.
+
+Every collection is sized relatively to `size`, the number of
+`location_contents` documents, so one knob scales the whole database.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+INSERT_BATCH_SIZE = 10000
+MAX_SAMPLES = 1000
+
+DAY_MS = 86400 * 1000
+EPOCH_MS = 1704067200000  # 2024-01-01
+REVIEW_STATUSES = ("pending", "approved", "rejected")
+TRANSFER_STATUSES = ("created", "dispatched", "received", "cancelled")
+LOG_ACTIONS = ("created", "updated", "moved", "adjusted")
+
+
+@dataclass
+class Samples:
+    """Ids known to exist, used by the cases to build realistic parameters."""
+
+    umu_ids: List[str] = field(default_factory=list)
+    item_ids: List[str] = field(default_factory=list)
+    foreign_ids: List[str] = field(default_factory=list)
+    location_ids: List[str] = field(default_factory=list)
+    label_codes: List[str] = field(default_factory=list)
+    location_content_ids: List[str] = field(default_factory=list)
+    triads: List[Tuple[str, str, str]] = field(default_factory=list)
+    shipment_ids: List[str] = field(default_factory=list)
+    order_numbers: List[str] = field(default_factory=list)
+    stock_transfer_ids: List[str] = field(default_factory=list)
+
+
+def _umu_id(number: int) -> str:
+    return f"umu-{number:04d}"
+
+
+def _item_id(number: int) -> str:
+    return f"item-{number:06d}"
+
+
+def _location_id(number: int) -> str:
+    return f"location-{number:06d}"
+
+
+def location_contents(size: int, rng: random.Random) -> Iterator[dict]:
+    umus = max(size // 2000, 5)
+    items = max(size // 100, 10)
+    locations = max(size // 50, 10)
+    for number in range(size):
+        item = rng.randrange(items)
+        location = rng.randrange(locations)
+        created_at = EPOCH_MS + rng.randrange(365) * DAY_MS
+        yield {
+            "_id": f"lc-{number:08d}",
+            "umu_id": _umu_id(location % umus),
+            "item": {
+                "id": _item_id(item),
+                "short_description": f"Item {item} {rng.choice('ABCDEFGH')}",
+            },
+            "lot": f"LOT{rng.randrange(1000):04d}",
+            "location": {
+                "id": _location_id(location),
+                "label_code": f"L-{location:06d}",
+            },
+            "quantity": rng.randrange(0, 500),
+            "expiration_date": created_at + rng.randrange(30, 720) * DAY_MS,
+            "created_at": created_at,
+            "updated_at": created_at + rng.randrange(30) * DAY_MS,
+        }
+
+
+def items(size: int, rng: random.Random) -> Iterator[dict]:
+    umus = max(size // 2000, 5)
+    for number in range(max(size // 100, 10)):
+        yield {
+            "_id": _item_id(number),
+            "foreign_id": f"F{number:07d}",
+            "umu_id": _umu_id(rng.randrange(umus)),
+            "name": f"Item {number}",
+            "created_at": EPOCH_MS + rng.randrange(365) * DAY_MS,
+        }
+
+
+def locations(size: int, rng: random.Random) -> Iterator[dict]:
+    umus = max(size // 2000, 5)
+    for number in range(max(size // 50, 10)):
+        yield {
+            "_id": _location_id(number),
+            "umu_id": _umu_id(number % umus),
+            "label_code": f"L-{number:06d}",
+            "kind": rng.choice(("shelf", "fridge", "floor")),
+        }
+
+
+def shipments(size: int, rng: random.Random) -> Iterator[dict]:
+    umus = max(size // 2000, 5)
+    for number in range(max(size // 10, 10)):
+        yield {
+            "_id": f"shipment-{number:07d}",
+            "order_number": f"ORD{number:08d}",
+            "umu_id": _umu_id(rng.randrange(umus)),
+            "review_status": rng.choice(REVIEW_STATUSES),
+            "created_at": EPOCH_MS + rng.randrange(365) * DAY_MS,
+        }
+
+
+def shipment_details(size: int, rng: random.Random) -> Iterator[dict]:
+    shipment_count = max(size // 10, 10)
+    items_count = max(size // 100, 10)
+    for number in range(max(size // 2, 10)):
+        yield {
+            "_id": f"shipment-detail-{number:08d}",
+            "shipment": {"id": f"shipment-{rng.randrange(shipment_count):07d}"},
+            "item": {"id": _item_id(rng.randrange(items_count))},
+            "quantity": rng.randrange(1, 200),
+        }
+
+
+def stock_transfer_events(size: int, rng: random.Random) -> Iterator[dict]:
+    transfers = max(size // 20, 10)
+    for number in range(max(size // 5, 10)):
+        yield {
+            "_id": f"ste-{number:08d}",
+            "stock_transfer_id": f"transfer-{rng.randrange(transfers):07d}",
+            "umu_id": _umu_id(rng.randrange(max(size // 2000, 5))),
+            "status": rng.choice(TRANSFER_STATUSES),
+            "transition_timestamp": EPOCH_MS + rng.randrange(365 * 24) * 3600000,
+        }
+
+
+def logs(size: int, rng: random.Random) -> Iterator[dict]:
+    items_count = max(size // 100, 10)
+    for number in range(size):
+        yield {
+            "_id": f"log-{number:09d}",
+            "item_id": _item_id(rng.randrange(items_count)),
+            "umu_id": _umu_id(rng.randrange(max(size // 2000, 5))),
+            "action": rng.choice(LOG_ACTIONS),
+            "created_at": EPOCH_MS + rng.randrange(365 * 24 * 60) * 60000,
+        }
+
+
+Generator = Callable[[int, random.Random], Iterator[dict]]
+
+COLLECTIONS: Dict[str, Generator] = {
+    "location_contents": location_contents,
+    "items": items,
+    "locations": locations,
+    "shipments": shipments,
+    "shipment_details": shipment_details,
+    "stock_transfer_events": stock_transfer_events,
+    "item_logs": logs,
+}
+
+INDEXES: Dict[str, List[List[Tuple[str, int]]]] = {
+    "location_contents": [
+        [("umu_id", 1)],
+        [("item.id", 1), ("lot", 1), ("location.id", 1)],
+        [("expiration_date", 1), ("_id", 1)],
+    ],
+    "items": [[("foreign_id", 1), ("umu_id", 1)]],
+    "locations": [[("umu_id", 1), ("label_code", 1)]],
+    "shipments": [[("umu_id", 1), ("created_at", -1)]],
+    "shipment_details": [[("shipment.id", 1)]],
+    "stock_transfer_events": [[("stock_transfer_id", 1), ("transition_timestamp", -1)]],
+    "item_logs": [[("umu_id", 1), ("created_at", -1)]],
+}
+
+
+def _collect(samples: Samples, name: str, document: dict) -> None:
+    if name == "location_contents":
+        samples.location_content_ids.append(document["_id"])
+        samples.umu_ids.append(document["umu_id"])
+        samples.item_ids.append(document["item"]["id"])
+        samples.triads.append(
+            (document["item"]["id"], document["lot"], document["location"]["id"])
+        )
+    elif name == "items":
+        samples.foreign_ids.append(document["foreign_id"])
+    elif name == "locations":
+        samples.location_ids.append(document["_id"])
+        samples.label_codes.append(document["label_code"])
+    elif name == "shipments":
+        samples.shipment_ids.append(document["_id"])
+        samples.order_numbers.append(document["order_number"])
+    elif name == "stock_transfer_events":
+        samples.stock_transfer_ids.append(document["stock_transfer_id"])
+
+
+def _batches(documents: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed(
+    database: Any, size: int, *, random_seed: int = 42, drop: bool = True
+) -> Samples:
+    """Fill `database` with every synthetic collection and return sample ids.
+
+    Parameters:
+        database: A pymongo (or mongomock) database.
+        size: Number of `location_contents` documents; the other collections
+            are derived from it.
+        drop: Drop the collections first, so a run always starts from the same
+            data.
+    """
+    samples = Samples()
+    for name, generator in COLLECTIONS.items():
+        rng = random.Random(f"{random_seed}-{name}")
+        collection = database[name]
+        kept = 0
+        if drop:
+            collection.drop()
+        sampler = random.Random(f"{random_seed}-{name}-samples")
+        for batch in _batches(generator(size, rng), INSERT_BATCH_SIZE):
+            collection.insert_many(batch, ordered=False)
+            for document in batch:
+                # keep ~1% of the documents (at least the first ones) as parameters
+                if kept < MAX_SAMPLES and (kept < 5 or sampler.random() < 0.01):
+                    _collect(samples, name, document)
+                    kept += 1
+        for keys in INDEXES.get(name, []):
+            collection.create_index(keys)
+    return samples
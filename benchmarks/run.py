@@ -0,0 +1,185 @@
+"""Offline benchmarks of the repository methods.
+
+Seeds synthetic data into a local mongod (or mongomock), times every case at
+each data size and compares the results with a baseline.
+
+Usage:
+    python -m benchmarks --uri mongodb://localhost:27017 --sizes 10000,1000000
+    python -m benchmarks --mongomock --sizes 1000 --iterations 20
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --tolerance 0.25
+
+The `search_by_*` cases need Atlas Search indexes (Atlas, or a local Atlas
+deployment) and only run with `--atlas-search`. The process exits with status 1
+when a case regresses beyond the tolerance, so it can gate a CI job.
+"""
+
+import argparse
+import fnmatch
+import json
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from .cases import CASES, SCRATCH_COLLECTION, Case, Context
+from .datasets import seed
+
+DEFAULT_DATABASE = "pharmagob_benchmarks"
+
+
+class LocalMongoDbManager:
+    """Minimal stand-in for `infra.mongodb.MongoDbManager` over one database."""
+
+    def __init__(self, database: Any):
+        self.database = database
+
+    def get_collection(self, collection_name: str) -> Any:
+        return self.database[collection_name]
+
+
+def connect(uri: Optional[str], *, mongomock: bool) -> Any:
+    if mongomock:
+        try:
+            import mongomock as mongomock_module
+        except ImportError:
+            raise SystemExit("--mongomock needs `pip install mongomock`")
+        return mongomock_module.MongoClient()
+    from pymongo import MongoClient
+
+    return MongoClient(uri or "mongodb://localhost:27017")
+
+
+def measure(call, *, iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        call()
+    timings: List[float] = []
+    documents = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        documents += call()
+        timings.append((time.perf_counter() - started) * 1000)
+    total_seconds = sum(timings) / 1000
+    p99 = statistics.quantiles(timings, n=100)[98] if len(timings) > 1 else timings[0]
+    return {
+        "iterations": iterations,
+        "p50_ms": round(statistics.median(timings), 4),
+        "p99_ms": round(p99, 4),
+        "ops_per_sec": round(iterations / total_seconds, 2) if total_seconds else 0.0,
+        "docs_per_call": round(documents / iterations, 2),
+    }
+
+
+def result_key(case: Case, param: Any, size: int) -> str:
+    label = case.name if param is None else f"{case.name}[{param}]"
+    return f"{label}@{size}" if case.database else label
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    *,
+    tolerance: float,
+    noise_ms: float,
+) -> List[str]:
+    """Return one line per case slower than its baseline beyond `tolerance`.
+
+    Differences under `noise_ms` are ignored, so sub-millisecond cases do not
+    flap on timer jitter.
+    """
+    regressions = []
+    for key, current in sorted(results.items()):
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            limit = previous[metric] * (1 + tolerance)
+            if (
+                current[metric] > limit
+                and current[metric] - previous[metric] > noise_ms
+            ):
+                regressions.append(
+                    f"{key}: {metric} {previous[metric]:.3f} -> {current[metric]:.3f}"
+                )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--uri", help="mongod URI, default mongodb://localhost:27017")
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--database", default=DEFAULT_DATABASE)
+    parser.add_argument(
+        "--sizes",
+        default="10000,100000",
+        help="comma separated location_contents sizes; other collections scale",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", action="append", help="glob on case names")
+    parser.add_argument("--atlas-search", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--save-baseline", help="write the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--noise-ms", type=float, default=0.5)
+    return parser.parse_args(argv)
+
+
+def selected(case: Case, args: argparse.Namespace) -> bool:
+    if case.search and not args.atlas_search:
+        return False
+    if args.only:
+        return any(fnmatch.fnmatch(case.name, pattern) for pattern in args.only)
+    return True
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    client = connect(args.uri, mongomock=args.mongomock)
+    database = client[args.database]
+    manager = LocalMongoDbManager(database)
+    cases = [case for case in CASES if selected(case, args)]
+    results: Dict[str, Dict[str, float]] = {}
+    for size in [int(size) for size in args.sizes.split(",") if size]:
+        print(f"# size={size}", file=sys.stderr)
+        samples = seed(database, size, random_seed=args.seed)
+        context = Context(manager, samples, random_seed=args.seed)
+        for case in cases:
+            for param in case.params:
+                key = result_key(case, param, size)
+                if key in results:  # database-less cases run once
+                    continue
+                database[SCRATCH_COLLECTION].drop()
+                call = case.setup(context, param)
+                results[key] = measure(
+                    call, iterations=args.iterations, warmup=args.warmup
+                )
+                print(
+                    f"{key:<70} p50={results[key]['p50_ms']:>9.3f}ms "
+                    f"p99={results[key]['p99_ms']:>9.3f}ms "
+                    f"ops/s={results[key]['ops_per_sec']:>10.2f}",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf8") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(
+        results, baseline, tolerance=args.tolerance, noise_ms=args.noise_ms
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,233 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from ._stock import (
+    AVAILABLE_QUANTITY,
+    EVENT_ALLOCATION_CONSUMED,
+    RESERVED_FIELD,
+    available_guard,
+    quantity_log,
+    stock_event,
+)
+
+# items allocated per aggregation, keeps the `$in` and the `$switch` small
+ALLOCATION_BATCH_SIZE = 100
+
+
+@dataclass(frozen=True)
+class LotAllocation:
+    """Quantity taken from one location content (one lot at one location)."""
+
+    location_content_id: Any
+    item_id: str
+    lot: str
+    location_id: str
+    expiration_date: Any
+    quantity: int
+
+
+@dataclass
+class AllocationPlan:
+    """The lots picked for each requested item, first expired first out.
+
+    `shortages` maps the items that could not be fully allocated to the missing
+    quantity; `reserved` tells whether the allocations were set aside.
+    """
+
+    allocations: List[LotAllocation] = field(default_factory=list)
+    shortages: Dict[str, int] = field(default_factory=dict)
+    reserved: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.shortages
+
+    def by_item(self) -> Dict[str, List[LotAllocation]]:
+        grouped: Dict[str, List[LotAllocation]] = {}
+        for allocation in self.allocations:
+            grouped.setdefault(allocation.item_id, []).append(allocation)
+        return grouped
+
+
+def requested_quantities(lines: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """Sum the `(item_id, quantity)` lines per item, keeping their first order."""
+    requested: Dict[str, int] = {}
+    for item_id, quantity in lines:
+        if quantity <= 0:
+            raise ValueError(f"An allocation line needs a positive quantity: {item_id}")
+        requested[item_id] = requested.get(item_id, 0) + quantity
+    return requested
+
+
+def allocation_pipeline(
+    umu_id: str, requested: Dict[str, int], *, expires_after: Optional[int]
+) -> List[dict]:
+    """Pick the lots of `requested` in one pass, soonest expiration first.
+
+    `$setWindowFields` keeps a running total of the available quantity per item;
+    a lot is needed while the total of the lots before it is below the request,
+    and gives the smaller of its quantity and what is still missing.
+    """
+    match: dict = {
+        "umu_id": umu_id,
+        "item.id": {"$in": list(requested)},
+        "quantity": {"$gt": 0},
+    }
+    if expires_after is not None:
+        match["expiration_date"] = {"$gt": expires_after}
+    requested_expression = {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": ["$item.id", {"$literal": item_id}]}, "then": quantity}
+                for item_id, quantity in requested.items()
+            ],
+            "default": 0,
+        }
+    }
+    before = {"$subtract": ["$cumulative", "$available"]}
+    return [
+        {"$match": match},
+        {"$addFields": {"available": AVAILABLE_QUANTITY}},
+        {"$match": {"available": {"$gt": 0}}},
+        {
+            "$setWindowFields": {
+                "partitionBy": "$item.id",
+                "sortBy": {"expiration_date": 1, "lot": 1, "_id": 1},
+                "output": {
+                    "cumulative": {
+                        "$sum": "$available",
+                        "window": {"documents": ["unbounded", "current"]},
+                    }
+                },
+            }
+        },
+        {"$addFields": {"requested": requested_expression}},
+        {"$match": {"$expr": {"$lt": [before, "$requested"]}}},
+        {
+            "$project": {
+                "item_id": "$item.id",
+                "lot": 1,
+                "location_id": "$location.id",
+                "expiration_date": 1,
+                "take": {"$min": ["$available", {"$subtract": ["$requested", before]}]},
+            }
+        },
+        {"$sort": {"item_id": 1, "expiration_date": 1, "lot": 1, "_id": 1}},
+    ]
+
+
+def build_plan(requested: Dict[str, int], rows: Iterable[dict]) -> AllocationPlan:
+    """Turn the rows of `allocation_pipeline` into a plan, in request order."""
+    by_item: Dict[str, List[LotAllocation]] = {item_id: [] for item_id in requested}
+    for row in rows:
+        by_item[row["item_id"]].append(
+            LotAllocation(
+                location_content_id=row["_id"],
+                item_id=row["item_id"],
+                lot=row["lot"],
+                location_id=row["location_id"],
+                expiration_date=row.get("expiration_date"),
+                quantity=row["take"],
+            )
+        )
+    plan = AllocationPlan()
+    for item_id, quantity in requested.items():
+        allocations = by_item[item_id]
+        plan.allocations.extend(allocations)
+        missing = quantity - sum(allocation.quantity for allocation in allocations)
+        if missing > 0:
+            plan.shortages[item_id] = missing
+    return plan
+
+
+def reservation_operations(
+    allocations: Iterable[LotAllocation], now: int, *, release: bool = False
+) -> List[UpdateOne]:
+    """Guarded `$inc` of `RESERVED_FIELD`, one per allocation.
+
+    Reserving needs the quantity to still be available and releasing needs it
+    to still be reserved, so neither can take `reserved` out of range.
+    """
+    operations = []
+    for allocation in allocations:
+        if release:
+            guard = {RESERVED_FIELD: {"$gte": allocation.quantity}}
+            delta = -allocation.quantity
+        else:
+            guard = available_guard(allocation.quantity)
+            delta = allocation.quantity
+        operations.append(
+            UpdateOne(
+                {"_id": allocation.location_content_id, **guard},
+                {"$inc": {RESERVED_FIELD: delta}, "$set": {"updated_at": now}},
+            )
+        )
+    return operations
+
+
+def consumption_operations(
+    allocations: Iterable[LotAllocation], now: int
+) -> List[UpdateOne]:
+    """Take each allocation out of `quantity` and `RESERVED_FIELD` together.
+
+    The guard needs the quantity to still be reserved, so a released or
+    already consumed plan matches nothing.
+    """
+    return [
+        UpdateOne(
+            {
+                "_id": allocation.location_content_id,
+                RESERVED_FIELD: {"$gte": allocation.quantity},
+                "quantity": {"$gte": allocation.quantity},
+            },
+            {
+                "$inc": {
+                    "quantity": -allocation.quantity,
+                    RESERVED_FIELD: -allocation.quantity,
+                },
+                "$set": {"updated_at": now},
+            },
+        )
+        for allocation in allocations
+    ]
+
+
+def consumption_records(
+    allocations: Iterable[LotAllocation],
+    *,
+    now: int,
+    reason: Optional[str],
+    reference: Optional[str],
+) -> Tuple[List[dict], List[dict]]:
+    """One quantity log and one event per consumed allocation."""
+    logs, events = [], []
+    for allocation in allocations:
+        logs.append(
+            quantity_log(
+                allocation.item_id,
+                allocation.lot,
+                allocation.location_id,
+                -allocation.quantity,
+                now=now,
+                reason=reason,
+                reference=reference,
+            )
+        )
+        events.append(
+            stock_event(
+                EVENT_ALLOCATION_CONSUMED,
+                now=now,
+                data={
+                    "location_content_id": allocation.location_content_id,
+                    "item_id": allocation.item_id,
+                    "lot": allocation.lot,
+                    "location_id": allocation.location_id,
+                    "quantity": allocation.quantity,
+                    "reason": reason,
+                    "reference": reference,
+                },
+            )
+        )
+    return logs, events
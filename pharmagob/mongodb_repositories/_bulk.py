@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Tuple
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.results import BulkWriteResult
+
+if TYPE_CHECKING:
+    from ._core import MongoDbRepositoryCore
+
+
+@dataclass
+class BulkWriteSummary:
+    """Aggregated outcome of a bulk write split in several batches.
+
+    `errors` holds one entry per failed operation with its position in the whole
+    operation sequence (`index`), the server error `code` and `errmsg`.
+    """
+
+    inserted_count: int = 0
+    matched_count: int = 0
+    modified_count: int = 0
+    upserted_count: int = 0
+    deleted_count: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def add_result(self, result: BulkWriteResult) -> None:
+        self.inserted_count += result.inserted_count
+        self.matched_count += result.matched_count
+        self.modified_count += result.modified_count
+        self.upserted_count += result.upserted_count
+        self.deleted_count += result.deleted_count
+
+    def add_details(self, details: dict, *, offset: int) -> None:
+        """Merge the `details` of a `BulkWriteError` raised by one batch."""
+        self.inserted_count += details.get("nInserted", 0)
+        self.matched_count += details.get("nMatched", 0)
+        self.modified_count += details.get("nModified", 0)
+        self.upserted_count += details.get("nUpserted", 0)
+        self.deleted_count += details.get("nRemoved", 0)
+        for error in details.get("writeErrors", []):
+            self.errors.append(
+                {
+                    "index": offset + error.get("index", 0),
+                    "code": error.get("code"),
+                    "errmsg": error.get("errmsg"),
+                    "op": error.get("op"),
+                }
+            )
+        for error in details.get("writeConcernErrors", []):
+            self.errors.append(
+                {
+                    "index": None,
+                    "code": error.get("code"),
+                    "errmsg": error.get("errmsg"),
+                    "op": None,
+                }
+            )
+
+
+def iter_batches(operations: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0")
+    iterator = iter(operations)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_operations(documents: Iterable[dict]) -> Iterator[InsertOne]:
+    return (InsertOne(data) for data in documents)
+
+
+def update_operations(updates: Iterable[Tuple[Any, dict]]) -> Iterator[UpdateOne]:
+    return (
+        UpdateOne({"_id": document_id}, {"$set": data}, upsert=False)
+        for document_id, data in updates
+    )
+
+
+def set_operations(
+    documents: Iterable[Tuple[Any, dict]], *, write_only_if_insert: bool = False
+) -> Iterator[UpdateOne]:
+    operator = "$setOnInsert" if write_only_if_insert else "$set"
+    return (
+        UpdateOne({"_id": document_id}, {operator: data}, upsert=True)
+        for document_id, data in documents
+    )
+
+
+class BulkOperationBuilder:
+    """Collect write operations for one repository and send them in batches.
+
+    Example:
+        bulk = repository.bulk(ordered=False)
+        bulk.insert(log_entry)
+        bulk.set(item_id, data={"disable": True})
+        summary = bulk.execute()
+
+    With an async repository `execute` returns the coroutine of its `bulk_write`.
+    """
+
+    def __init__(
+        self,
+        repository: "MongoDbRepositoryCore",
+        *,
+        ordered: bool = True,
+        batch_size: int,
+    ):
+        self._repository = repository
+        self.ordered = ordered
+        self.batch_size = batch_size
+        self._operations: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def insert(self, data: dict) -> "BulkOperationBuilder":
+        self._operations.append(InsertOne(data))
+        return self
+
+    def update(self, document_id, *, data: dict) -> "BulkOperationBuilder":
+        self._operations.extend(update_operations([(document_id, data)]))
+        return self
+
+    def set(
+        self, document_id, *, data: dict, write_only_if_insert: bool = False
+    ) -> "BulkOperationBuilder":
+        self._operations.extend(
+            set_operations(
+                [(document_id, data)], write_only_if_insert=write_only_if_insert
+            )
+        )
+        return self
+
+    def delete(self, document_id) -> "BulkOperationBuilder":
+        self._operations.append(DeleteOne({"_id": document_id}))
+        return self
+
+    def add(self, operation: Any) -> "BulkOperationBuilder":
+        """Add any pymongo write model (`UpdateOne`, `ReplaceOne`, ...)."""
+        self._operations.append(operation)
+        return self
+
+    def execute(self) -> Any:
+        operations, self._operations = self._operations, []
+        return self._repository.bulk_write(  # type: ignore[attr-defined]
+            operations, ordered=self.ordered, batch_size=self.batch_size
+        )
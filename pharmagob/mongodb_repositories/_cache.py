@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from copy import deepcopy
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+MISSING = object()
+
+
+def document_tag(collection: str, document_id) -> Tuple[str, str, Any]:
+    return ("document", collection, document_id)
+
+
+def query_tag(collection: str) -> Tuple[str, str]:
+    return ("query", collection)
+
+
+def collection_tag(collection: str) -> Tuple[str, str]:
+    return ("collection", collection)
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries can carry tags so that every variant of one document (different
+    projections, `umu_id` restrictions...), or every entry of one collection
+    when the cache is shared, is dropped with a single `invalidate_tag`. Values
+    are deep-copied on the way in and out, so callers can mutate what they get
+    without corrupting the cache.
+    """
+
+    def __init__(self, *, maxsize: int = 1024, ttl: float = 300.0):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, FrozenSet[Hashable]]]"
+        self._entries = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or `MISSING` when absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return deepcopy(value)
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        *,
+        tag: Optional[Hashable] = None,
+        tags: Iterable[Hashable] = (),
+    ) -> None:
+        value = deepcopy(value)
+        entry_tags = frozenset(tags if tag is None else (tag, *tags))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (monotonic() + self.ttl, value, entry_tags)
+            for entry_tag in entry_tags:
+                self._tags.setdefault(entry_tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / requests) if requests else 0.0,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,754 @@
+import copy
+from contextlib import contextmanager
+from time import perf_counter
+from typing import (
+    Any,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from bson.raw_bson import RawBSONDocument
+from pymongo import ASCENDING, DESCENDING
+
+from ._cache import MISSING, TTLCache, collection_tag, document_tag, query_tag
+from ._count import (
+    COUNT_ADAPTIVE,
+    COUNT_CACHED,
+    COUNT_CAPPED,
+    COUNT_ESTIMATED,
+    COUNT_EXACT,
+    COUNT_SKIP,
+    CountCache,
+    normalize_filter,
+    validate_count_policy,
+)
+from ._details import details_pipeline
+from ._indexes import IndexSpec, SearchIndexSpec
+from ._instrumentation import (
+    PostHook,
+    PreHook,
+    QueryEvent,
+    QueryHooks,
+    document_size,
+    filter_shape,
+    log_event,
+)
+from ._pagination import (
+    decode_cursor_token,
+    encode_cursor_token,
+    keyset_filter,
+    keyset_projection,
+    keyset_sort,
+)
+from ._routing import DEFAULT_ANALYTICS_READ_PREFERENCE, ReadRouting
+from ._search import SearchSpec, build_search_pipeline, build_search_stream_pipeline
+from ._search_cache import SearchScope, SearchSessionCache, search_scope
+from ._timeouts import (
+    Deadline,
+    QueryTimeoutError,
+    is_timeout,
+    validate_max_time_ms,
+    write_timeout,
+)
+from ._utils import convert_conditions_to_mongo
+
+RepositoryT = TypeVar("RepositoryT", bound="MongoDbRepositoryCore")
+
+
+class MongoDbRepositoryCore:
+    """Options and query construction shared by the sync and async repositories.
+
+    Nothing here talks to the server: subclasses get their collection handle from
+    the `db_manager` and run the queries built by these helpers.
+    """
+
+    ASCENDING_ORDER = ASCENDING
+    DESCENDING_ORDER = DESCENDING
+    DEFAULT_QUERY_LIMIT = 500
+    DEFAULT_BULK_BATCH_SIZE = 1000
+    DEFAULT_CURSOR_BATCH_SIZE = 200
+    COUNT_EXACT = COUNT_EXACT
+    COUNT_SKIP = COUNT_SKIP
+    COUNT_ESTIMATED = COUNT_ESTIMATED
+    COUNT_CAPPED = COUNT_CAPPED
+    COUNT_CACHED = COUNT_CACHED
+    COUNT_ADAPTIVE = COUNT_ADAPTIVE
+
+    # Indexes the query paths of the repository rely on, see `ensure_indexes`.
+    # Search indexes are also derived from the `SearchSpec` class attributes.
+    INDEXES: Tuple[IndexSpec, ...] = ()
+    SEARCH_INDEXES: Tuple[SearchIndexSpec, ...] = ()
+
+    # Named projections accepted wherever `projection` is, e.g. "summary" for
+    # list screens; "full" always means the whole document.
+    FULL_PROJECTION = "full"
+    PROJECTIONS: Dict[str, Union[list, dict]] = {}
+
+    # Detail lines `get_with_details` joins to each document: the documents of
+    # `DETAILS_COLLECTION` whose `DETAILS_FOREIGN_FIELD` holds its `_id`, in
+    # `DETAILS_FIELD`; `DETAILS_PROJECTIONS` are the presets of the lines.
+    DETAILS_COLLECTION: Optional[str] = None
+    DETAILS_FOREIGN_FIELD: Optional[str] = None
+    DETAILS_FIELD = "details"
+    DETAILS_PROJECTIONS: Dict[str, Union[list, dict]] = {}
+
+    def __init__(
+        self,
+        db_manager: Any,
+        collection_name: str,
+        *,
+        verbose: bool = False,
+        count_policy: str = COUNT_EXACT,
+        count_cap: int = 1000,
+        count_cache_ttl: float = 30.0,
+        cache: Optional[TTLCache] = None,
+        hooks: Optional[QueryHooks] = None,
+        read_preference: Optional[str] = None,
+        read_concern: Optional[str] = None,
+        max_staleness_seconds: Optional[int] = None,
+        analytics_read_preference: Optional[str] = DEFAULT_ANALYTICS_READ_PREFERENCE,
+        max_time_ms: Optional[int] = None,
+        search_cache: Optional[SearchSessionCache] = None,
+    ):
+        """
+        Parameters:
+            count_policy: How totals are computed when a call does not say it:
+                - "exact": `count_documents` over the whole filter.
+                - "skip": no count at all, totals are returned as None.
+                - "estimated": `estimated_document_count` when the filter is empty,
+                  exact otherwise.
+                - "capped": counts up to `count_cap + 1` documents, so a total
+                  greater than `count_cap` means "more than `count_cap`".
+                - "cached": exact count cached for `count_cache_ttl` seconds,
+                  keyed by the normalized filter.
+                - "adaptive": with `max_time_ms`, the page is read first and the
+                  count only runs when half the budget is left; a skipped or
+                  timed out count returns the page with a None total. Exact
+                  without a budget.
+            cache: Optional read-through cache for `get` and the lookups that
+                support it, meant for reference collections that barely change.
+                Writes done through this repository invalidate it.
+            hooks: Optional `QueryHooks` called around every operation; they can
+                be shared by several repositories. `verbose=True` adds a post
+                hook that logs each operation with its duration.
+            read_preference, read_concern, max_staleness_seconds: Options of the
+                reads ("secondaryPreferred", "majority"...); None keeps the ones of
+                the `db_manager` collection. Writes always use that collection,
+                so they keep its primary and write concern guarantees.
+            analytics_read_preference: Read preference of the heavy reads (exports
+                with `iter_all`, `iter_search`, cross-UMU searches and reports),
+                secondaries when available by default; None makes them follow
+                `read_preference`.
+            max_time_ms: Time budget of each operation, None for no limit. Reads
+                send it as `maxTimeMS`, writes run under `pymongo.timeout`; an
+                operation over budget raises `QueryTimeoutError`. Use `using` for
+                a budget of one call.
+            search_cache: Optional `SearchSessionCache` for the autocomplete
+                searches of type-ahead inputs; it can be shared by several
+                repositories. Writes done through this repository invalidate the
+                sets of its collection.
+        """
+        self._collection = db_manager.get_collection(collection_name)
+        self._db = self._collection.database
+        self._routing = ReadRouting(
+            read_preference, read_concern, max_staleness_seconds
+        )
+        self._analytics_routing = self._routing.replace(
+            read_preference=analytics_read_preference
+        )
+        self._readers: Dict[Tuple[bool, bool], Any] = {}
+        self.verbose = verbose
+        self.count_policy = validate_count_policy(count_policy)
+        self.count_cap = count_cap
+        self.max_time_ms = validate_max_time_ms(max_time_ms)
+        self._count_cache = CountCache(count_cache_ttl)
+        self.cache = cache
+        self.search_cache = search_cache
+        if verbose:
+            hooks = hooks if hooks is not None else QueryHooks()
+            if log_event not in hooks.post:
+                hooks.add(post=log_event)
+        self.hooks = hooks
+
+    def add_hook(
+        self, *, pre: Optional[PreHook] = None, post: Optional[PostHook] = None
+    ) -> None:
+        """Register a callback run before (`pre`) or after (`post`) each operation.
+
+        Hooks receive a `QueryEvent`; post hooks see its duration, document count
+        and error. Exceptions raised by post hooks are logged and swallowed.
+        """
+        if self.hooks is None:
+            self.hooks = QueryHooks()
+        self.hooks.add(pre=pre, post=post)
+
+    def _start_event(
+        self,
+        operation: str,
+        *,
+        filter: Any = None,
+        command: Optional[dict] = None,
+    ) -> Optional[QueryEvent]:
+        if self.hooks is None:
+            return None
+        event = QueryEvent(
+            operation=operation,
+            collection=self._collection.name,
+            filter_shape=None if filter is None else filter_shape(filter),
+            command=command,
+        )
+        self.hooks.before(event)
+        event.started = perf_counter()
+        return event
+
+    def _record_documents(
+        self, event: Optional[QueryEvent], documents: Iterable[Any]
+    ) -> None:
+        if event is None or self.hooks is None:
+            return
+        documents = [document for document in documents if document is not None]
+        event.documents = len(documents)
+        if self.hooks.measure_bytes:
+            event.bytes = sum(map(document_size, documents))
+
+    def _finish_event(
+        self, event: Optional[QueryEvent], error: Optional[BaseException] = None
+    ) -> None:
+        if event is None or self.hooks is None:
+            return
+        event.duration_ms = (perf_counter() - event.started) * 1000
+        event.error = error
+        if self.hooks.should_explain(event):
+            event.explain = self._explain(event.command)
+        self.hooks.after(event)
+
+    def _explain(self, command: Optional[dict]) -> Optional[dict]:
+        """Return the "executionStats" plan of `command`; sync repositories only."""
+        return None
+
+    @contextmanager
+    def _observe(
+        self,
+        operation: str,
+        *,
+        filter: Any = None,
+        command: Optional[dict] = None,
+    ) -> Iterator[Optional[QueryEvent]]:
+        """Time the operation run inside the block and report it to the hooks.
+
+        Yields the `QueryEvent` (None without hooks) so the block can fill in
+        `documents` with `_record_documents`.
+        """
+        event = self._start_event(operation, filter=filter, command=command)
+        try:
+            yield event
+        except BaseException as exc:
+            self._finish_event(event, exc)
+            timeout_error = self._timeout_error(operation, exc)
+            if timeout_error is not None:
+                raise timeout_error from exc
+            raise
+        self._finish_event(event)
+
+    def _observe_cursor(
+        self,
+        operation: str,
+        cursor: Iterable[dict],
+        *,
+        filter: Any = None,
+        command: Optional[dict] = None,
+    ) -> Iterable[dict]:
+        """Wrap a lazy cursor; the post hooks run once it is exhausted or closed."""
+        if self.hooks is None and self.max_time_ms is None:
+            return cursor
+        return self._iter_observed(
+            operation,
+            self._start_event(operation, filter=filter, command=command),
+            cursor,
+        )
+
+    def _iter_observed(
+        self, operation: str, event: Optional[QueryEvent], cursor: Iterable[dict]
+    ) -> Iterator[dict]:
+        documents = 0
+        size = 0
+        measure_bytes = self.hooks is not None and self.hooks.measure_bytes
+        try:
+            for document in cursor:
+                documents += 1
+                if measure_bytes:
+                    size += document_size(document)
+                yield document
+        except BaseException as exc:
+            if event is not None:
+                event.documents = documents
+            self._finish_event(event, None if isinstance(exc, GeneratorExit) else exc)
+            timeout_error = self._timeout_error(operation, exc)
+            if timeout_error is not None:
+                raise timeout_error from exc
+            raise
+        if event is not None:
+            event.documents = documents
+            event.bytes = size if measure_bytes else None
+        self._finish_event(event)
+
+    def _timeout_error(
+        self, operation: str, exc: BaseException
+    ) -> Optional[QueryTimeoutError]:
+        """The `QueryTimeoutError` to raise for `exc`, None to raise it as is."""
+        if (
+            self.max_time_ms is None
+            or isinstance(exc, QueryTimeoutError)
+            or not is_timeout(exc)
+        ):
+            return None
+        return QueryTimeoutError(operation, self._collection.name, self.max_time_ms)
+
+    def _deadline(self) -> Optional[Deadline]:
+        return None if self.max_time_ms is None else Deadline(self.max_time_ms)
+
+    def _max_time(
+        self, deadline: Optional[Deadline] = None, *, option: str = "maxTimeMS"
+    ) -> Dict[str, int]:
+        """Keyword argument bounding one read by the budget, empty without one.
+
+        Parameters:
+            deadline: Budget already partly spent by the call, e.g. the page read
+                before an "adaptive" count.
+            option: "max_time_ms" for `find`/`find_one`, "maxTimeMS" for the
+                commands (`aggregate`, `count_documents`, `distinct`...).
+        """
+        if self.max_time_ms is None:
+            return {}
+        remaining = self.max_time_ms if deadline is None else deadline.remaining_ms()
+        return {option: max(1, remaining)}  # 0 would mean no limit to the server
+
+    def _write_timeout(self) -> ContextManager[Any]:
+        """Context manager bounding the writes run inside by `max_time_ms`."""
+        return write_timeout(self.max_time_ms)
+
+    def _explain_enabled(self) -> bool:
+        return self.hooks is not None and self.hooks.explain_slow_ms is not None
+
+    def _find_command(
+        self,
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        projection: Optional[Union[list, dict]] = None,
+    ) -> Optional[dict]:
+        """The `find` command to explain, only built when explain is enabled."""
+        if not self._explain_enabled():
+            return None
+        command: dict = {"find": self._collection.name, "filter": filter}
+        if sort:
+            command["sort"] = dict(sort)
+        if skip:
+            command["skip"] = skip
+        if limit:
+            command["limit"] = limit
+        if projection is not None:
+            if not isinstance(projection, dict):
+                projection = {field: 1 for field in projection}
+            command["projection"] = projection
+        return command
+
+    def _count_command(self, filter: dict) -> Optional[dict]:
+        if not self._explain_enabled():
+            return None
+        return {"count": self._collection.name, "query": filter}
+
+    def _aggregate_command(self, pipeline: List[dict]) -> Optional[dict]:
+        if not self._explain_enabled():
+            return None
+        return {"aggregate": self._collection.name, "pipeline": pipeline, "cursor": {}}
+
+    @classmethod
+    def index_specs(cls) -> List[IndexSpec]:
+        """The B-tree indexes `ensure_indexes` maintains, `INDEXES` by default."""
+        return list(cls.INDEXES)
+
+    @classmethod
+    def search_index_specs(cls) -> List[SearchIndexSpec]:
+        """`SEARCH_INDEXES` plus one index per distinct `SearchSpec.index`."""
+        declared = {spec.name: spec for spec in cls.SEARCH_INDEXES}
+        derived: Dict[str, List[SearchSpec]] = {}
+        for name in dir(cls):
+            value = getattr(cls, name)
+            if isinstance(value, SearchSpec) and value.index not in declared:
+                derived.setdefault(value.index, []).append(value)
+        return list(declared.values()) + [
+            SearchIndexSpec.from_search_specs(specs) for specs in derived.values()
+        ]
+
+    def _resolve_projection(
+        self,
+        projection: Optional[Union[list, dict, str]],
+        presets: Optional[Dict[str, Union[list, dict]]] = None,
+    ) -> Optional[Union[list, dict]]:
+        if not isinstance(projection, str):
+            return projection
+        if projection == self.FULL_PROJECTION:
+            return None
+        try:
+            return (self.PROJECTIONS if presets is None else presets)[projection]
+        except KeyError:
+            raise ValueError(f"Unknown projection preset: {projection}") from None
+
+    def using(
+        self: RepositoryT,
+        *,
+        read_preference: Optional[str] = None,
+        read_concern: Optional[str] = None,
+        max_staleness_seconds: Optional[int] = None,
+        analytics_read_preference: Optional[str] = None,
+        max_time_ms: Optional[int] = None,
+    ) -> RepositoryT:
+        """A copy of the repository whose reads use other options.
+
+        Meant for one call or one scope, e.g.
+        `repository.using(read_preference="secondary").get_paginated(...)` or
+        `repository.using(max_time_ms=200).search_by_name(...)`. A
+        `read_preference` also applies to the analytics reads of the copy unless
+        `analytics_read_preference` says otherwise; `max_time_ms=0` lifts the
+        time budget, e.g. for an export. The copy shares the cache, hooks and
+        counters of the original.
+        """
+        clone = copy.copy(self)
+        if max_time_ms is not None:
+            clone.max_time_ms = validate_max_time_ms(max_time_ms or None)
+        if read_preference is None:
+            read_preference = self._routing.read_preference
+            max_staleness_seconds = (
+                max_staleness_seconds or self._routing.max_staleness_seconds
+            )
+        routing = ReadRouting(
+            read_preference,
+            read_concern or self._routing.read_concern,
+            max_staleness_seconds,
+        )
+        clone._routing = routing
+        clone._analytics_routing = routing.replace(
+            read_preference=analytics_read_preference
+            or read_preference
+            or self._analytics_routing.read_preference
+        )
+        clone._readers = {}
+        return clone
+
+    def _read_collection(self, raw: bool = False, *, analytics: bool = False) -> Any:
+        """The collection handle a read goes through.
+
+        It carries the read options of the repository, or the analytics ones;
+        with `raw` it decodes `RawBSONDocument`s, which keep the BSON bytes and
+        only decode the fields accessed, much cheaper for lists that are
+        serialized straight away.
+        """
+        key = (raw, analytics)
+        reader = self._readers.get(key)
+        if reader is None:
+            routing = self._analytics_routing if analytics else self._routing
+            options = routing.collection_options()
+            if raw:
+                options["codec_options"] = self._collection.codec_options.with_options(
+                    document_class=RawBSONDocument
+                )
+            reader = (
+                self._collection.with_options(**options)
+                if options
+                else self._collection
+            )
+            self._readers[key] = reader
+        return reader
+
+    def _details_query(
+        self,
+        match: dict,
+        *,
+        umu_id: Optional[str],
+        projection: Optional[Union[list, dict, str]],
+        details_projection: Optional[Union[list, dict, str]],
+        details_sort: Optional[List[Tuple[str, int]]],
+        details_limit: Optional[int],
+    ) -> List[dict]:
+        """Build the `$lookup` pipeline of `get_with_details`."""
+        if not self.DETAILS_COLLECTION or not self.DETAILS_FOREIGN_FIELD:
+            raise ValueError(f"{type(self).__name__} has no DETAILS_COLLECTION")
+        return details_pipeline(
+            match,
+            from_collection=self.DETAILS_COLLECTION,
+            foreign_field=self.DETAILS_FOREIGN_FIELD,
+            as_field=self.DETAILS_FIELD,
+            umu_id=umu_id,
+            projection=self._resolve_projection(projection),
+            details_projection=self._resolve_projection(
+                details_projection, self.DETAILS_PROJECTIONS
+            ),
+            details_sort=details_sort,
+            details_limit=details_limit,
+        )
+
+    def _document_cache_key(
+        self,
+        document_id,
+        *,
+        umu_id: Optional[str],
+        sort: Optional[List[Tuple[str, int]]],
+        projection: Optional[Union[list, dict]],
+    ) -> Optional[tuple]:
+        if self.cache is None or sort is not None:
+            return None
+        projection_key = None if projection is None else normalize_filter(projection)
+        collection = self._collection.name
+        return ("document", collection, document_id, umu_id, projection_key)
+
+    def _query_cache_key(self, name: str, **parameters: Any) -> Optional[tuple]:
+        if self.cache is None:
+            return None
+        return ("query", self._collection.name, name, normalize_filter(parameters))
+
+    def _cache_document(self, key: Optional[tuple], document: Optional[dict]) -> None:
+        """Cache `document` under its `_document_cache_key`, tagged by id and
+        collection."""
+        if key is not None and document is not None and self.cache is not None:
+            collection = self._collection.name
+            self.cache.put(
+                key,
+                document,
+                tags=(document_tag(collection, key[2]), collection_tag(collection)),
+            )
+
+    def _cache_query(self, key: tuple, value: Any) -> None:
+        if self.cache is not None:
+            collection = self._collection.name
+            self.cache.put(
+                key, value, tags=(query_tag(collection), collection_tag(collection))
+            )
+
+    def _invalidate_document(self, document_id) -> None:
+        if self.cache is not None:
+            collection = self._collection.name
+            self.cache.invalidate_tag(document_tag(collection, document_id))
+            self.cache.invalidate_tag(query_tag(collection))
+        self._invalidate_searches()
+
+    def _invalidate_queries(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate_tag(query_tag(self._collection.name))
+        self._invalidate_searches()
+
+    def _invalidate_cache(self) -> None:
+        """Drop every cached entry of this collection, the other ones are kept."""
+        if self.cache is not None:
+            self.cache.invalidate_tag(collection_tag(self._collection.name))
+        self._invalidate_searches()
+
+    def _invalidate_searches(self) -> None:
+        if self.search_cache is not None:
+            self.search_cache.invalidate(self._collection.name)
+
+    @staticmethod
+    def _id_filter(document_id, umu_id: Optional[str] = None) -> dict:
+        filter = {"_id": document_id}
+        if umu_id:
+            filter.update({"umu_id": umu_id})
+        return filter
+
+    @staticmethod
+    def _many_query(
+        document_ids: List[Any],
+        *,
+        umu_id: Optional[str],
+        projection: Optional[Union[list, dict]],
+    ) -> Tuple[dict, Optional[Union[list, dict]]]:
+        """Build the `$in` filter of a batch lookup; `_id` is always projected."""
+        filter: dict = {"_id": {"$in": document_ids}}
+        if umu_id:
+            filter.update({"umu_id": umu_id})
+        if isinstance(projection, dict) and not projection.get("_id", 1):
+            projection = {
+                key: value for key, value in projection.items() if key != "_id"
+            }
+            if not projection:
+                projection = None
+        return filter, projection
+
+    @staticmethod
+    def _unique_ids(document_ids: List[Any]) -> List[Any]:
+        return list(dict.fromkeys(document_ids))
+
+    def _cached_many(
+        self,
+        document_ids: List[Any],
+        *,
+        umu_id: Optional[str],
+        projection: Optional[Union[list, dict]],
+    ) -> Tuple[Dict[Any, dict], List[Any]]:
+        """Split a batch lookup between the cached documents and the ids to fetch."""
+        found: Dict[Any, dict] = {}
+        if self.cache is None:
+            return found, self._unique_ids(document_ids)
+        pending: List[Any] = []
+        for document_id in self._unique_ids(document_ids):
+            cache_key = self._document_cache_key(
+                document_id, umu_id=umu_id, sort=None, projection=projection
+            )
+            cached_data = self.cache.get(cache_key)
+            if cached_data is MISSING:
+                pending.append(document_id)
+            else:
+                found[document_id] = cached_data
+        return found, pending
+
+    def _store_many(
+        self,
+        found: Dict[Any, dict],
+        documents: List[dict],
+        *,
+        umu_id: Optional[str],
+        projection: Optional[Union[list, dict]],
+    ) -> None:
+        for document in documents:
+            document_id = document["_id"]
+            found[document_id] = document
+            self._cache_document(
+                self._document_cache_key(
+                    document_id, umu_id=umu_id, sort=None, projection=projection
+                ),
+                document,
+            )
+
+    @staticmethod
+    def _conditions_filter(
+        and_conditions: Optional[List[Tuple[str, str, Any]]],
+        umu_id: Optional[str] = None,
+    ) -> dict:
+        parsed_filter: dict = {}
+        if and_conditions:
+            parsed_filter = convert_conditions_to_mongo(and_conditions)
+        if umu_id:
+            parsed_filter.update({"umu_id": umu_id})
+        return parsed_filter
+
+    @staticmethod
+    def _cursor_query(
+        parsed_filter: dict,
+        *,
+        cursor: Optional[str],
+        sort: Optional[List[Tuple[str, int]]],
+        projection: Optional[Union[list, dict]],
+    ) -> Tuple[dict, List[Tuple[str, int]], Optional[Union[list, dict]]]:
+        """Build the filter, sort and projection of one keyset page."""
+        full_sort = keyset_sort(sort)
+        if cursor:
+            last_values = decode_cursor_token(cursor, full_sort)
+            seek_filter = keyset_filter(full_sort, last_values)
+            if parsed_filter:
+                parsed_filter = {"$and": [parsed_filter, seek_filter]}
+            else:
+                parsed_filter = seek_filter
+        return parsed_filter, full_sort, keyset_projection(projection, full_sort)
+
+    @staticmethod
+    def _next_cursor(
+        results: List[dict], *, limit: int, sort: List[Tuple[str, int]]
+    ) -> Optional[str]:
+        if results and len(results) == limit:
+            return encode_cursor_token(sort, results[-1])
+        return None
+
+    def _count_strategy(self, filter: dict, count_policy: Optional[str]) -> str:
+        """Resolve the count policy of one call against the repository default."""
+        policy = validate_count_policy(count_policy or self.count_policy)
+        if policy == COUNT_ESTIMATED and filter:
+            return COUNT_EXACT  # the estimate ignores filters
+        if policy == COUNT_ADAPTIVE and self.max_time_ms is None:
+            return COUNT_EXACT
+        return policy
+
+    def _search_count(self, count_policy: Optional[str] = None) -> Optional[dict]:
+        """Translate a count policy into the Atlas Search `count` option."""
+        policy = validate_count_policy(count_policy or self.count_policy)
+        if policy == COUNT_SKIP:
+            return None
+        if policy == COUNT_EXACT or (
+            policy == COUNT_ADAPTIVE and self.max_time_ms is None
+        ):
+            return {"type": "total"}
+        return {"type": "lowerBound", "threshold": self.count_cap}
+
+    def _search_scope(
+        self,
+        search: dict,
+        *,
+        search_after: Optional[str],
+        search_before: Optional[str],
+        search_tokens: bool,
+    ) -> Optional[SearchScope]:
+        """The `search_cache` scope of a search, None when it bypasses the cache.
+
+        Sequence tokens only come from the server, so token pages always do.
+        """
+        if (
+            self.search_cache is None
+            or search_after is not None
+            or search_before is not None
+            or search_tokens
+        ):
+            return None
+        return search_scope(self._collection.name, search)
+
+    def _search_query(
+        self,
+        search: dict,
+        *,
+        page: int,
+        limit: int,
+        count_policy: Optional[str],
+        search_after: Optional[str],
+        search_before: Optional[str],
+        search_tokens: bool,
+    ) -> Tuple[List[dict], Optional[dict]]:
+        """Build the pipeline of one search page and the `count` option it uses."""
+        count = self._search_count(count_policy)
+        pipeline = build_search_pipeline(
+            search,
+            page=page or 1,
+            limit=limit or self.DEFAULT_QUERY_LIMIT,
+            count=count,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+        return pipeline, count
+
+    @staticmethod
+    def _search_stream_query(
+        spec: SearchSpec,
+        query: str,
+        *,
+        limit: Optional[int],
+        sort: Optional[Dict[str, int]],
+        ranges: Optional[Dict[str, Tuple[Any, Any]]],
+        equals: Optional[Dict[str, Any]],
+        in_filters: Optional[Dict[str, List[Any]]],
+        not_in_filters: Optional[Dict[str, List[Any]]],
+    ) -> List[dict]:
+        search = spec.compile(
+            query,
+            sort=sort,
+            ranges=ranges,
+            equals=equals,
+            in_filters=in_filters,
+            not_in_filters=not_in_filters,
+        )
+        return build_search_stream_pipeline(search, limit=limit)
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Optional, Tuple
+
+from bson import json_util
+
+COUNT_EXACT = "exact"
+COUNT_SKIP = "skip"
+COUNT_ESTIMATED = "estimated"
+COUNT_CAPPED = "capped"
+COUNT_CACHED = "cached"
+COUNT_ADAPTIVE = "adaptive"
+
+COUNT_POLICIES = (
+    COUNT_EXACT,
+    COUNT_SKIP,
+    COUNT_ESTIMATED,
+    COUNT_CAPPED,
+    COUNT_CACHED,
+    COUNT_ADAPTIVE,
+)
+
+
+def validate_count_policy(count_policy: str) -> str:
+    if count_policy not in COUNT_POLICIES:
+        raise ValueError(f"Count policy not supported: {count_policy}")
+    return count_policy
+
+
+def normalize_filter(filter: dict) -> str:
+    """Return a stable key for `filter`, independent of the order of its keys."""
+    return json_util.dumps(filter, sort_keys=True)
+
+
+class CountCache:
+    """Small TTL cache of `count_documents` results keyed by the normalized filter."""
+
+    def __init__(self, ttl: float, *, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, count = entry
+            if expires_at < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return count
+
+    def put(self, key: str, count: int) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, count)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,66 @@
+from typing import Any, List, Optional, Tuple, Union
+
+
+def _as_dict(projection: Union[list, dict]) -> dict:
+    if isinstance(projection, dict):
+        return projection
+    return {field: 1 for field in projection}
+
+
+def details_pipeline(
+    match: dict,
+    *,
+    from_collection: str,
+    foreign_field: str,
+    as_field: str,
+    umu_id: Optional[str] = None,
+    projection: Optional[Union[list, dict]] = None,
+    details_projection: Optional[Union[list, dict]] = None,
+    details_sort: Optional[List[Tuple[str, int]]] = None,
+    details_limit: Optional[int] = None,
+) -> List[dict]:
+    """Headers matching `match`, each with its detail lines in `as_field`.
+
+    The `$lookup` joins on `_id` = `foreign_field` (MongoDB 5.0+ syntax), so it
+    uses the index of the detail collection that starts with `foreign_field`.
+    The header projection runs before the join and always keeps `_id`.
+
+    Parameters:
+        umu_id: Also restricts the detail lines to this UMU.
+        details_limit: Caps the lines per header; the whole header and its lines
+            must fit in one 16 MB document.
+    """
+    pipeline: List[dict] = [{"$match": match}]
+    if projection is not None:
+        header_projection: dict = {
+            key: value for key, value in _as_dict(projection).items() if key != "_id"
+        }
+        if any(header_projection.values()):
+            header_projection["_id"] = 1
+        if header_projection:
+            pipeline.append({"$project": header_projection})
+    lines: List[dict] = []
+    if umu_id:
+        lines.append({"$match": {"umu_id": umu_id}})
+    if details_sort:
+        lines.append({"$sort": dict(details_sort)})
+    if details_limit is not None:
+        lines.append({"$limit": details_limit})
+    if details_projection is not None:
+        lines.append({"$project": _as_dict(details_projection)})
+    lookup: dict = {
+        "from": from_collection,
+        "localField": "_id",
+        "foreignField": foreign_field,
+        "as": as_field,
+    }
+    if lines:
+        lookup["pipeline"] = lines
+    pipeline.append({"$lookup": lookup})
+    return pipeline
+
+
+def ordered_by_id(document_ids: List[Any], documents: List[dict]) -> List[Any]:
+    """`documents` aligned with `document_ids`, None for the missing ones."""
+    found = {document["_id"]: document for document in documents}
+    return [found.get(document_id) for document_id in document_ids]
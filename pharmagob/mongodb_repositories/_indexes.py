@@ -0,0 +1,194 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import IndexModel
+
+from ._search import SearchSpec
+
+ID_INDEX_NAME = "_id_"
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """One B-tree (or TTL) index a repository needs.
+
+    Example:
+        INDEXES = (
+            IndexSpec([("foreign_id", ASCENDING), ("umu_id", ASCENDING)]),
+            IndexSpec([("created_at", ASCENDING)], expire_after_seconds=86400),
+        )
+    """
+
+    keys: Sequence[Tuple[str, int]]
+    name: Optional[str] = None
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+    partial_filter: Optional[dict] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "keys", tuple(tuple(key) for key in self.keys))
+
+    @property
+    def index_name(self) -> str:
+        """The given name, or the one the server generates for these keys."""
+        if self.name:
+            return self.name
+        return "_".join(f"{path}_{direction}" for path, direction in self.keys)
+
+    def options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return options
+
+    def model(self) -> IndexModel:
+        return IndexModel(list(self.keys), name=self.index_name, **self.options())
+
+    def differences(self, information: dict) -> List[str]:
+        """Compare with one `index_information()` entry of the same keys."""
+        differences = []
+        for option, expected in (
+            ("unique", self.unique),
+            ("sparse", self.sparse),
+            ("expireAfterSeconds", self.expire_after_seconds),
+            ("partialFilterExpression", self.partial_filter),
+        ):
+            actual = information.get(option)
+            if isinstance(expected, bool):
+                actual = bool(actual)
+            if actual != expected:
+                differences.append(f"{option}: {actual!r} != {expected!r}")
+        return differences
+
+
+@dataclass(frozen=True)
+class SearchIndexSpec:
+    """One Atlas Search index, usually derived from the `SearchSpec`s of a class."""
+
+    name: str
+    definition: dict
+
+    @classmethod
+    def from_search_specs(cls, specs: Sequence[SearchSpec]) -> "SearchIndexSpec":
+        """Merge the fields of the specs that share one index into its mappings."""
+        fields: Dict[str, List[str]] = {}
+        for spec in specs:
+            for path, types in spec.index_fields().items():
+                merged = fields.setdefault(path, [])
+                merged.extend(t for t in types if t not in merged)
+        mappings: Dict[str, Any] = {"dynamic": False, "fields": {}}
+        for path, types in sorted(fields.items()):
+            *parents, leaf = path.split(".")
+            level = mappings["fields"]
+            for parent in parents:
+                level = level.setdefault(parent, {"type": "document", "fields": {}})[
+                    "fields"
+                ]
+            level[leaf] = [{"type": field_type} for field_type in types]
+        return cls(specs[0].index, {"mappings": mappings})
+
+
+def definition_contains(expected: Any, actual: Any) -> bool:
+    """True when `actual` has at least what `expected` declares.
+
+    Atlas adds defaults to stored definitions, so only the declared keys are
+    compared; a field mapped to a single type may come back as a plain dict.
+    """
+    if isinstance(expected, dict):
+        return isinstance(actual, dict) and all(
+            definition_contains(value, actual.get(key))
+            for key, value in expected.items()
+        )
+    if isinstance(expected, list):
+        actual_items = actual if isinstance(actual, list) else [actual]
+        return all(
+            any(definition_contains(item, candidate) for candidate in actual_items)
+            for item in expected
+        )
+    return expected == actual
+
+
+@dataclass
+class IndexDrift:
+    """What `ensure_indexes` found (and did) on one collection.
+
+    `missing`/`search_missing` are the declared indexes still absent, i.e. not
+    created because of `dry_run` or an error. `changed` are declared indexes
+    whose options differ from the existing ones; they are never dropped
+    automatically. `search_changed` are search indexes whose definition does
+    not contain the declared one, they are only updated on request.
+    `extra` are existing indexes nobody declares.
+    """
+
+    collection: str
+    created: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    changed: Dict[str, List[str]] = field(default_factory=dict)
+    extra: List[str] = field(default_factory=list)
+    search_created: List[str] = field(default_factory=list)
+    search_updated: List[str] = field(default_factory=list)
+    search_missing: List[str] = field(default_factory=list)
+    search_changed: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (
+            self.missing
+            or self.changed
+            or self.search_missing
+            or self.search_changed
+            or self.errors
+        )
+
+
+def plan_indexes(
+    drift: IndexDrift, declared: Iterable[IndexSpec], information: Dict[str, dict]
+) -> List[IndexSpec]:
+    """Fill the B-tree part of `drift` and return the indexes to create."""
+    existing = {
+        tuple(tuple(key) for key in details.get("key", [])): name
+        for name, details in information.items()
+    }
+    to_create = []
+    matched = set()
+    for spec in declared:
+        name = existing.get(spec.keys)
+        if name is None:
+            to_create.append(spec)
+            drift.missing.append(spec.index_name)
+            continue
+        matched.add(name)
+        differences = spec.differences(information[name])
+        if differences:
+            drift.changed[name] = differences
+    drift.extra = sorted(
+        name for name in information if name not in matched and name != ID_INDEX_NAME
+    )
+    return to_create
+
+
+def plan_search_indexes(
+    drift: IndexDrift, declared: Iterable[SearchIndexSpec], existing: List[dict]
+) -> Tuple[List[SearchIndexSpec], List[SearchIndexSpec]]:
+    """Fill the search part of `drift`; return the indexes to create and update."""
+    definitions = {
+        index["name"]: index.get("latestDefinition", index.get("definition", {}))
+        for index in existing
+    }
+    to_create, to_update = [], []
+    for spec in declared:
+        if spec.name not in definitions:
+            to_create.append(spec)
+            drift.search_missing.append(spec.name)
+        elif not definition_contains(spec.definition, definitions[spec.name]):
+            to_update.append(spec)
+            drift.search_changed.append(spec.name)
+    return to_create, to_update
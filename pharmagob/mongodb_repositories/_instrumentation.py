@@ -0,0 +1,196 @@
+import logging
+import random
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import bson
+
+logger = logging.getLogger("pharmagob.mongodb_repositories")
+
+PreHook = Callable[["QueryEvent"], Any]
+PostHook = Callable[["QueryEvent"], Any]
+
+
+@dataclass
+class QueryEvent:
+    """One operation sent by a repository, as seen by the hooks.
+
+    `filter_shape` is the filter with every value replaced by "?", so events of
+    the same query with different parameters can be grouped. `documents` and
+    `bytes` are only known once the result has been read; for lazy cursors the
+    post hooks run when the cursor is exhausted.
+    """
+
+    operation: str
+    collection: str
+    filter_shape: Any = None
+    duration_ms: float = 0.0
+    documents: Optional[int] = None
+    bytes: Optional[int] = None
+    error: Optional[BaseException] = None
+    explain: Optional[dict] = None
+    command: Optional[dict] = field(default=None, repr=False)
+    started: float = field(default=0.0, repr=False)
+
+
+def filter_shape(value: Any) -> Any:
+    """Replace the values of a filter or pipeline by "?" keeping its structure."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [filter_shape(item) for item in value]
+        return "?"
+    return "?"
+
+
+def document_size(document: Any) -> int:
+    raw = getattr(document, "raw", None)
+    if raw is not None:
+        return len(raw)
+    return len(bson.encode(document))
+
+
+class QueryHooks:
+    """Pre/post operation callbacks shared by every method of a repository.
+
+    Parameters:
+        measure_bytes: Encode every returned document to report `bytes`.
+        explain_slow_ms: Run `explain("executionStats")` for operations slower
+            than this, attaching the plan to `event.explain`. Explain runs the
+            query again, so keep `explain_sample_rate` low in production.
+        explain_sample_rate: Fraction of slow operations that get explained.
+    """
+
+    def __init__(
+        self,
+        *,
+        pre: Sequence[PreHook] = (),
+        post: Sequence[PostHook] = (),
+        measure_bytes: bool = False,
+        explain_slow_ms: Optional[float] = None,
+        explain_sample_rate: float = 1.0,
+    ):
+        self.pre: List[PreHook] = list(pre)
+        self.post: List[PostHook] = list(post)
+        self.measure_bytes = measure_bytes
+        self.explain_slow_ms = explain_slow_ms
+        self.explain_sample_rate = explain_sample_rate
+
+    def add(
+        self, *, pre: Optional[PreHook] = None, post: Optional[PostHook] = None
+    ) -> None:
+        if pre is not None:
+            self.pre.append(pre)
+        if post is not None:
+            self.post.append(post)
+
+    def should_explain(self, event: QueryEvent) -> bool:
+        return (
+            self.explain_slow_ms is not None
+            and event.command is not None
+            and event.error is None
+            and event.duration_ms >= self.explain_slow_ms
+            and random.random() < self.explain_sample_rate
+        )
+
+    def before(self, event: QueryEvent) -> None:
+        for hook in self.pre:
+            hook(event)
+
+    def after(self, event: QueryEvent) -> None:
+        for hook in self.post:
+            try:
+                hook(event)
+            except Exception:  # a broken hook must not break the query
+                logger.exception("Query hook failed for %s", event.operation)
+
+
+def log_event(event: QueryEvent) -> None:
+    """Post hook installed by `verbose=True`."""
+    logger.info(
+        "%s.%s %.1fms docs=%s bytes=%s filter=%s%s",
+        event.collection,
+        event.operation,
+        event.duration_ms,
+        event.documents,
+        event.bytes,
+        event.filter_shape,
+        f" error={event.error!r}" if event.error is not None else "",
+    )
+
+
+class LatencyHistogram:
+    """Post hook that keeps a latency histogram per collection and operation.
+
+    Example:
+        histogram = LatencyHistogram()
+        repository = ItemsRepository(manager, "items", hooks=QueryHooks(post=[histogram]))
+        ...
+        print(histogram.export_prometheus())
+    """
+
+    DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        self._series: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def __call__(self, event: QueryEvent) -> None:
+        key = (event.collection, event.operation)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "buckets": [0] * (len(self.buckets_ms) + 1),
+                    "count": 0,
+                    "sum_ms": 0.0,
+                    "documents": 0,
+                    "errors": 0,
+                }
+            series["buckets"][bisect_left(self.buckets_ms, event.duration_ms)] += 1
+            series["count"] += 1
+            series["sum_ms"] += event.duration_ms
+            series["documents"] += event.documents or 0
+            series["errors"] += event.error is not None
+
+    def export(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot keyed by "<collection>.<operation>"."""
+        with self._lock:
+            return {
+                f"{collection}.{operation}": {
+                    "buckets_ms": dict(
+                        zip(
+                            [*map(str, self.buckets_ms), "+Inf"],
+                            list(series["buckets"]),
+                        )
+                    ),
+                    "count": series["count"],
+                    "sum_ms": series["sum_ms"],
+                    "documents": series["documents"],
+                    "errors": series["errors"],
+                }
+                for (collection, operation), series in self._series.items()
+            }
+
+    def export_prometheus(self, name: str = "pharmagob_mongodb_query_ms") -> str:
+        lines = [f"# TYPE {name} histogram"]
+        with self._lock:
+            for (collection, operation), series in sorted(self._series.items()):
+                labels = f'collection="{collection}",operation="{operation}"'
+                cumulative = 0
+                for bound, count in zip(
+                    [*map(str, self.buckets_ms), "+Inf"], series["buckets"]
+                ):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {series['sum_ms']}")
+                lines.append(f"{name}_count{{{labels}}} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
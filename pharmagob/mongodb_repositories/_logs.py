@@ -0,0 +1,233 @@
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+
+TIME_SERIES_GRANULARITIES = ("seconds", "minutes", "hours")
+
+
+class LogBuffer:
+    """Pending log entries, due for a flush on `size` entries or `interval` seconds.
+
+    Safe to share between threads; `drain` hands the entries to exactly one
+    flusher.
+    """
+
+    def __init__(self, size: int, interval: float):
+        if size < 1:
+            raise ValueError("The flush size must be at least 1")
+        self.size = size
+        self.interval = interval
+        self._entries: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entries: Iterable[dict]) -> bool:
+        """Queue `entries`; True when the buffer is now due for a flush."""
+        with self._lock:
+            self._entries.extend(entries)
+            if self._oldest is None and self._entries:
+                self._oldest = monotonic()
+        return self.due()
+
+    def due(self) -> bool:
+        if len(self._entries) >= self.size:
+            return True
+        return self._oldest is not None and monotonic() - self._oldest >= self.interval
+
+    def drain(self) -> List[dict]:
+        with self._lock:
+            entries, self._entries, self._oldest = self._entries, [], None
+        return entries
+
+    def requeue(self, entries: List[dict]) -> None:
+        """Put back entries a failed flush did not write, ahead of the newer ones."""
+        if not entries:
+            return
+        with self._lock:
+            self._entries[:0] = entries
+            if self._oldest is None:
+                self._oldest = monotonic()
+
+
+class LogRepositoryCore(MongoDbRepositoryCore):
+    """Options and query construction shared by the sync and async log repositories.
+
+    Log collections are append-mostly: entries go through a buffer flushed with
+    unordered `insert_many`, and are read back by time range.
+
+    Class attributes:
+        TIMESTAMP_FIELD: Millisecond timestamp of each entry, stamped on `log` when
+            missing; range reads and the default index use it.
+        TIME_FIELD: BSON date copy of the timestamp, written only when
+            `TIME_SERIES` or `RETENTION_SECONDS` need a real date.
+        META_FIELD: Optional field most reads filter on (e.g. "umu_id"); it
+            becomes the time-series `metaField` and leads a compound index.
+        TIME_SERIES: Create the collection as a time-series collection in
+            `ensure_indexes` (MongoDB 5.0+).
+        RETENTION_SECONDS: Entries are deleted by the server after this age, with
+            a TTL index or the time-series `expireAfterSeconds`.
+        ARCHIVE_COLLECTION, ARCHIVE_AFTER_SECONDS: Default target and age of
+            `archive`; keep `RETENTION_SECONDS` longer, or the TTL wins.
+        FLUSH_SIZE, FLUSH_INTERVAL: Defaults of the buffered writer.
+    """
+
+    TIMESTAMP_FIELD = "created_at"
+    TIME_FIELD = "logged_at"
+    META_FIELD: Optional[str] = None
+    TIME_SERIES = False
+    TIME_SERIES_GRANULARITY = "seconds"
+    RETENTION_SECONDS: Optional[int] = None
+    ARCHIVE_COLLECTION: Optional[str] = None
+    ARCHIVE_AFTER_SECONDS: Optional[int] = None
+    FLUSH_SIZE = 500
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        db_manager: Any,
+        collection_name: str,
+        *,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        write_concern: Any = None,
+        **kwargs: Any,
+    ):
+        """
+        Parameters:
+            flush_size: Entries buffered by `log` before they are written.
+            flush_interval: Seconds after which buffered entries are written even
+                if the buffer is not full; 0 disables the background flush.
+            write_concern: Optional `WriteConcern` of the log writes, e.g.
+                `WriteConcern(w=1, j=False)` when losing the last entries on a
+                crash is acceptable.
+        """
+        super().__init__(db_manager, collection_name, **kwargs)
+        self._buffer = LogBuffer(
+            flush_size if flush_size is not None else self.FLUSH_SIZE,
+            flush_interval if flush_interval is not None else self.FLUSH_INTERVAL,
+        )
+        self._log_collection = self._collection
+        if write_concern is not None:
+            self._log_collection = self._collection.with_options(
+                write_concern=write_concern
+            )
+
+    @classmethod
+    def _order_field(cls) -> str:
+        return cls.TIME_FIELD if cls.TIME_SERIES else cls.TIMESTAMP_FIELD
+
+    @classmethod
+    def index_specs(cls) -> List[IndexSpec]:
+        """`INDEXES` plus the time-range, `META_FIELD` and TTL indexes."""
+        specs = list(cls.INDEXES)
+        order_field = cls._order_field()
+        if not cls.TIME_SERIES:  # buckets are already clustered by time
+            specs.append(
+                IndexSpec(
+                    [(order_field, cls.ASCENDING_ORDER), ("_id", cls.ASCENDING_ORDER)]
+                )
+            )
+        if cls.META_FIELD:
+            specs.append(
+                IndexSpec(
+                    [
+                        (cls.META_FIELD, cls.ASCENDING_ORDER),
+                        (order_field, cls.ASCENDING_ORDER),
+                    ]
+                )
+            )
+        if cls.RETENTION_SECONDS is not None and not cls.TIME_SERIES:
+            specs.append(
+                IndexSpec(
+                    [(cls.TIME_FIELD, cls.ASCENDING_ORDER)],
+                    expire_after_seconds=cls.RETENTION_SECONDS,
+                )
+            )
+        return specs
+
+    @classmethod
+    def collection_options(cls) -> Dict[str, Any]:
+        """`create_collection` options of a `TIME_SERIES` log collection."""
+        if cls.TIME_SERIES_GRANULARITY not in TIME_SERIES_GRANULARITIES:
+            raise ValueError(
+                f"Unknown time-series granularity: {cls.TIME_SERIES_GRANULARITY}"
+            )
+        timeseries = {
+            "timeField": cls.TIME_FIELD,
+            "granularity": cls.TIME_SERIES_GRANULARITY,
+        }
+        if cls.META_FIELD:
+            timeseries["metaField"] = cls.META_FIELD
+        options: Dict[str, Any] = {"timeseries": timeseries}
+        if cls.RETENTION_SECONDS is not None:
+            options["expireAfterSeconds"] = cls.RETENTION_SECONDS
+        return options
+
+    def _stamp(self, entry: dict) -> dict:
+        timestamp = entry.setdefault(self.TIMESTAMP_FIELD, round(time() * 1000))
+        if (self.TIME_SERIES or self.RETENTION_SECONDS is not None) and isinstance(
+            timestamp, int
+        ):
+            entry.setdefault(self.TIME_FIELD, _to_datetime(timestamp))
+        return entry
+
+    def _range_conditions(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        and_conditions: Optional[List[Tuple[str, str, Any]]],
+    ) -> List[Tuple[str, str, Any]]:
+        """`and_conditions` plus `start <= timestamp < end` (milliseconds)."""
+        field = self._order_field()
+        conditions = list(and_conditions or [])
+        if start is not None:
+            conditions.append((field, ">=", self._time_value(start)))
+        if end is not None:
+            conditions.append((field, "<", self._time_value(end)))
+        return conditions
+
+    def _range_sort(self, descending: bool) -> List[Tuple[str, int]]:
+        direction = self.DESCENDING_ORDER if descending else self.ASCENDING_ORDER
+        return [(self._order_field(), direction), ("_id", direction)]
+
+    def _time_value(self, timestamp: int) -> Any:
+        return _to_datetime(timestamp) if self.TIME_SERIES else timestamp
+
+    def _archive_cutoff(self, older_than: Optional[int]) -> int:
+        if not self.ARCHIVE_COLLECTION:
+            raise ValueError(f"{type(self).__name__} has no ARCHIVE_COLLECTION")
+        if older_than is not None:
+            return older_than
+        if self.ARCHIVE_AFTER_SECONDS is None:
+            raise ValueError("older_than is required without ARCHIVE_AFTER_SECONDS")
+        return round(time() * 1000) - self.ARCHIVE_AFTER_SECONDS * 1000
+
+    def _archive_pipeline(self, filter: dict) -> List[dict]:
+        """Copy the matching entries to `ARCHIVE_COLLECTION`; re-running is harmless."""
+        return [
+            {"$match": filter},
+            {
+                "$merge": {
+                    "into": self.ARCHIVE_COLLECTION,
+                    "on": "_id",
+                    "whenMatched": "keepExisting",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+
+
+def archive_batch_filter(entries: List[dict]) -> dict:
+    """Filter of exactly the `entries` read for one archive batch."""
+    return {"_id": {"$in": [entry["_id"] for entry in entries]}}
+
+
+def _to_datetime(timestamp: int) -> datetime:
+    return datetime.fromtimestamp(timestamp / 1000, timezone.utc)
@@ -0,0 +1,105 @@
+import base64
+import binascii
+from collections.abc import Mapping
+from typing import Any, List, Optional, Tuple, Union
+
+from bson import json_util
+from pymongo import ASCENDING
+
+
+def get_path(document: dict, path: str) -> Any:
+    value: Any = document
+    for key in path.split("."):
+        if not isinstance(value, Mapping):  # dict or RawBSONDocument
+            return None
+        value = value.get(key)
+    return value
+
+
+def keyset_sort(sort: Optional[List[Tuple[str, int]]]) -> List[Tuple[str, int]]:
+    """Return `sort` with `_id` appended as tie-breaker, so the order is total."""
+    keyset = list(sort or [])
+    if not any(field == "_id" for field, _ in keyset):
+        direction = keyset[-1][1] if keyset else ASCENDING
+        keyset.append(("_id", direction))
+    return keyset
+
+
+def keyset_projection(
+    projection: Optional[Union[list, dict]], sort: List[Tuple[str, int]]
+) -> Optional[Union[list, dict]]:
+    """Make sure the fields needed to build the next token are returned."""
+    if projection is None:
+        return None
+    sort_fields = [field for field, _ in sort]
+    if isinstance(projection, dict):
+        if not any(value for key, value in projection.items() if key != "_id"):
+            # exclusion projection: only the excluded sort fields must come back
+            return {
+                key: value
+                for key, value in projection.items()
+                if key not in sort_fields
+            }
+        return {**projection, **{field: 1 for field in sort_fields}}
+    return list(projection) + [
+        field for field in sort_fields if field not in projection
+    ]
+
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> dict:
+    """Build the filter that resumes right after the row holding `values`.
+
+    For a sort on (a, b, _id) it produces:
+        a > va OR (a == va AND b > vb) OR (a == va AND b == vb AND _id > vid)
+    with `>` swapped for `<` on descending keys. Null and missing values sort
+    before any other, as MongoDB does; `$gt`/`$lt` never match them, so they
+    get their own conditions. Other values are compared within their BSON type.
+    """
+    branches: List[dict] = []
+    for position, (field, direction) in enumerate(sort):
+        after = _after(field, direction, values[position])
+        if after is None:
+            continue
+        branch = {
+            previous_field: values[index]
+            for index, (previous_field, _) in enumerate(sort[:position])
+        }
+        branch.update(after)
+        branches.append(branch)
+    if len(branches) == 1:
+        return branches[0]
+    return {"$or": branches}
+
+
+def _after(field: str, direction: int, value: Any) -> Optional[dict]:
+    """The condition of the values that sort after `value`, None for none."""
+    if direction == ASCENDING:
+        if value is None:
+            return {field: {"$ne": None}}
+        return {field: {"$gt": value}}
+    if value is None:
+        return None  # nothing sorts after null in descending order
+    if field == "_id":  # never null
+        return {field: {"$lt": value}}
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def encode_cursor_token(sort: List[Tuple[str, int]], document: dict) -> str:
+    payload = {
+        "s": [[field, direction] for field, direction in sort],
+        "v": [get_path(document, field) for field, _ in sort],
+    }
+    raw = json_util.dumps(payload).encode("utf8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor_token(token: str, sort: List[Tuple[str, int]]) -> List[Any]:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        token_sort = [(field, direction) for field, direction in payload["s"]]
+        values = payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
+    if token_sort != sort or len(values) != len(sort):
+        raise ValueError("Pagination cursor does not match the requested sort")
+    return values
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import Event, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+REPORT_STATUS_PROCESSING = "processing"
+REPORT_STATUS_COMPLETED = "completed"
+REPORT_STATUS_FAILED = "failed"
+
+REPORT_TTL_SECONDS = 86400
+
+ProgressCallback = Callable[[str, int], Any]
+
+
+def report_collection_name(report_id: str) -> str:
+    return f"report_{report_id}"
+
+
+def report_chunks_collection_name(report_id: str) -> str:
+    return f"report_{report_id}_chunks"
+
+
+def report_chunks(umu_ids: Iterable[Any]) -> List[Any]:
+    """The UMUs of a report, one chunk each, in a stable order.
+
+    A last None chunk covers the documents with a null or missing `umu_id`,
+    which `distinct` skips but the `$group` of the report counts.
+    """
+    chunks: List[Any] = sorted(
+        (umu_id for umu_id in umu_ids if umu_id is not None), key=str
+    )
+    chunks.append(None)
+    return chunks
+
+
+def chunk_filter(filters: Dict[str, Any], umu_id: Any) -> dict:
+    if not filters:
+        return {"umu_id": umu_id}
+    return {"$and": [filters, {"umu_id": umu_id}]}
+
+
+def build_stock_report_pipeline(match: dict, collection_name: str) -> List[dict]:
+    """Per-UMU/item stock totals merged into `collection_name`.
+
+    `$merge` instead of `$out` keeps the rows of the chunks already written, so
+    a run can be resumed, and re-running a chunk is idempotent. Rows are merged
+    on an `_id` made of the UMU and item: `$merge` rejects documents whose `on`
+    fields are null or missing, which the composed `_id` never is, even for the
+    stock without `umu_id` or `item.id`.
+    """
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    # null and missing are one row, like the last report chunk
+                    "umu_id": {"$ifNull": ["$umu_id", None]},
+                    "item_id": {"$ifNull": ["$item.id", None]},
+                },
+                "total_quantity": {"$sum": "$quantity"},
+                "description": {"$first": "$item.short_description"},
+            }
+        },
+        {
+            "$project": {
+                "umu_id": "$_id.umu_id",
+                "item_id": "$_id.item_id",
+                "description": "$description",
+                "total_quantity": "$total_quantity",
+                "createdAt": "$$NOW",
+            }
+        },
+        {
+            "$merge": {
+                "into": collection_name,
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def report_progress(done: int, total: int) -> int:
+    if not total:
+        return 100
+    return int(done * 100 / total)
+
+
+def chunk_done_update() -> dict:
+    """Record a merged chunk in the chunks collection (its `_id` is the UMU)."""
+    return {"$set": {"createdAt": datetime.now(timezone.utc)}}
+
+
+@dataclass
+class ReportRun:
+    """The chunks of one report run, and the ones already merged into it."""
+
+    chunks: List[Any]
+    done: Set[Any] = field(default_factory=set)
+
+    @property
+    def progress(self) -> int:
+        return report_progress(len(self.done), len(self.chunks))
+
+    def pending(self) -> List[Any]:
+        return [umu_id for umu_id in self.chunks if umu_id not in self.done]
+
+
+def plan_report(umu_ids: Iterable[Any], done: Iterable[Any]) -> ReportRun:
+    """The run of a report over `umu_ids`, resuming after the `done` chunks."""
+    chunks = report_chunks(umu_ids)
+    return ReportRun(chunks, set(done) & set(chunks))
+
+
+class ReportAggregationHandle:
+    """Handle of a report aggregation running in a background thread.
+
+    Poll it with `done()`/`progress`, or block with `wait()`/`result()`. The same
+    progress is reported to the `ReportRepository` given to the engine.
+    """
+
+    def __init__(self, report_id: str, collection_name: str):
+        self.report_id = report_id
+        self.collection_name = collection_name
+        self.progress = 0
+        self.error: Optional[BaseException] = None
+        self._finished = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self, target: Callable[["ReportAggregationHandle"], None]) -> None:
+        def run() -> None:
+            try:
+                target(self)
+            except BaseException as exc:  # reported through the handle
+                self.error = exc
+            finally:
+                self._finished.set()
+
+        self._thread = Thread(target=run, name=f"report-{self.report_id}", daemon=True)
+        self._thread.start()
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        """Wait for the report and return its collection name, or raise its error."""
+        if not self.wait(timeout):
+            raise TimeoutError(f"Report {self.report_id} is still running")
+        if self.error is not None:
+            raise self.error
+        return self.collection_name
@@ -0,0 +1,77 @@
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_CONCERNS = ("local", "available", "majority", "linearizable", "snapshot")
+
+# exports, cross-UMU searches and reports, see `MongoDbRepositoryCore`
+DEFAULT_ANALYTICS_READ_PREFERENCE = "secondaryPreferred"
+
+
+@dataclass(frozen=True)
+class ReadRouting:
+    """Where and how one kind of read goes; None keeps the collection default.
+
+    `max_staleness_seconds` only applies to the non-primary modes; the server
+    requires it to be at least 90.
+    """
+
+    read_preference: Optional[str] = None
+    read_concern: Optional[str] = None
+    max_staleness_seconds: Optional[int] = None
+
+    def __post_init__(self):
+        if (
+            self.read_preference is not None
+            and self.read_preference not in READ_PREFERENCES
+        ):
+            raise ValueError(f"Unknown read preference: {self.read_preference}")
+        if self.read_concern is not None and self.read_concern not in READ_CONCERNS:
+            raise ValueError(f"Unknown read concern: {self.read_concern}")
+        if self.max_staleness_seconds is not None and self.read_preference in (
+            None,
+            "primary",
+        ):
+            raise ValueError(
+                "max_staleness_seconds needs a non-primary read preference"
+            )
+
+    def replace(self, **changes: Any) -> "ReadRouting":
+        """A copy with the given fields changed, the None ones kept.
+
+        Switching to "primary" drops `max_staleness_seconds`.
+        """
+        changes = {key: value for key, value in changes.items() if value is not None}
+        if changes.get("read_preference") == "primary":
+            changes["max_staleness_seconds"] = None
+        return replace(self, **changes)
+
+    def collection_options(self) -> Dict[str, Any]:
+        """`Collection.with_options` keyword arguments, empty for the defaults."""
+        options: Dict[str, Any] = {}
+        if self.read_preference is not None:
+            mode = READ_PREFERENCES[self.read_preference]
+            if self.max_staleness_seconds is None:
+                options["read_preference"] = mode()
+            else:
+                options["read_preference"] = mode(
+                    max_staleness=self.max_staleness_seconds
+                )
+        if self.read_concern is not None:
+            options["read_concern"] = ReadConcern(self.read_concern)
+        return options
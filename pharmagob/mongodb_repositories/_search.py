@@ -0,0 +1,283 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# kind of filter -> (section of the compound operator, operator)
+_CLAUSES = {
+    "range": ("must", "range"),
+    "equals": ("filter", "equals"),
+    "in": ("filter", "in"),
+    "not in": ("mustNot", "in"),
+}
+
+
+class SearchSpec:
+    """Declarative shape of an Atlas Search autocomplete query.
+
+    A spec names the search index, the autocomplete path and the fields that can
+    be used as range, equality, `in` and `mustNot in` filters. `compile` turns the
+    values of one request into the `$search` stage.
+
+    The same declaration gives the field mappings of the search index: ranges
+    and sort fields are indexed as "number" (timestamps are stored in ms) and
+    filter fields as "token", unless `field_types` says otherwise.
+
+    Input matching `exact_pattern` is a complete value (a scanned CURP, a full
+    reference), which `exact_filter` turns into an equality on the B-tree index
+    of the autocomplete path instead.
+    """
+
+    def __init__(
+        self,
+        index: str,
+        autocomplete_path: str,
+        *,
+        default_sort: Dict[str, int],
+        ranges: Sequence[str] = (),
+        equals: Sequence[str] = (),
+        in_filters: Sequence[str] = (),
+        not_in_filters: Sequence[str] = (),
+        field_types: Optional[Dict[str, str]] = None,
+        exact_pattern: Optional[str] = None,
+    ):
+        self.index = index
+        self.autocomplete_path = autocomplete_path
+        self.default_sort = default_sort
+        self.ranges = tuple(ranges)
+        self.equals = tuple(equals)
+        self.in_filters = tuple(in_filters)
+        self.not_in_filters = tuple(not_in_filters)
+        self.field_types = dict(field_types or {})
+        self.exact_pattern = exact_pattern
+        self._exact_regex = re.compile(exact_pattern) if exact_pattern else None
+
+    def compile(
+        self,
+        query: str,
+        *,
+        sort: Optional[Dict[str, int]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        equals: Optional[Dict[str, Any]] = None,
+        in_filters: Optional[Dict[str, List[Any]]] = None,
+        not_in_filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> dict:
+        """Build the `$search` stage for one request.
+
+        Parameters:
+            query: The autocomplete input.
+            sort: The search sort, `default_sort` when None.
+            ranges: `{path: (gt, lt)}`, a None bound is left open.
+            equals: `{path: value}`, falsy values are ignored.
+            in_filters: `{path: values}` that must match, empty lists are ignored.
+            not_in_filters: `{path: values}` that must not match.
+
+        Returns:
+            dict: The `$search` stage body.
+        """
+        shape, values = self._bind(ranges, equals, in_filters, not_in_filters)
+        compound: Dict[str, List[dict]] = {
+            "must": [{"autocomplete": {"query": query, "path": self.autocomplete_path}}]
+        }
+        for (kind, path, bound_keys), value in zip(shape, values):
+            if bound_keys:
+                clause = {"path": path}
+                clause.update(zip(bound_keys, value))
+            else:
+                clause = {"path": path, "value": value}
+            section, operator = _CLAUSES[kind]
+            compound.setdefault(section, []).append({operator: clause})
+        return {
+            "index": self.index,
+            "compound": compound,
+            "sort": sort if sort is not None else self.default_sort,
+        }
+
+    def exact_filter(
+        self,
+        query: str,
+        *,
+        exact: Optional[bool] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        equals: Optional[Dict[str, Any]] = None,
+        in_filters: Optional[Dict[str, List[Any]]] = None,
+        not_in_filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> Optional[dict]:
+        """Build the `find` filter of an exact lookup, the same filters as `compile`.
+
+        Parameters:
+            exact: True looks `query` up as a complete value, False never does;
+                None does it when `query` matches `exact_pattern`.
+
+        Returns:
+            Optional[dict]: The filter, None when the input is partial.
+        """
+        value = query.strip()
+        if exact is None:
+            exact = self._exact_regex is not None and bool(
+                self._exact_regex.fullmatch(value)
+            )
+        if not exact or not value:
+            return None
+        shape, values = self._bind(ranges, equals, in_filters, not_in_filters)
+        filter: Dict[str, Any] = {self.autocomplete_path: value}
+        for (kind, path, bound_keys), bound in zip(shape, values):
+            if kind == "range":
+                condition = {f"${key}": item for key, item in zip(bound_keys, bound)}
+            elif kind == "equals":
+                condition = {"$eq": bound}
+            elif kind == "in":
+                condition = {"$in": list(bound)}
+            else:
+                condition = {"$nin": list(bound)}
+            if path == self.autocomplete_path:
+                # kept apart, an equality would replace the `$eq` of the input
+                filter.setdefault("$and", []).append({path: condition})
+            else:
+                filter.setdefault(path, {}).update(condition)
+        return filter
+
+    def index_fields(self) -> Dict[str, List[str]]:
+        """Return the Atlas Search types every path of the spec needs."""
+        fields: Dict[str, List[str]] = {self.autocomplete_path: ["autocomplete"]}
+        for paths, default_type in (
+            (self.ranges, "number"),
+            (tuple(self.default_sort), "number"),
+            (self.equals + self.in_filters + self.not_in_filters, "token"),
+        ):
+            for path in paths:
+                field_type = self.field_types.get(path, default_type)
+                types = fields.setdefault(path, [])
+                if field_type not in types:
+                    types.append(field_type)
+        return fields
+
+    def _bind(
+        self,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]],
+        equals: Optional[Dict[str, Any]],
+        in_filters: Optional[Dict[str, List[Any]]],
+        not_in_filters: Optional[Dict[str, List[Any]]],
+    ) -> Tuple[tuple, List[Any]]:
+        """Split the request into its shape (what is present) and its values."""
+        self._validate(ranges, self.ranges, "range")
+        self._validate(equals, self.equals, "equals")
+        self._validate(in_filters, self.in_filters, "in")
+        self._validate(not_in_filters, self.not_in_filters, "not in")
+        shape: List[tuple] = []
+        values: List[Any] = []
+        for path in self.ranges:
+            gt, lt = (ranges or {}).get(path, (None, None))
+            if gt is None and lt is None:
+                continue
+            bounds = [
+                (key, bound)
+                for key, bound in (("gt", gt), ("lt", lt))
+                if bound is not None
+            ]
+            shape.append(("range", path, tuple(key for key, _ in bounds)))
+            values.append(tuple(bound for _, bound in bounds))
+        for kind, declared, given in (
+            ("equals", self.equals, equals),
+            ("in", self.in_filters, in_filters),
+            ("not in", self.not_in_filters, not_in_filters),
+        ):
+            for path in declared:
+                value = (given or {}).get(path)
+                if value:
+                    shape.append((kind, path, ()))
+                    values.append(value)
+        return tuple(shape), values
+
+    @staticmethod
+    def _validate(
+        given: Optional[Dict[str, Any]], declared: Tuple[str, ...], kind: str
+    ) -> None:
+        for path in given or {}:
+            if path not in declared:
+                raise ValueError(f"Field not declared as {kind} filter: {path}")
+
+
+SEARCH_TOKEN_FIELD = "search_token"
+
+
+def build_search_stage(
+    search: dict,
+    *,
+    count: Optional[dict] = None,
+    search_after: Optional[str] = None,
+    search_before: Optional[str] = None,
+) -> dict:
+    stage = dict(search)
+    if count is not None:
+        stage["count"] = count
+    if search_after is not None:
+        stage["searchAfter"] = search_after
+    if search_before is not None:
+        stage["searchBefore"] = search_before
+    return stage
+
+
+def build_search_pipeline(
+    search: dict,
+    *,
+    page: int,
+    limit: int,
+    count: Optional[dict] = None,
+    search_after: Optional[str] = None,
+    search_before: Optional[str] = None,
+    search_tokens: bool = False,
+) -> List[dict]:
+    """Build the pipeline of one page of a `$search`.
+
+    The page is read with `$skip`/`$limit` or, when a sequence token is given,
+    with `searchAfter`/`searchBefore`. With `search_tokens` or a sequence token
+    every document carries its own token in `SEARCH_TOKEN_FIELD`. When `count`
+    is set the total is taken from `$$SEARCH_META` after the `$limit`, so only
+    the page reaches the `$facet`.
+    """
+    uses_tokens = search_after is not None or search_before is not None
+    pipeline: List[dict] = [
+        {
+            "$search": build_search_stage(
+                search,
+                count=count,
+                search_after=search_after,
+                search_before=search_before,
+            )
+        }
+    ]
+    if not uses_tokens and page > 1:
+        pipeline.append({"$skip": limit * (page - 1)})
+    pipeline.append({"$limit": limit})
+    if uses_tokens or search_tokens:
+        pipeline.append(
+            {"$addFields": {SEARCH_TOKEN_FIELD: {"$meta": "searchSequenceToken"}}}
+        )
+    if count is not None:
+        pipeline.append(
+            {
+                "$facet": {
+                    "results": [],
+                    "meta": [{"$replaceWith": "$$SEARCH_META"}, {"$limit": 1}],
+                }
+            }
+        )
+    return pipeline
+
+
+def build_search_meta_pipeline(search: dict, *, count: dict) -> List[dict]:
+    return [{"$searchMeta": build_search_stage(search, count=count)}]
+
+
+def parse_search_meta_count(meta: Optional[dict]) -> int:
+    count = (meta or {}).get("count") or {}
+    return count.get("total", count.get("lowerBound", 0))
+
+
+def build_search_stream_pipeline(
+    search: dict, *, limit: Optional[int] = None
+) -> List[dict]:
+    """Build a plain `$search` pipeline whose cursor is read lazily in batches."""
+    pipeline: List[dict] = [{"$search": search}]
+    if limit:
+        pipeline.append({"$limit": limit})
+    return pipeline
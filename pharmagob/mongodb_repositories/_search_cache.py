@@ -0,0 +1,324 @@
+import asyncio
+import re
+import unicodedata
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass
+from threading import Event, Lock
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from ._count import normalize_filter
+
+# defaults of the Atlas Search autocomplete mapping (edgeGram, lucene.standard)
+AUTOCOMPLETE_MIN_GRAMS = 2
+AUTOCOMPLETE_MAX_GRAMS = 15
+
+_WORD = re.compile(r"\w+")
+
+SearchPage = Tuple[Optional[int], List[dict]]
+
+
+def autocomplete_terms(text: str) -> Tuple[str, ...]:
+    """Approximate the analysis of the autocomplete mapping: words, lowercased,
+    diacritics folded."""
+    folded = "".join(
+        char
+        for char in unicodedata.normalize("NFKD", text)
+        if not unicodedata.combining(char)
+    )
+    return tuple(_WORD.findall(folded.lower()))
+
+
+def _path_value(document: dict, path: str) -> Any:
+    value: Any = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _matches(document: dict, path: str, terms: Tuple[str, ...]) -> bool:
+    """True when a word of `path` starts with one of the `terms`, like the
+    default `tokenOrder: "any"` of the autocomplete operator."""
+    value = _path_value(document, path)
+    if not isinstance(value, str):
+        return False
+    words = autocomplete_terms(value)
+    return any(
+        word.startswith(term)
+        for term in terms
+        if len(term) >= AUTOCOMPLETE_MIN_GRAMS
+        for word in words
+    )
+
+
+@dataclass(frozen=True)
+class SearchScope:
+    """The autocomplete query of a `$search` and the rest of the search around it.
+
+    `filters` is the normalized search without the query, so two scopes that
+    only differ by their `terms` share the same filters, sort and index.
+    """
+
+    collection: str
+    path: str
+    filters: str
+    terms: Tuple[str, ...]
+
+    def narrowed(self, terms: Tuple[str, ...]) -> "SearchScope":
+        return SearchScope(self.collection, self.path, self.filters, terms)
+
+
+def search_scope(collection: str, search: dict) -> Optional[SearchScope]:
+    """The scope of a compiled search, None when it cannot be cached.
+
+    Only searches with a single autocomplete clause and query words no longer
+    than `AUTOCOMPLETE_MAX_GRAMS` qualify; longer words are not indexed whole.
+    """
+    compound = search.get("compound") or {}
+    clauses = [
+        clause["autocomplete"]
+        for section in compound.values()
+        for clause in section
+        if "autocomplete" in clause
+    ]
+    if len(clauses) != 1 or not isinstance(clauses[0].get("path"), str):
+        return None
+    autocomplete = clauses[0]
+    terms = autocomplete_terms(str(autocomplete.get("query", "")))
+    if not terms or any(len(term) > AUTOCOMPLETE_MAX_GRAMS for term in terms):
+        return None
+    rest = {
+        **search,
+        "compound": {
+            section: [
+                (
+                    {"autocomplete": {**clause["autocomplete"], "query": None}}
+                    if "autocomplete" in clause
+                    else clause
+                )
+                for clause in section_clauses
+            ]
+            for section, section_clauses in compound.items()
+        },
+    }
+    return SearchScope(collection, autocomplete["path"], normalize_filter(rest), terms)
+
+
+class _FlightCancelled(Exception):
+    """The call a flight was waiting for was cancelled; its followers retry."""
+
+
+class _Flight:
+    """One call in flight; the `followers` waiting for it get copies of its result."""
+
+    def __init__(self, future: "Optional[asyncio.Future[Any]]" = None):
+        self.done = Event()
+        self.future = future
+        self.followers = 0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SearchSessionCache:
+    """Complete result sets of autocomplete searches, refined in memory as the
+    user keeps typing.
+
+    When the first page of a search holds every match (fewer than `limit`
+    documents), the set is kept; a later query that only extends the last word
+    of a cached one can only match a subset of it, so it is answered by
+    filtering the set without a round trip. The in-memory match approximates
+    the autocomplete mapping (see `autocomplete_terms`). Identical searches
+    in flight at the same time share one server call.
+
+    Can be shared by several repositories; writes done through a repository
+    drop the entries of its collection, the others expire after `ttl` seconds.
+    Memory is bounded by `maxsize` entries and `max_documents` documents, the
+    least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self, *, maxsize: int = 256, max_documents: int = 20000, ttl: float = 30.0
+    ):
+        if maxsize <= 0 or max_documents <= 0:
+            raise ValueError("maxsize and max_documents must be greater than 0")
+        self.maxsize = maxsize
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._entries: "OrderedDict[SearchScope, Tuple[float, List[dict]]]"
+        self._entries = OrderedDict()
+        self._documents = 0
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, _Flight] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(
+        self, scope: SearchScope, *, page: int, limit: int, count: bool = True
+    ) -> Optional[SearchPage]:
+        """One page of `scope` from a cached set, None when none covers it.
+
+        Parameters:
+            count: Return the total of matches, None like a "skip" count.
+        """
+        *words, last = scope.terms
+        documents = None
+        with self._lock:
+            for length in range(len(last), AUTOCOMPLETE_MIN_GRAMS - 1, -1):
+                key = scope.narrowed((*words, last[:length]))
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < monotonic():
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                documents = entry[1]
+                if length < len(last):
+                    documents = [
+                        document
+                        for document in documents
+                        if _matches(document, scope.path, scope.terms)
+                    ]
+                break
+            if documents is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            start = limit * (page - 1)
+            results = deepcopy(documents[start : start + limit])
+        return (len(documents) if count else None), results
+
+    def store(
+        self, scope: SearchScope, results: List[dict], *, page: int, limit: int
+    ) -> bool:
+        """Keep `results` when they are the complete set of matches of `scope`.
+
+        Returns:
+            bool: True if the set was cached.
+        """
+        if (
+            page != 1
+            or len(results) >= limit
+            or len(results) > self.max_documents
+            or len(scope.terms[-1]) < AUTOCOMPLETE_MIN_GRAMS
+            or not all(
+                isinstance(_path_value(document, scope.path), str)
+                for document in results
+            )
+        ):
+            return False
+        documents = deepcopy(results)
+        with self._lock:
+            if scope in self._entries:
+                self._remove(scope)
+            self._entries[scope] = (monotonic() + self.ttl, documents)
+            self._documents += len(documents)
+            while (
+                len(self._entries) > self.maxsize
+                or self._documents > self.max_documents
+            ):
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Run `loader`, or wait for the identical call already running it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return deepcopy(flight.result)
+        try:
+            flight.result = loader()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        # nobody joins once the flight is gone, the followers are all counted
+        return deepcopy(flight.result) if flight.followers else flight.result
+
+    async def aload(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Async `load`; calls only share a flight within one event loop.
+
+        When the call running `loader` is cancelled, the calls waiting for it
+        are not: one of them runs `loader` again.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            flight = self._async_flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _Flight(loop.create_future())
+                self._async_flights[flight_key] = flight
+            else:
+                flight.followers += 1
+                self.shared += 1
+        future = flight.future
+        if not leader:
+            try:
+                return deepcopy(await asyncio.shield(future))
+            except _FlightCancelled:
+                return await self.aload(key, loader)
+        try:
+            result = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(_FlightCancelled())
+            future.exception()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # retrieved, even when nobody else was waiting
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._async_flights[flight_key]
+        return deepcopy(result) if flight.followers else result
+
+    def invalidate(self, collection: str) -> None:
+        """Drop the sets of one collection, after a write to it."""
+        with self._lock:
+            for key in [key for key in self._entries if key.collection == collection]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._documents = 0
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "documents": self._documents,
+            "max_documents": self.max_documents,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "hit_ratio": (self.hits / requests) if requests else 0.0,
+        }
+
+    def _remove(self, key: SearchScope) -> None:
+        _, documents = self._entries.pop(key)
+        self._documents -= len(documents)
@@ -0,0 +1,297 @@
+from dataclasses import dataclass, field
+from time import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+QUANTITY_LOGS_COLLECTION = "location_content_quantity_logs"
+EVENTS_COLLECTION = "location_content_events"
+
+EVENT_QUANTITY_ADJUSTED = "quantity_adjusted"
+EVENT_STOCK_MOVED = "stock_moved"
+EVENT_ALLOCATION_CONSUMED = "allocation_consumed"
+
+# quantity set aside by `allocate(..., reserve=True)`, not available to others
+RESERVED_FIELD = "reserved"
+
+AVAILABLE_QUANTITY = {
+    "$subtract": ["$quantity", {"$ifNull": [f"${RESERVED_FIELD}", 0]}]
+}
+
+# paths fixed by the triad filter or by the update itself, never taken from
+# `StockMove.destination_defaults`
+_MANAGED_PATHS = ("item.id", "lot", "location.id", "quantity", "updated_at")
+
+
+class InsufficientStockError(ValueError):
+    """A decrement would take more than the available (unreserved) quantity.
+
+    `moves` are the positions, in the submitted batch, of the moves whose source
+    lacks stock (empty for a single `adjust_quantity`).
+    """
+
+    def __init__(self, message: str, moves: Optional[List[int]] = None):
+        super().__init__(message)
+        self.moves = moves or []
+
+
+@dataclass(frozen=True)
+class StockMove:
+    """Move `quantity` units of one item lot between two locations.
+
+    `destination_defaults` are written with `$setOnInsert` when the destination
+    location content does not exist yet, e.g. `{"umu_id": ..., "location.label_code":
+    ..., "item.short_description": ..., "expiration_date": ...}` (dotted paths).
+    """
+
+    item_id: str
+    lot: str
+    from_location_id: str
+    to_location_id: str
+    quantity: int
+    destination_defaults: Optional[Dict[str, Any]] = None
+    reference: Optional[str] = None
+
+    def __post_init__(self):
+        if self.quantity <= 0:
+            raise ValueError(f"A stock move needs a positive quantity: {self}")
+        if self.from_location_id == self.to_location_id:
+            raise ValueError(f"A stock move needs two different locations: {self}")
+
+
+@dataclass
+class StockMoveResult:
+    """Positions of the applied and rejected moves of a `move_stock` batch."""
+
+    moved: List[int] = field(default_factory=list)
+    failed: List[int] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def now_ms() -> int:
+    return round(time() * 1000)
+
+
+def triad_filter(item_id: str, lot: str, location_id: str) -> dict:
+    return {"item.id": item_id, "lot": lot, "location.id": location_id}
+
+
+def available_guard(quantity: int) -> dict:
+    """Match when at least `quantity` is available, reservations excluded."""
+    return {"$expr": {"$gte": [AVAILABLE_QUANTITY, quantity]}}
+
+
+def guarded_filter(
+    item_id: str, lot: str, location_id: str, delta: int, *, allow_negative: bool
+) -> dict:
+    """The triad filter, plus an `available_guard` when `delta` decrements."""
+    filter = triad_filter(item_id, lot, location_id)
+    if delta < 0 and not allow_negative:
+        filter.update(available_guard(-delta))
+    return filter
+
+
+def increment(delta: int, now: int) -> dict:
+    return {"$inc": {"quantity": delta}, "$set": {"updated_at": now}}
+
+
+def destination_update(move: StockMove, now: int) -> dict:
+    update = increment(move.quantity, now)
+    defaults = {
+        path: value
+        for path, value in (move.destination_defaults or {}).items()
+        if path not in _MANAGED_PATHS
+    }
+    defaults.setdefault("created_at", now)
+    update["$setOnInsert"] = defaults
+    return update
+
+
+def source_update(move: StockMove, now: int) -> Tuple[dict, dict]:
+    """The guarded filter and the decrement of the source of `move`."""
+    filter = guarded_filter(
+        move.item_id,
+        move.lot,
+        move.from_location_id,
+        -move.quantity,
+        allow_negative=False,
+    )
+    return filter, increment(-move.quantity, now)
+
+
+def move_operations(moves: Iterable[StockMove], now: int) -> List[UpdateOne]:
+    """The source decrement and destination upsert of each move, in order."""
+    operations = []
+    for move in moves:
+        operations.append(UpdateOne(*source_update(move, now)))
+        operations.append(destination_operation(move, now))
+    return operations
+
+
+def destination_operation(move: StockMove, now: int) -> UpdateOne:
+    return UpdateOne(
+        triad_filter(move.item_id, move.lot, move.to_location_id),
+        destination_update(move, now),
+        upsert=True,
+    )
+
+
+def quantity_log(
+    item_id: str,
+    lot: str,
+    location_id: str,
+    delta: int,
+    *,
+    now: int,
+    reason: Optional[str],
+    reference: Optional[str],
+    quantity: Optional[int] = None,
+) -> dict:
+    """One `location_content_quantity_logs` entry; `quantity` is the new total."""
+    log = {
+        "item_id": item_id,
+        "lot": lot,
+        "location_id": location_id,
+        "delta": delta,
+        "reason": reason,
+        "reference": reference,
+        "created_at": now,
+    }
+    if quantity is not None:
+        log["quantity"] = quantity
+    return log
+
+
+def stock_event(event_type: str, *, now: int, data: dict) -> dict:
+    """One `location_content_events` entry."""
+    return {"type": event_type, "data": data, "created_at": now}
+
+
+def adjustment_records(
+    document: dict,
+    delta: int,
+    *,
+    now: int,
+    reason: Optional[str],
+    reference: Optional[str],
+) -> Tuple[dict, dict]:
+    """The quantity log and event of an applied `adjust_quantity`."""
+    item_id = document["item"]["id"]
+    location_id = document["location"]["id"]
+    log = quantity_log(
+        item_id,
+        document["lot"],
+        location_id,
+        delta,
+        now=now,
+        reason=reason,
+        reference=reference,
+        quantity=document["quantity"],
+    )
+    event = stock_event(
+        EVENT_QUANTITY_ADJUSTED,
+        now=now,
+        data={
+            "location_content_id": document["_id"],
+            "item_id": item_id,
+            "lot": document["lot"],
+            "location_id": location_id,
+            "delta": delta,
+            "quantity": document["quantity"],
+            "reason": reason,
+            "reference": reference,
+        },
+    )
+    return log, event
+
+
+def move_records(
+    moves: Iterable[StockMove], *, now: int, reason: Optional[str]
+) -> Tuple[List[dict], List[dict]]:
+    """Two quantity logs (out and in) and one event per move."""
+    logs, events = [], []
+    for move in moves:
+        for location_id, delta in (
+            (move.from_location_id, -move.quantity),
+            (move.to_location_id, move.quantity),
+        ):
+            logs.append(
+                quantity_log(
+                    move.item_id,
+                    move.lot,
+                    location_id,
+                    delta,
+                    now=now,
+                    reason=reason,
+                    reference=move.reference,
+                )
+            )
+        events.append(
+            stock_event(
+                EVENT_STOCK_MOVED,
+                now=now,
+                data={
+                    "item_id": move.item_id,
+                    "lot": move.lot,
+                    "from_location_id": move.from_location_id,
+                    "to_location_id": move.to_location_id,
+                    "quantity": move.quantity,
+                    "reason": reason,
+                    "reference": move.reference,
+                },
+            )
+        )
+    return logs, events
+
+
+def short_moves(moves: List[StockMove], quantities: Dict[tuple, int]) -> List[int]:
+    """Positions of the moves a batch cannot apply, in order.
+
+    Parameters:
+        quantities: The available quantity of each source (reservations
+            excluded), keyed by `(item_id, lot, location_id)`; missing sources
+            count as empty.
+    """
+    available = dict(quantities)
+    short = []
+    for position, move in enumerate(moves):
+        source = (move.item_id, move.lot, move.from_location_id)
+        if available.get(source, 0) < move.quantity:
+            short.append(position)
+            continue
+        available[source] -= move.quantity
+        destination = (move.item_id, move.lot, move.to_location_id)
+        available[destination] = available.get(destination, 0) + move.quantity
+    return short
+
+
+def sources_filter(moves: Iterable[StockMove]) -> dict:
+    return {
+        "$or": [
+            triad_filter(move.item_id, move.lot, move.from_location_id)
+            for move in moves
+        ]
+    }
+
+
+# what `available_quantities` reads of the `sources_filter` documents
+SOURCE_PROJECTION = {
+    "item.id": 1,
+    "lot": 1,
+    "location.id": 1,
+    "quantity": 1,
+    RESERVED_FIELD: 1,
+}
+
+
+def available_quantities(sources: Iterable[dict]) -> Dict[tuple, int]:
+    """The `short_moves` quantities of the source documents."""
+    return {
+        (source["item"]["id"], source["lot"], source["location"]["id"]): (
+            source["quantity"] - source.get(RESERVED_FIELD, 0)
+        )
+        for source in sources
+    }
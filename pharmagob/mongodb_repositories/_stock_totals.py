@@ -0,0 +1,243 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+STOCK_TOTALS_CHECKPOINTS_COLLECTION = "stock_totals_checkpoints"
+RECOMPUTE_BATCH_SIZE = 500
+
+# server error codes: no change streams (standalone), resume token out of the oplog
+CHANGE_STREAMS_UNSUPPORTED_CODE = 40573
+CHANGE_STREAM_HISTORY_LOST_CODE = 286
+
+SYNC_MODE_AUTO = "auto"
+SYNC_MODE_CHANGE_STREAM = "change_stream"
+SYNC_MODE_POLL = "poll"
+SYNC_MODES = (SYNC_MODE_AUTO, SYNC_MODE_CHANGE_STREAM, SYNC_MODE_POLL)
+
+# events after which the stream cannot be resumed and the totals are rebuilt
+INVALIDATING_OPERATIONS = ("drop", "rename", "dropDatabase", "invalidate")
+
+_CONTENT_FIELDS = ("umu_id", "item.id", "item.short_description", "quantity")
+
+# only the fields the totals depend on travel with each event
+CHANGE_STREAM_PIPELINE: List[dict] = [
+    {
+        "$project": {
+            "operationType": 1,
+            "documentKey": 1,
+            **{f"fullDocument.{path}": 1 for path in _CONTENT_FIELDS},
+            **{f"fullDocumentBeforeChange.{path}": 1 for path in _CONTENT_FIELDS},
+        }
+    }
+]
+
+TotalKey = Tuple[Any, Any]
+
+
+def validate_sync_mode(mode: str) -> str:
+    if mode not in SYNC_MODES:
+        raise ValueError(f"Unknown stock totals sync mode: {mode}")
+    return mode
+
+
+def content_key(document: dict) -> TotalKey:
+    """The `(umu_id, item_id)` total a location content counts towards."""
+    return document.get("umu_id"), (document.get("item") or {}).get("id")
+
+
+def change_keys(change: dict) -> Set[TotalKey]:
+    """The totals a change event may have touched, as far as its images tell."""
+    return {
+        content_key(change[image])
+        for image in ("fullDocumentBeforeChange", "fullDocument")
+        if change.get(image) is not None
+    }
+
+
+def key_document(key: TotalKey) -> dict:
+    return {"umu_id": key[0], "item_id": key[1]}
+
+
+def key_filter(key: TotalKey) -> dict:
+    """The total of `key`, by its `_id` (see `totals_pipeline`)."""
+    return {"_id": key_document(key)}
+
+
+def totals_pipeline(match: dict) -> List[dict]:
+    """Per-UMU/item totals of the location contents matching `match`.
+
+    A total's `_id` is its `(umu_id, item_id)` key, null for a missing field
+    like `content_key` does: `$merge` can match on it even for the location
+    contents without `umu_id` or `item.id`, whose totals are null keys.
+    """
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "umu_id": {"$ifNull": ["$umu_id", None]},
+                    "item_id": {"$ifNull": ["$item.id", None]},
+                },
+                "total_quantity": {"$sum": "$quantity"},
+                "description": {"$first": "$item.short_description"},
+            }
+        },
+        {
+            "$project": {
+                "umu_id": "$_id.umu_id",
+                "item_id": "$_id.item_id",
+                "description": "$description",
+                "total_quantity": "$total_quantity",
+            }
+        },
+    ]
+
+
+def rebuild_pipeline(database_name: str, collection_name: str, now: int) -> List[dict]:
+    """All the totals, stamped with `now` and merged into `collection_name`."""
+    return totals_pipeline({}) + [
+        {"$set": {"updated_at": now}},
+        {
+            "$merge": {
+                "into": {"db": database_name, "coll": collection_name},
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+
+
+def keys_match(keys: Iterable[TotalKey]) -> dict:
+    """Location contents counting towards any of `keys`."""
+    return {"$or": [{"umu_id": umu_id, "item.id": item_id} for umu_id, item_id in keys]}
+
+
+def recompute_operations(
+    keys: Iterable[TotalKey], rows: Iterable[dict], now: int
+) -> List[UpdateOne]:
+    """Overwrite the totals of `keys` with the freshly aggregated `rows`.
+
+    Keys without a row no longer have any stock, their total becomes 0.
+    """
+    totals = {(row["umu_id"], row["item_id"]): row for row in rows}
+    operations = []
+    for key in keys:
+        row = totals.get(key, {})
+        update = {
+            **key_document(key),
+            "total_quantity": row.get("total_quantity", 0),
+            "updated_at": now,
+        }
+        if row.get("description") is not None:
+            update["description"] = row["description"]
+        operations.append(UpdateOne(key_filter(key), {"$set": update}, upsert=True))
+    return operations
+
+
+class TotalsBatch:
+    """Quantity deltas accumulated from change events, merged per total.
+
+    A delta needs the document before and after the change, i.e. the collection
+    must record pre- and post-images. Without them the contribution of the event
+    is unknown: its total goes to `dirty` (or, for a delete, only `unresolved` is
+    counted) and stays off until `rebuild` or `recompute`.
+    """
+
+    def __init__(self):
+        self.changes = 0
+        self.deltas: Dict[TotalKey, int] = {}
+        self.descriptions: Dict[TotalKey, str] = {}
+        self.dirty: Set[TotalKey] = set()
+        self.unresolved = 0
+        self.invalidated = False
+
+    def __len__(self) -> int:
+        return self.changes
+
+    def add_change(self, change: dict) -> None:
+        self.changes += 1
+        operation = change["operationType"]
+        if operation in INVALIDATING_OPERATIONS:
+            self.invalidated = True
+            return
+        before = change.get("fullDocumentBeforeChange")
+        after = change.get("fullDocument") if operation != "delete" else None
+        if operation != "insert" and before is None:
+            if after is None:
+                self.unresolved += 1
+            else:
+                self.dirty.add(content_key(after))
+            return
+        if operation in ("update", "replace") and after is None:
+            self.dirty.add(content_key(before))
+            return
+        if before is not None:
+            self._add(before, -1)
+        if after is not None:
+            self._add(after, 1)
+
+    def _add(self, document: dict, sign: int) -> None:
+        key = content_key(document)
+        self.deltas[key] = self.deltas.get(key, 0) + sign * (
+            document.get("quantity") or 0
+        )
+        description = (document.get("item") or {}).get("short_description")
+        if description is not None:
+            self.descriptions[key] = description
+
+    def operations(self, now: int) -> List[UpdateOne]:
+        """One `$inc` upsert per total with a non-zero delta."""
+        operations = []
+        for key, delta in self.deltas.items():
+            if not delta:
+                continue
+            update: Dict[str, Any] = {
+                "$inc": {"total_quantity": delta},
+                "$set": {"updated_at": now},
+                "$setOnInsert": key_document(key),
+            }
+            if key in self.descriptions:
+                update["$setOnInsert"]["description"] = self.descriptions[key]
+            operations.append(UpdateOne(key_filter(key), update, upsert=True))
+        return operations
+
+
+def checkpoint_update(
+    now: int,
+    *,
+    resume_token: Optional[dict] = None,
+    watermark: Optional[int] = None,
+    dirty: Iterable[TotalKey] = (),
+    unresolved: int = 0,
+) -> dict:
+    """Move the checkpoint forward, recording the events that could not be applied.
+
+    `dirty` totals and the `unresolved` counter accumulate until `rebuild`.
+    """
+    update: Dict[str, Any] = {"$set": {"updated_at": now}}
+    if resume_token is not None:
+        update["$set"]["resume_token"] = resume_token
+    if watermark is not None:
+        update["$set"]["watermark"] = watermark
+    dirty_totals = [key_document(key) for key in dirty]
+    if dirty_totals:
+        update["$addToSet"] = {"dirty": {"$each": dirty_totals}}
+    if unresolved:
+        update["$inc"] = {"unresolved": unresolved}
+    return update
+
+
+def rebuilt_checkpoint(
+    now: int, *, resume_token: Optional[dict], watermark: int
+) -> dict:
+    """Restart the checkpoint after a rebuild, forgetting dirty totals."""
+    update: Dict[str, Any] = {
+        "$set": {"updated_at": now, "rebuilt_at": now, "watermark": watermark},
+        "$unset": {"dirty": "", "unresolved": ""},
+    }
+    if resume_token is None:
+        update["$unset"]["resume_token"] = ""
+    else:
+        update["$set"]["resume_token"] = resume_token
+    return update
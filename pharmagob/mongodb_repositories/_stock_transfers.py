@@ -0,0 +1,96 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from pymongo import UpdateOne
+
+STOCK_TRANSFERS_COLLECTION = "stock_transfers"
+STOCK_TRANSFER_EVENTS_COLLECTION = "stock_transfer_events"
+
+# event field copied to `last_event` of the transfer
+EVENT_FIELD = "status"
+
+
+def latest_events_pipeline(
+    stock_transfer_ids: List[str],
+    *,
+    umu_id: Optional[str] = None,
+    projection: Optional[Union[list, dict]] = None,
+) -> List[dict]:
+    """The newest event of each transfer, one `{"_id": id, "event": ...}` row each.
+
+    The `$sort` follows the (stock_transfer_id, transition_timestamp) index, so
+    the events are read in index order and no in-memory sort is needed.
+    """
+    match: Dict[str, Any] = {"stock_transfer_id": {"$in": stock_transfer_ids}}
+    if umu_id:
+        match["umu_id"] = umu_id
+    pipeline: List[dict] = [
+        {"$match": match},
+        {"$sort": {"stock_transfer_id": 1, "transition_timestamp": -1}},
+        {"$group": {"_id": "$stock_transfer_id", "event": {"$first": "$$ROOT"}}},
+    ]
+    if projection is not None:
+        if not isinstance(projection, dict):
+            projection = {field: 1 for field in projection}
+        pipeline.append(
+            {"$project": {f"event.{key}": value for key, value in projection.items()}}
+        )
+    return pipeline
+
+
+def timeline_sort(descending: bool) -> List[Tuple[str, int]]:
+    """Sort of a batch of timelines, always a walk of the index in one direction."""
+    if descending:
+        return [("stock_transfer_id", 1), ("transition_timestamp", -1)]
+    return [("stock_transfer_id", -1), ("transition_timestamp", 1)]
+
+
+def with_transfer_id(
+    projection: Optional[Union[list, dict]],
+) -> Optional[Union[list, dict]]:
+    """`projection`, keeping `stock_transfer_id` so events can be grouped."""
+    if projection is None:
+        return None
+    if not isinstance(projection, dict):
+        return list(dict.fromkeys([*projection, "stock_transfer_id"]))
+    if any(value for key, value in projection.items() if key != "_id"):
+        return {**projection, "stock_transfer_id": 1}
+    projection = {
+        key: value for key, value in projection.items() if key != "stock_transfer_id"
+    }
+    return projection or None
+
+
+def group_timelines(
+    stock_transfer_ids: Iterable[str], events: Iterable[dict]
+) -> Dict[str, List[dict]]:
+    timelines: Dict[str, List[dict]] = {
+        stock_transfer_id: [] for stock_transfer_id in stock_transfer_ids
+    }
+    for event in events:
+        timelines[event["stock_transfer_id"]].append(event)
+    return timelines
+
+
+def last_event_filter(stock_transfer_id: Any, transition_timestamp: int) -> dict:
+    """Match the transfer unless it already records an event as new or newer."""
+    return {
+        "_id": stock_transfer_id,
+        "last_event_timestamp": {"$not": {"$gte": transition_timestamp}},
+    }
+
+
+def last_event_update(event: dict, *, event_field: str = EVENT_FIELD) -> dict:
+    return {
+        "$set": {
+            "last_event": event.get(event_field),
+            "last_event_timestamp": event["transition_timestamp"],
+            "last_event_id": event.get("_id"),
+        }
+    }
+
+
+def last_event_operation(event: dict, *, event_field: str = EVENT_FIELD) -> UpdateOne:
+    return UpdateOne(
+        last_event_filter(event["stock_transfer_id"], event["transition_timestamp"]),
+        last_event_update(event, event_field=event_field),
+    )
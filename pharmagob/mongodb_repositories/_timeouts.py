@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from time import monotonic
+from typing import Iterator, Optional
+
+import pymongo
+from pymongo.errors import ExecutionTimeout, PyMongoError
+
+# server error code of an operation killed by `maxTimeMS`
+MAX_TIME_MS_EXPIRED_CODE = 50
+
+# flag set on the timeout errors raised inside `write_timeout`
+_BUDGET_EXPIRED = "budget_expired"
+
+# share of the budget that must be left after the page for the "adaptive" count
+ADAPTIVE_COUNT_SHARE = 0.5
+
+
+class QueryTimeoutError(ExecutionTimeout):
+    """An operation of a repository ran out of its `max_time_ms` budget.
+
+    Still an `ExecutionTimeout`, so existing pymongo handlers keep working.
+    """
+
+    def __init__(self, operation: str, collection: str, max_time_ms: int):
+        super().__init__(
+            f"{operation} on {collection} exceeded its {max_time_ms} ms budget",
+            code=MAX_TIME_MS_EXPIRED_CODE,
+        )
+        self.operation = operation
+        self.collection = collection
+        self.max_time_ms = max_time_ms
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """True for `maxTimeMS` expirations and the client-side timeouts of a
+    `write_timeout` budget.
+
+    Server selection and network timeouts raised outside a budget mean the
+    deployment is unreachable, not that the query was too slow.
+    """
+    if isinstance(exc, ExecutionTimeout):
+        return exc.code == MAX_TIME_MS_EXPIRED_CODE
+    return getattr(exc, _BUDGET_EXPIRED, False)
+
+
+def validate_max_time_ms(max_time_ms: Optional[int]) -> Optional[int]:
+    if max_time_ms is not None and max_time_ms < 1:
+        raise ValueError("max_time_ms must be at least 1, None disables the budget")
+    return max_time_ms
+
+
+class Deadline:
+    """What is left of a time budget started when the deadline is created."""
+
+    def __init__(self, budget_ms: int):
+        self.budget_ms = budget_ms
+        self._started = monotonic()
+
+    def remaining_ms(self) -> int:
+        elapsed_ms = round((monotonic() - self._started) * 1000)
+        return max(0, self.budget_ms - elapsed_ms)
+
+    def allows_count(self) -> bool:
+        """True when enough of the budget is left to try an "adaptive" count."""
+        return self.remaining_ms() >= self.budget_ms * ADAPTIVE_COUNT_SHARE
+
+
+@contextmanager
+def write_timeout(max_time_ms: Optional[int]) -> Iterator[None]:
+    """`pymongo.timeout` for the writes run inside, a no-op without a budget.
+
+    Writes return no cursor, so the client-side timeout covers the whole round
+    trip, including the wait for a connection and for the write concern; the
+    timeouts it raises are flagged for `is_timeout`.
+    """
+    if max_time_ms is None:
+        yield
+        return
+    with pymongo.timeout(max_time_ms / 1000):
+        try:
+            yield
+        except PyMongoError as exc:
+            if exc.timeout:
+                setattr(exc, _BUDGET_EXPIRED, True)
+            raise
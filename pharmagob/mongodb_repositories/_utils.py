@@ -1,23 +1,221 @@
-from typing import Any, List, Tuple
-
-
-def convert_conditions_to_mongo(and_conditions: List[Tuple[str, str, Any]]) -> dict:
-    mongo_filter = {}
-    operator_map = {
-        ">=": "$gte",
-        "<=": "$lte",
-        ">": "$gt",
-        "<": "$lt",
-        "=": "$eq",
-        "in": "$in",
-        "not in": "$nin",
-    }
-
-    for field, op, value in and_conditions:
-        mongo_op = operator_map.get(op)
-        if not mongo_op:
-            raise ValueError(f"Operator not supported: {op}")
-        if field not in mongo_filter:
-            mongo_filter[field] = {}
-        mongo_filter[field][mongo_op] = value
-    return mongo_filter
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+Condition = Union[Tuple[str, str, Any], Tuple[str, Any]]
+
+OPERATOR_MAP: Dict[str, str] = {
+    ">=": "$gte",
+    "<=": "$lte",
+    ">": "$gt",
+    "<": "$lt",
+    "=": "$eq",
+    "!=": "$ne",
+    "in": "$in",
+    "not in": "$nin",
+    "exists": "$exists",
+    "regex": "$regex",
+}
+SPECIAL_OPERATORS = ("prefix", "between", "elemMatch")
+GROUP_OPERATORS = ("and", "or", "not")
+LIST_OPERATORS = ("in", "not in")
+
+
+class _Param:
+    """Placeholder of a compiled template, bound to one condition value."""
+
+    __slots__ = ("index", "transform")
+
+    def __init__(self, index: int, transform: Callable[[Any], Any] = lambda v: v):
+        self.index = index
+        self.transform = transform
+
+
+def _list_value(value: Any) -> list:
+    return list(value)
+
+
+def _prefix_value(value: Any) -> str:
+    # anchored and escaped, so the query can use an index on the field
+    return "^" + re.escape(value)
+
+
+def _validate_condition(condition: Any) -> None:
+    if not isinstance(condition, (tuple, list)) or len(condition) not in (2, 3):
+        raise ValueError(f"Invalid condition: {condition!r}")
+    if len(condition) == 2:
+        group, members = condition
+        if group not in GROUP_OPERATORS:
+            raise ValueError(f"Group not supported: {group}")
+        if group != "not" and not isinstance(members, (list, tuple)):
+            raise ValueError(f"The conditions of {group!r} must be a list")
+        if not members:
+            raise ValueError(f"The {group!r} group is empty")
+        return
+    field, op, value = condition
+    if not isinstance(field, str) or not field:
+        raise ValueError(f"Invalid field: {field!r}")
+    if op not in OPERATOR_MAP and op not in SPECIAL_OPERATORS:
+        raise ValueError(f"Operator not supported: {op}")
+    if op in LIST_OPERATORS and isinstance(value, (str, bytes, dict)):
+        raise ValueError(f"The value of {op!r} on {field!r} must be a list")
+    if op in LIST_OPERATORS and not hasattr(value, "__iter__"):
+        raise ValueError(f"The value of {op!r} on {field!r} must be a list")
+    if op == "between" and (not isinstance(value, (list, tuple)) or len(value) != 2):
+        raise ValueError(f"The value of 'between' on {field!r} must be (low, high)")
+    if op == "prefix" and not isinstance(value, str):
+        raise ValueError(f"The value of 'prefix' on {field!r} must be a string")
+
+
+def _group_members(condition: Condition) -> Sequence[Condition]:
+    group, members = condition
+    if group == "not" and (
+        not isinstance(members, list) or members and not _is_condition_list(members)
+    ):
+        return [members]
+    return members
+
+
+def _is_condition_list(value: Any) -> bool:
+    return isinstance(value, list) and all(
+        isinstance(item, (tuple, list)) and len(item) in (2, 3) for item in value
+    )
+
+
+def _shape(conditions: Sequence[Condition], values: List[Any]) -> tuple:
+    """Return the hashable shape of `conditions`, appending their values."""
+    shape = []
+    for condition in conditions:
+        _validate_condition(condition)
+        if len(condition) == 2:
+            shape.append((condition[0], _shape(_group_members(condition), values)))
+            continue
+        field, op, value = condition
+        if op == "elemMatch" and _is_condition_list(value):
+            shape.append((field, op, _shape(value, values)))
+            continue
+        values.append(value)
+        shape.append((field, op, None))
+    return tuple(shape)
+
+
+class _FilterBuilder:
+    """Collect the clauses of one AND level.
+
+    Each field keeps a single operator document; a second use of the same
+    operator on a field (or a second `$or`/`$nor`) goes to `$and` instead of
+    overwriting the first one.
+    """
+
+    def __init__(self):
+        self.filter: Dict[str, Any] = {}
+        self.extra: List[dict] = []
+
+    def add(self, field: str, operator: str, value: Any) -> None:
+        operators = self.filter.get(field)
+        if operators is None:
+            self.filter[field] = {operator: value}
+        elif operator in operators:
+            self.extra.append({field: {operator: value}})
+        else:
+            operators[operator] = value
+
+    def add_group(self, operator: str, clauses: List[dict]) -> None:
+        if operator in self.filter:
+            self.extra.append({operator: clauses})
+        else:
+            self.filter[operator] = clauses
+
+    def add_filter(self, mongo_filter: dict) -> None:
+        for key, value in mongo_filter.items():
+            if key == "$and":
+                self.extra.extend(value)
+            elif key.startswith("$"):
+                self.add_group(key, value)
+            else:
+                for operator, operand in value.items():
+                    self.add(key, operator, operand)
+
+    def build(self) -> dict:
+        if not self.extra:
+            return self.filter
+        if "$and" in self.filter:
+            self.filter["$and"].extend(self.extra)
+        else:
+            self.filter["$and"] = self.extra
+        return self.filter
+
+
+def _template(shape: tuple, counter: List[int]) -> dict:
+    builder = _FilterBuilder()
+    for clause in shape:
+        if len(clause) == 2:
+            group, members = clause
+            if group == "and":
+                builder.add_filter(_template(members, counter))
+            else:
+                branches = [_template((member,), counter) for member in members]
+                builder.add_group("$or" if group == "or" else "$nor", branches)
+            continue
+        field, op, sub_shape = clause
+        if op == "elemMatch" and sub_shape is not None:
+            builder.add(field, "$elemMatch", _template(sub_shape, counter))
+            continue
+        index = counter[0]
+        counter[0] += 1
+        if op == "between":
+            builder.add(field, "$gte", _Param(index, lambda value: value[0]))
+            builder.add(field, "$lte", _Param(index, lambda value: value[1]))
+        elif op == "prefix":
+            builder.add(field, "$regex", _Param(index, _prefix_value))
+        elif op == "elemMatch":
+            builder.add(field, "$elemMatch", _Param(index))
+        elif op == "exists":
+            builder.add(field, "$exists", _Param(index, bool))
+        elif op in LIST_OPERATORS:
+            builder.add(field, OPERATOR_MAP[op], _Param(index, _list_value))
+        else:
+            builder.add(field, OPERATOR_MAP[op], _Param(index))
+    return builder.build()
+
+
+@lru_cache(maxsize=512)
+def _compile(shape: tuple) -> dict:
+    return _template(shape, [0])
+
+
+def _bind(template: Any, values: List[Any]) -> Any:
+    if isinstance(template, _Param):
+        return template.transform(values[template.index])
+    if isinstance(template, dict):
+        return {key: _bind(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [_bind(value, values) for value in template]
+    return template
+
+
+def convert_conditions_to_mongo(and_conditions: List[Condition]) -> dict:
+    """Compile a list of conditions, implicitly AND-ed, into a MongoDB filter.
+
+    A condition is either `(field, operator, value)` or a group `(group, members)`:
+        - operators: ">=", "<=", ">", "<", "=", "!=", "in", "not in", "exists",
+          "regex", "prefix" (anchored, index friendly), "between" with a
+          `(low, high)` value (both inclusive) and "elemMatch" whose value is
+          a list of conditions on the array elements, or a raw filter.
+        - groups: ("or", [conditions]), ("and", [conditions]) and ("not",
+          condition or [conditions]), compiled to `$or`, a nested AND and `$nor`
+          (none of the members matches). Members of "or"/"not" that need
+          several clauses can be written as ("and", [...]).
+
+    A repeated operator on the same field is AND-ed through `$and` instead of
+    overwriting the previous one.
+
+    Templates are memoized by the shape of the conditions (fields, operators and
+    nesting), so only the values are bound on repeated queries.
+
+    Raises:
+        ValueError: On an unknown operator or group, or a malformed condition.
+    """
+    values: List[Any] = []
+    shape = _shape(and_conditions, values)
+    return _bind(_compile(shape), values)
@@ -1,5 +1,5 @@
-from .base import BaseMongoDbRepository
+from .logs import BaseLogRepository
 
 
-class AdministrativeIssueRecordRepository(BaseMongoDbRepository):
+class AdministrativeIssueRecordRepository(BaseLogRepository):
     pass
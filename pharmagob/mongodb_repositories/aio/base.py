@@ -0,0 +1,828 @@
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+    Union,
+)
+
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from .._bulk import (
+    BulkOperationBuilder,
+    BulkWriteSummary,
+    insert_operations,
+    iter_batches,
+    set_operations,
+    update_operations,
+)
+from .._cache import MISSING, TTLCache
+from .._core import MongoDbRepositoryCore
+from .._details import ordered_by_id
+from .._count import (
+    COUNT_ADAPTIVE,
+    COUNT_CACHED,
+    COUNT_CAPPED,
+    COUNT_ESTIMATED,
+    COUNT_EXACT,
+    COUNT_SKIP,
+    normalize_filter,
+)
+from .._indexes import IndexDrift, plan_indexes, plan_search_indexes
+from .._instrumentation import QueryEvent, QueryHooks, document_size, logger
+from .._routing import DEFAULT_ANALYTICS_READ_PREFERENCE
+from .._search import SearchSpec, build_search_meta_pipeline, parse_search_meta_count
+from .._search_cache import SearchSessionCache
+from .._timeouts import Deadline, QueryTimeoutError
+
+
+class AsyncMongoDbManager(Protocol):
+    """Any manager whose `get_collection` returns a Motor (asyncio) collection."""
+
+    def get_collection(self, collection_name: str) -> Any: ...
+
+
+class AsyncBaseMongoDbRepository(MongoDbRepositoryCore):
+    """Asyncio twin of `BaseMongoDbRepository` on top of Motor.
+
+    Every query is built by the same `MongoDbRepositoryCore` helpers as the sync
+    repository; only the I/O is awaited. Finds return the Motor cursor itself, so
+    callers can stream it with `async for`.
+    """
+
+    DEFAULT_QUERY_LIMIT = MongoDbRepositoryCore.DEFAULT_QUERY_LIMIT
+    DEFAULT_BULK_BATCH_SIZE = MongoDbRepositoryCore.DEFAULT_BULK_BATCH_SIZE
+    DEFAULT_CURSOR_BATCH_SIZE = MongoDbRepositoryCore.DEFAULT_CURSOR_BATCH_SIZE
+
+    def __init__(
+        self,
+        db_manager: AsyncMongoDbManager,
+        collection_name: str,
+        *,
+        verbose: bool = False,
+        count_policy: str = COUNT_EXACT,
+        count_cap: int = 1000,
+        count_cache_ttl: float = 30.0,
+        cache: Optional[TTLCache] = None,
+        hooks: Optional[QueryHooks] = None,
+        read_preference: Optional[str] = None,
+        read_concern: Optional[str] = None,
+        max_staleness_seconds: Optional[int] = None,
+        analytics_read_preference: Optional[str] = DEFAULT_ANALYTICS_READ_PREFERENCE,
+        max_time_ms: Optional[int] = None,
+        search_cache: Optional[SearchSessionCache] = None,
+    ):
+        super().__init__(
+            db_manager,
+            collection_name,
+            verbose=verbose,
+            count_policy=count_policy,
+            count_cap=count_cap,
+            count_cache_ttl=count_cache_ttl,
+            cache=cache,
+            hooks=hooks,
+            read_preference=read_preference,
+            read_concern=read_concern,
+            max_staleness_seconds=max_staleness_seconds,
+            analytics_read_preference=analytics_read_preference,
+            max_time_ms=max_time_ms,
+            search_cache=search_cache,
+        )
+
+    async def ensure_indexes(
+        self,
+        *,
+        dry_run: bool = False,
+        search_indexes: bool = True,
+        update_search_indexes: bool = False,
+    ) -> IndexDrift:
+        """See `BaseMongoDbRepository.ensure_indexes`."""
+        drift = IndexDrift(self._collection.name)
+        to_create = plan_indexes(
+            drift, self.index_specs(), await self._collection.index_information()
+        )
+        if to_create and not dry_run:
+            try:
+                await self._collection.create_indexes(
+                    [spec.model() for spec in to_create]
+                )
+            except OperationFailure as exc:
+                drift.errors.append(str(exc))
+            else:
+                drift.created, drift.missing = drift.missing, []
+        search_specs = self.search_index_specs()
+        if not search_indexes or not search_specs:
+            return drift
+        try:
+            existing = await self._collection.list_search_indexes().to_list(None)
+        except OperationFailure as exc:
+            drift.errors.append(str(exc))
+            return drift
+        to_create_search, to_update = plan_search_indexes(drift, search_specs, existing)
+        if dry_run:
+            return drift
+        try:
+            for spec in to_create_search:
+                await self._collection.create_search_index(
+                    {"name": spec.name, "definition": spec.definition}
+                )
+                drift.search_missing.remove(spec.name)
+                drift.search_created.append(spec.name)
+            for spec in to_update if update_search_indexes else ():
+                await self._collection.update_search_index(spec.name, spec.definition)
+                drift.search_changed.remove(spec.name)
+                drift.search_updated.append(spec.name)
+        except OperationFailure as exc:
+            drift.errors.append(str(exc))
+        return drift
+
+    async def create(self, data: dict) -> None:
+        with self._observe("insert_one"), self._write_timeout():
+            await self._collection.insert_one(data)
+        self._invalidate_queries()
+
+    async def update(self, document_id, *, data: dict) -> int:
+        with self._observe("update_one", filter={"_id": document_id}):
+            with self._write_timeout():
+                result = await self._collection.update_one(
+                    {"_id": document_id}, update={"$set": data}, upsert=False
+                )
+        self._invalidate_document(document_id)
+        return result.modified_count
+
+    async def update_many(
+        self, and_conditions: Optional[List[Tuple[str, str, Any]]], *, data: dict
+    ) -> int:
+        parsed_filter = self._conditions_filter(and_conditions)
+        with self._observe("update_many", filter=parsed_filter):
+            with self._write_timeout():
+                result = await self._collection.update_many(
+                    parsed_filter, update={"$set": data}, upsert=False
+                )
+        self._invalidate_cache()
+        return result.modified_count
+
+    async def set(
+        self, document_id, *, data: dict, write_only_if_insert: bool = False
+    ) -> int:
+        update = {"$set": data}
+        if write_only_if_insert:
+            update = {"$setOnInsert": data}
+        with self._observe("upsert_one", filter={"_id": document_id}):
+            with self._write_timeout():
+                result = await self._collection.update_one(
+                    {"_id": document_id}, update=update, upsert=True
+                )
+        self._invalidate_document(document_id)
+        return result.matched_count
+
+    def bulk(
+        self, *, ordered: bool = True, batch_size: int = DEFAULT_BULK_BATCH_SIZE
+    ) -> BulkOperationBuilder:
+        """Start a builder whose `execute()` must be awaited."""
+        return BulkOperationBuilder(self, ordered=ordered, batch_size=batch_size)
+
+    async def bulk_write(
+        self,
+        operations: Iterable[Any],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        summary = BulkWriteSummary()
+        offset = 0
+        try:
+            with self._write_timeout():
+                for batch in iter_batches(operations, batch_size):
+                    try:
+                        with self._observe("bulk_write") as event:
+                            if event is not None:
+                                event.documents = len(batch)
+                            result = await self._collection.bulk_write(
+                                batch, ordered=ordered
+                            )
+                    except BulkWriteError as exc:
+                        summary.add_details(exc.details, offset=offset)
+                        if ordered:
+                            break
+                    else:
+                        summary.add_result(result)
+                    offset += len(batch)
+        finally:
+            self._invalidate_cache()
+        return summary
+
+    async def create_many(
+        self,
+        documents: Iterable[dict],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        return await self.bulk_write(
+            insert_operations(documents), ordered=ordered, batch_size=batch_size
+        )
+
+    async def update_many_by_id(
+        self,
+        updates: Iterable[Tuple[Any, dict]],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        return await self.bulk_write(
+            update_operations(updates), ordered=ordered, batch_size=batch_size
+        )
+
+    async def set_many(
+        self,
+        documents: Iterable[Tuple[Any, dict]],
+        *,
+        write_only_if_insert: bool = False,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        return await self.bulk_write(
+            set_operations(documents, write_only_if_insert=write_only_if_insert),
+            ordered=ordered,
+            batch_size=batch_size,
+        )
+
+    async def get(
+        self,
+        document_id,
+        *,
+        umu_id: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> Optional[dict]:
+        projection = self._resolve_projection(projection)
+        cache_key = self._document_cache_key(
+            document_id, umu_id=umu_id, sort=sort, projection=projection
+        )
+        if cache_key is not None and self.cache is not None:
+            cached_data = self.cache.get(cache_key)
+            if cached_data is not MISSING:
+                return cached_data
+        document_data = await self._find_one(
+            self._id_filter(document_id, umu_id), sort=sort, projection=projection
+        )
+        self._cache_document(cache_key, document_data)
+        return document_data
+
+    async def get_many(
+        self,
+        document_ids: Iterable[Any],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[Optional[dict]]:
+        """Retrieve many documents by their unique identifiers in one query.
+
+        Parameters:
+            document_ids: The unique identifiers, duplicates are allowed.
+
+        Returns:
+            List[Optional[dict]]: One entry per input id, in the same order, None
+                for the ids that were not found.
+        """
+        document_ids = list(document_ids)
+        projection = self._resolve_projection(projection)
+        found, pending = self._cached_many(
+            document_ids, umu_id=umu_id, projection=projection
+        )
+        if pending:
+            filter, full_projection = self._many_query(
+                pending, umu_id=umu_id, projection=projection
+            )
+            with self._observe("find_many", filter=filter) as event:
+                documents = (
+                    await self._read_collection()
+                    .find(
+                        filter,
+                        projection=full_projection,
+                        **self._max_time(option="max_time_ms"),
+                    )
+                    .to_list(length=None)
+                )
+                self._record_documents(event, documents)
+            self._store_many(found, documents, umu_id=umu_id, projection=projection)
+        return [found.get(document_id) for document_id in document_ids]
+
+    async def get_with_details(
+        self,
+        document_id,
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        details_projection: Optional[Union[list, dict, str]] = None,
+        details_sort: Optional[List[Tuple[str, int]]] = None,
+        details_limit: Optional[int] = None,
+    ) -> Optional[dict]:
+        documents = await self._aggregate_details(
+            self._id_filter(document_id, umu_id),
+            umu_id=umu_id,
+            projection=projection,
+            details_projection=details_projection,
+            details_sort=details_sort,
+            details_limit=details_limit,
+        )
+        return documents[0] if documents else None
+
+    async def get_many_with_details(
+        self,
+        document_ids: Iterable[Any],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        details_projection: Optional[Union[list, dict, str]] = None,
+        details_sort: Optional[List[Tuple[str, int]]] = None,
+        details_limit: Optional[int] = None,
+    ) -> List[Optional[dict]]:
+        document_ids = list(document_ids)
+        unique_ids = self._unique_ids(document_ids)
+        if not unique_ids:
+            return []
+        match: dict = {"_id": {"$in": unique_ids}}
+        if umu_id:
+            match["umu_id"] = umu_id
+        documents = await self._aggregate_details(
+            match,
+            umu_id=umu_id,
+            projection=projection,
+            details_projection=details_projection,
+            details_sort=details_sort,
+            details_limit=details_limit,
+        )
+        return ordered_by_id(document_ids, documents)
+
+    async def get_paginated(
+        self,
+        page: int = 1,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        *,
+        umu_id: Optional[str] = None,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        return await self._find_page(
+            self._conditions_filter(and_conditions, umu_id),
+            sort=sort,
+            skip=(page - 1) * limit,
+            limit=limit,
+            projection=projection,
+            count_policy=count_policy,
+            raw=raw,
+        )
+
+    async def get_paginated_by_cursor(
+        self,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        *,
+        cursor: Optional[str] = None,
+        umu_id: Optional[str] = None,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[str], List[dict]]:
+        parsed_filter, full_sort, full_projection = self._cursor_query(
+            self._conditions_filter(and_conditions, umu_id),
+            cursor=cursor,
+            sort=sort,
+            projection=self._resolve_projection(projection),
+        )
+        with self._observe("find", filter=parsed_filter) as event:
+            results = (
+                await self._read_collection(raw)
+                .find(
+                    parsed_filter,
+                    sort=full_sort,
+                    limit=limit,
+                    projection=full_projection,
+                    **self._max_time(option="max_time_ms"),
+                )
+                .to_list(length=limit)
+            )
+            self._record_documents(event, results)
+        return self._next_cursor(results, limit=limit, sort=full_sort), results
+
+    async def iter_all(
+        self,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        *,
+        umu_id: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+        raw: bool = False,
+    ) -> AsyncIterator[dict]:
+        filter = self._conditions_filter(and_conditions, umu_id)
+        projection = self._resolve_projection(projection)
+        cursor = self._observe_async_cursor(
+            "iter",
+            self._read_collection(raw, analytics=True).find(
+                filter,
+                sort=sort,
+                projection=projection,
+                batch_size=batch_size,
+                **self._max_time(option="max_time_ms"),
+            ),
+            filter=filter,
+        )
+        async for document in cursor:
+            yield document
+
+    async def iter_search(
+        self,
+        spec: SearchSpec,
+        query: str,
+        *,
+        limit: Optional[int] = None,
+        batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+        sort: Optional[Dict[str, int]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        equals: Optional[Dict[str, Any]] = None,
+        in_filters: Optional[Dict[str, List[Any]]] = None,
+        not_in_filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> AsyncIterator[dict]:
+        pipeline = self._search_stream_query(
+            spec,
+            query,
+            limit=limit,
+            sort=sort,
+            ranges=ranges,
+            equals=equals,
+            in_filters=in_filters,
+            not_in_filters=not_in_filters,
+        )
+        cursor = self._observe_async_cursor(
+            "iter_search",
+            self._read_collection(analytics=True).aggregate(
+                pipeline=pipeline, batchSize=batch_size, **self._max_time()
+            ),
+            filter=pipeline[0],
+        )
+        async for document in cursor:
+            yield document
+
+    async def _count_documents(
+        self,
+        filter: dict,
+        *,
+        count_policy: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[int]:
+        policy = self._count_strategy(filter, count_policy)
+        if policy == COUNT_SKIP:
+            return None
+        cache_key = None
+        if policy == COUNT_CACHED:
+            cache_key = normalize_filter(filter)
+            cached_count = self._count_cache.get(cache_key)
+            if cached_count is not None:
+                return cached_count
+        if policy == COUNT_ADAPTIVE:
+            deadline = deadline or self._deadline()
+            if deadline is not None and not deadline.allows_count():
+                return None
+        max_time = self._max_time(deadline)
+        try:
+            with self._observe("count", filter=filter) as event:
+                if policy == COUNT_ESTIMATED:
+                    count = await self._read_collection().estimated_document_count(
+                        **max_time
+                    )
+                elif policy == COUNT_CAPPED:
+                    count = await self._read_collection().count_documents(
+                        filter, limit=self.count_cap + 1, **max_time
+                    )
+                else:
+                    count = await self._read_collection().count_documents(
+                        filter, **max_time
+                    )
+                if event is not None:
+                    event.documents = count
+        except QueryTimeoutError:
+            if policy != COUNT_ADAPTIVE:
+                raise
+            logger.info("Count on %s skipped, over budget", self._collection.name)
+            return None
+        if cache_key is not None:
+            self._count_cache.put(cache_key, count)
+        return count
+
+    async def _find_page(
+        self,
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        skip: int = 0,
+        limit: int = 0,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        deadline = self._deadline()
+        adaptive = self._count_strategy(filter, count_policy) == COUNT_ADAPTIVE
+        documents_count = None
+        if not adaptive:
+            documents_count = await self._count_documents(
+                filter, count_policy=count_policy
+            )
+        documents_cursor = self._observe_async_cursor(
+            "find",
+            self._read_collection(raw).find(
+                filter,
+                sort=sort,
+                skip=skip,
+                limit=limit,
+                projection=self._resolve_projection(projection),
+                **self._max_time(option="max_time_ms"),
+            ),
+            filter=filter,
+        )
+        if adaptive:  # the page first, the count only gets what is left
+            documents = [document async for document in documents_cursor]
+            documents_count = await self._count_documents(
+                filter, count_policy=count_policy, deadline=deadline
+            )
+            return documents_count, _iterate(documents)
+        return documents_count, documents_cursor
+
+    async def _aggregate_details(self, match: dict, **options: Any) -> List[dict]:
+        pipeline = self._details_query(match, **options)
+        with self._observe("find_with_details", filter=match) as event:
+            documents = (
+                await self._read_collection()
+                .aggregate(pipeline, **self._max_time())
+                .to_list(length=None)
+            )
+            self._record_documents(event, documents)
+        return documents
+
+    async def _find_one(
+        self,
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> Optional[dict]:
+        with self._observe("find_one", filter=filter) as event:
+            document = await self._read_collection().find_one(
+                filter,
+                sort=sort,
+                projection=self._resolve_projection(projection),
+                **self._max_time(option="max_time_ms"),
+            )
+            self._record_documents(event, [document])
+        return document
+
+    async def _cached_find_page(
+        self,
+        cache_key: Optional[tuple],
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        if cache_key is None or self.cache is None or raw:
+            return await self._find_page(
+                filter,
+                sort=sort,
+                limit=limit,
+                projection=projection,
+                count_policy=count_policy,
+                raw=raw,
+            )
+        cached_page = self.cache.get(cache_key)
+        if cached_page is MISSING:
+            documents_count, documents_cursor = await self._find_page(
+                filter,
+                sort=sort,
+                limit=limit,
+                projection=projection,
+                count_policy=count_policy,
+            )
+            documents = [document async for document in documents_cursor]
+            cached_page = (documents_count, documents)
+            self._cache_query(cache_key, cached_page)
+        documents_count, documents = cached_page
+        return documents_count, _iterate(documents)
+
+    async def _search(
+        self,
+        search: dict,
+        *,
+        page: int = 1,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        analytics: bool = False,
+        exact_filter: Optional[dict] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        if (
+            exact_filter is not None
+            and search_after is None
+            and search_before is None
+            and not search_tokens
+        ):
+            exact_page = await self._exact_page(
+                exact_filter,
+                sort=list(search["sort"].items()),
+                page=page or 1,
+                limit=limit or self.DEFAULT_QUERY_LIMIT,
+                count_policy=count_policy,
+                analytics=analytics,
+            )
+            if exact_page is not None:
+                return exact_page
+        scope = self._search_scope(
+            search,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+        if scope is None:
+            return await self._run_search(
+                search,
+                page=page,
+                limit=limit,
+                count_policy=count_policy,
+                search_after=search_after,
+                search_before=search_before,
+                search_tokens=search_tokens,
+                analytics=analytics,
+            )
+        page, limit = page or 1, limit or self.DEFAULT_QUERY_LIMIT
+        cached_page = self.search_cache.lookup(
+            scope,
+            page=page,
+            limit=limit,
+            count=self._search_count(count_policy) is not None,
+        )
+        if cached_page is not None:
+            return cached_page
+
+        async def load() -> Tuple[Optional[int], List[dict]]:
+            total_count, results = await self._run_search(
+                search,
+                page=page,
+                limit=limit,
+                count_policy=count_policy,
+                analytics=analytics,
+            )
+            self.search_cache.store(scope, results, page=page, limit=limit)
+            return total_count, results
+
+        return await self.search_cache.aload(
+            (scope, page, limit, count_policy or self.count_policy), load
+        )
+
+    async def _run_search(
+        self,
+        search: dict,
+        *,
+        page: int,
+        limit: int,
+        count_policy: Optional[str],
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        analytics: bool = False,
+    ) -> Tuple[Optional[int], List[dict]]:
+        pipeline, count = self._search_query(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+        total_count: Optional[int] = None
+        deadline = self._deadline()
+        with self._observe("search", filter=search) as event:
+            aggregation_cursor = self._read_collection(analytics=analytics).aggregate(
+                pipeline=pipeline, **self._max_time(deadline)
+            )
+            if count is None:
+                results = await aggregation_cursor.to_list(length=None)
+            else:
+                data: dict = (await aggregation_cursor.to_list(length=1))[0]
+                results = data.get("results", [])
+                metas = data.get("meta", [])
+                if metas:
+                    total_count = parse_search_meta_count(metas[0])
+                else:
+                    meta_cursor = self._read_collection(analytics=analytics).aggregate(
+                        pipeline=build_search_meta_pipeline(search, count=count),
+                        **self._max_time(deadline),
+                    )
+                    meta = await meta_cursor.to_list(length=1)
+                    total_count = parse_search_meta_count(meta[0] if meta else None)
+            self._record_documents(event, results)
+        if search_before is not None:
+            results.reverse()
+        return total_count, results
+
+    async def _exact_page(
+        self,
+        filter: dict,
+        *,
+        sort: List[Tuple[str, int]],
+        page: int,
+        limit: int,
+        count_policy: Optional[str] = None,
+        analytics: bool = False,
+    ) -> Optional[Tuple[Optional[int], List[dict]]]:
+        deadline = self._deadline()
+        skip = limit * (page - 1)
+        collection = self._read_collection(analytics=analytics)
+        with self._observe("search_exact", filter=filter) as event:
+            results = await collection.find(
+                filter,
+                sort=sort,
+                skip=skip,
+                limit=limit,
+                **self._max_time(deadline, option="max_time_ms"),
+            ).to_list(length=None)
+            self._record_documents(event, results)
+        if not results and (
+            page == 1
+            or await collection.find_one(
+                filter, {"_id": 1}, **self._max_time(deadline, option="max_time_ms")
+            )
+            is None
+        ):
+            return None
+        if self._count_strategy(filter, count_policy) == COUNT_SKIP:
+            return None, results
+        if 0 < len(results) < limit:
+            return skip + len(results), results
+        return (
+            await self._count_documents(
+                filter, count_policy=count_policy, deadline=deadline
+            ),
+            results,
+        )
+
+    def _observe_async_cursor(
+        self, operation: str, cursor: Any, *, filter: Any = None
+    ) -> Any:
+        """Async `_observe_cursor`: hooks run once the Motor cursor is exhausted.
+
+        Explain is not run for async repositories, it would block the loop.
+        """
+        if self.hooks is None and self.max_time_ms is None:
+            return cursor
+        return _observed(
+            self, operation, self._start_event(operation, filter=filter), cursor
+        )
+
+
+async def _iterate(documents: List[dict]) -> AsyncIterator[dict]:
+    for document in documents:
+        yield document
+
+
+async def _observed(
+    repository: MongoDbRepositoryCore,
+    operation: str,
+    event: Optional[QueryEvent],
+    cursor: Any,
+) -> AsyncIterator[dict]:
+    documents = 0
+    size = 0
+    hooks = repository.hooks
+    measure_bytes = hooks is not None and hooks.measure_bytes
+    try:
+        async for document in cursor:
+            documents += 1
+            if measure_bytes:
+                size += document_size(document)
+            yield document
+    except BaseException as exc:
+        if event is not None:
+            event.documents = documents
+        repository._finish_event(event, None if isinstance(exc, GeneratorExit) else exc)
+        timeout_error = repository._timeout_error(operation, exc)
+        if timeout_error is not None:
+            raise timeout_error from exc
+        raise
+    if event is not None:
+        event.documents = documents
+        event.bytes = size if measure_bytes else None
+    repository._finish_event(event)
@@ -0,0 +1,29 @@
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from ..dispatch_record_details import DispatchRecordDetailRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncDispatchRecordDetailRepository(
+    DispatchRecordDetailRepositoryCore, AsyncBaseMongoDbRepository
+):
+    async def get_by_dispatch_record_id(
+        self,
+        dispatch_record_id,
+        *,
+        umu_id: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        filter = self._dispatch_record_id_filter(dispatch_record_id, umu_id=umu_id)
+        return await self._find_page(
+            filter,
+            sort=sort,
+            projection=projection,
+            limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
+        )
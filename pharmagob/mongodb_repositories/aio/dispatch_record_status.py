@@ -0,0 +1,5 @@
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncDispatchRecordStatusRepository(AsyncBaseMongoDbRepository):
+    pass
@@ -0,0 +1,47 @@
+from typing import List, Optional, Tuple
+
+from ..dispatch_records import DispatchRecordRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncDispatchRecordRepository(
+    DispatchRecordRepositoryCore, AsyncBaseMongoDbRepository
+):
+    async def search_by_reference(
+        self,
+        reference_id: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
+        umu_id: Optional[str] = None,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        dispatch_at_gt: Optional[int] = None,
+        dispatch_at_lt: Optional[int] = None,
+        service: Optional[str] = None
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._reference_search(
+            reference_id,
+            exact=exact,
+            umu_id=umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            dispatch_at_gt=dispatch_at_gt,
+            dispatch_at_lt=dispatch_at_lt,
+            service=service,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
@@ -0,0 +1,66 @@
+from typing import List, Optional, Tuple
+
+from ..doctors import DoctorsRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncDoctorsRepository(DoctorsRepositoryCore, AsyncBaseMongoDbRepository):
+    async def search_by_employee_or_licence(
+        self,
+        employee_number: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        umu_id: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._employee_or_licence_search(
+            employee_number,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+
+    async def search_by_full_name(
+        self,
+        full_name: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        umu_id: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._full_name_search(
+            full_name,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
@@ -0,0 +1,5 @@
+from .logs import AsyncBaseLogRepository
+
+
+class AsyncItemLogRepository(AsyncBaseLogRepository):
+    pass
@@ -0,0 +1,37 @@
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from ..items import ItemsRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncItemsRepository(ItemsRepositoryCore, AsyncBaseMongoDbRepository):
+    async def get_by_foreign_id(
+        self,
+        foreign_id,
+        *,
+        umu_id: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        filter = self._foreign_id_filter(foreign_id, umu_id=umu_id)
+        cache_key = self._query_cache_key(
+            "get_by_foreign_id",
+            foreign_id=foreign_id,
+            umu_id=umu_id,
+            sort=sort,
+            projection=projection,
+            limit=limit,
+            count_policy=count_policy,
+        )
+        return await self._cached_find_page(
+            cache_key,
+            filter,
+            sort=sort,
+            projection=projection,
+            limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
+        )
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Union
+
+from .base import AsyncBaseMongoDbRepository
+
+
+class DocumentLoader:
+    """Coalesce concurrent single-document reads into batched `get_many` calls.
+
+    Every `load` issued during the same event loop tick is collected and sent as
+    one `$in` query once the tick ends, so rendering N related documents from
+    independent coroutines costs one round trip instead of N.
+
+    Example:
+        loader = DocumentLoader(items_repository, projection=["name"])
+        first, second = await asyncio.gather(
+            loader.load(item_id), loader.load(other_item_id)
+        )
+    """
+
+    def __init__(
+        self,
+        repository: AsyncBaseMongoDbRepository,
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        max_batch_size: int = AsyncBaseMongoDbRepository.DEFAULT_BULK_BATCH_SIZE,
+    ):
+        self._repository = repository
+        self.umu_id = umu_id
+        self.projection = projection
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Any, List[asyncio.Future]] = {}
+        self._scheduled = False
+        # the event loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, document_id) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.setdefault(document_id, []).append(future)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return await future
+
+    async def load_many(self, document_ids: List[Any]) -> List[Optional[dict]]:
+        return list(
+            await asyncio.gather(
+                *(self.load(document_id) for document_id in document_ids)
+            )
+        )
+
+    def _dispatch(self) -> None:
+        pending, self._pending = self._pending, {}
+        self._scheduled = False
+        document_ids = list(pending)
+        for start in range(0, len(document_ids), self.max_batch_size):
+            batch = {
+                document_id: pending[document_id]
+                for document_id in document_ids[start : start + self.max_batch_size]
+            }
+            task = asyncio.ensure_future(self._load_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, batch: Dict[Any, List[asyncio.Future]]) -> None:
+        try:
+            documents = await self._repository.get_many(
+                list(batch), umu_id=self.umu_id, projection=self.projection
+            )
+        except asyncio.CancelledError:
+            for futures in batch.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as exc:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        for futures, document in zip(batch.values(), documents):
+            for future in futures:
+                if not future.done():
+                    future.set_result(document)
@@ -0,0 +1,429 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from .._allocation import (
+    AllocationPlan,
+    build_plan,
+    requested_quantities,
+    reservation_operations,
+)
+from .._reports import (
+    REPORT_STATUS_COMPLETED,
+    REPORT_STATUS_FAILED,
+    REPORT_STATUS_PROCESSING,
+    chunk_done_update,
+    plan_report,
+    report_collection_name,
+)
+from .._stock import (
+    SOURCE_PROJECTION,
+    InsufficientStockError,
+    StockMove,
+    StockMoveResult,
+    adjustment_records,
+    available_quantities,
+    now_ms,
+    short_moves,
+    source_update,
+    sources_filter,
+    triad_filter,
+)
+from ..location_contents import LocationContentRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+if TYPE_CHECKING:
+    from .reports import AsyncReportRepository
+
+
+class AsyncLocationContentRepository(
+    LocationContentRepositoryCore, AsyncBaseMongoDbRepository
+):
+    async def search_by_item(
+        self,
+        search_str: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        sort: Optional[Dict[str, int]] = None,
+        umu_id: Optional[str] = None,
+        expiration_date_gt: Optional[int] = None,
+        expiration_date_lt: Optional[int] = None,
+        quantity_gt: Optional[int] = None,
+        quantity_lt: Optional[int] = None,
+        lot: Optional[str] = None,
+        location_id: Optional[str] = None,
+        location_label_code: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._item_search(
+            search_str,
+            sort=sort,
+            umu_id=umu_id,
+            expiration_date_gt=expiration_date_gt,
+            expiration_date_lt=expiration_date_lt,
+            quantity_gt=quantity_gt,
+            quantity_lt=quantity_lt,
+            lot=lot,
+            location_id=location_id,
+            location_label_code=location_label_code,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+
+    async def search_by_item_global(
+        self,
+        search_str: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        sort: Optional[Dict[str, int]] = None,
+        umu_id_in: Optional[List[str]] = None,
+        umu_id_not_in: Optional[List[str]] = None,
+        expiration_date_gt: Optional[int] = None,
+        expiration_date_lt: Optional[int] = None,
+        quantity_gt: Optional[int] = None,
+        quantity_lt: Optional[int] = None,
+        lot: Optional[str] = None,
+        location_id: Optional[str] = None,
+        location_label_code: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._item_global_search(
+            search_str,
+            sort=sort,
+            umu_id_in=umu_id_in,
+            umu_id_not_in=umu_id_not_in,
+            expiration_date_gt=expiration_date_gt,
+            expiration_date_lt=expiration_date_lt,
+            quantity_gt=quantity_gt,
+            quantity_lt=quantity_lt,
+            lot=lot,
+            location_id=location_id,
+            location_label_code=location_label_code,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            analytics=True,
+        )
+
+    async def trigger_report_aggregation(
+        self,
+        report_id: str,
+        filters: Dict[str, Any],
+        *,
+        reports: Optional["AsyncReportRepository"] = None,
+    ) -> str:
+        """Build the per-UMU/item stock report, resuming an interrupted run.
+
+        See `LocationContentRepository.start_report_aggregation`; wrap it in
+        `start_report_aggregation` to run it as a background task.
+        """
+        collection_name = report_collection_name(report_id)
+        output, chunks = self._report_collections(report_id)
+        await output.create_indexes([self.REPORT_TTL_INDEX.model()])
+        await chunks.create_indexes([self.REPORT_TTL_INDEX.model()])
+        # only the read-only distinct goes to the analytics reader, the $merge
+        # writes and must run on the primary
+        reader = self._read_collection(analytics=True)
+        run = plan_report(
+            await reader.distinct("umu_id", filters), await chunks.distinct("_id")
+        )
+        try:
+            for umu_id in run.pending():
+                cursor = self._collection.aggregate(
+                    self._report_chunk_pipeline(filters, umu_id, collection_name),
+                    allowDiskUse=True,
+                )
+                await cursor.to_list(length=None)
+                await chunks.update_one(
+                    {"_id": umu_id}, chunk_done_update(), upsert=True
+                )
+                run.done.add(umu_id)
+                if reports is not None:
+                    await reports.update_status(
+                        report_id, REPORT_STATUS_PROCESSING, run.progress
+                    )
+        except Exception:
+            if reports is not None:
+                await reports.update_status(
+                    report_id, REPORT_STATUS_FAILED, run.progress
+                )
+            raise
+        if reports is not None:
+            await reports.update_status(report_id, REPORT_STATUS_COMPLETED, 100)
+        return collection_name
+
+    def start_report_aggregation(
+        self,
+        report_id: str,
+        filters: Dict[str, Any],
+        *,
+        reports: Optional["AsyncReportRepository"] = None,
+    ) -> "asyncio.Task[str]":
+        """Schedule `trigger_report_aggregation` as a task the caller can poll."""
+        return asyncio.ensure_future(
+            self.trigger_report_aggregation(report_id, filters, reports=reports)
+        )
+
+    async def find_by_logic_triad(
+        self, item_id: str, lot: str, location_id: str
+    ) -> Optional[dict]:
+        return await self._find_one(triad_filter(item_id, lot, location_id))
+
+    async def adjust_quantity(
+        self,
+        item_id: str,
+        lot: str,
+        location_id: str,
+        delta: int,
+        *,
+        allow_negative: bool = False,
+        reason: Optional[str] = None,
+        reference: Optional[str] = None,
+        session: Any = None,
+    ) -> Optional[dict]:
+        """Async version of `LocationContentRepository.adjust_quantity`."""
+        filter, update, now = self._adjustment(
+            item_id, lot, location_id, delta, allow_negative=allow_negative
+        )
+        with self._observe("find_one_and_update", filter=filter):
+            document = await self._collection.find_one_and_update(
+                filter, update, return_document=ReturnDocument.AFTER, session=session
+            )
+        if document is None:
+            if "$expr" in filter and await self._find_one(
+                triad_filter(item_id, lot, location_id), projection={"_id": 1}
+            ):
+                raise self._adjustment_error(item_id, lot, location_id, delta)
+            return None
+        self._invalidate_document(document["_id"])
+        log, event = adjustment_records(
+            document, delta, now=now, reason=reason, reference=reference
+        )
+        await self._db[self.QUANTITY_LOGS_COLLECTION].insert_one(log, session=session)
+        await self._db[self.EVENTS_COLLECTION].insert_one(event, session=session)
+        return document
+
+    async def move_stock(
+        self,
+        moves: Iterable[StockMove],
+        *,
+        reason: Optional[str] = None,
+        transactional: bool = True,
+    ) -> StockMoveResult:
+        """Async version of `LocationContentRepository.move_stock`."""
+        moves = list(moves)
+        if not moves:
+            return StockMoveResult()
+        now = now_ms()
+        try:
+            if not transactional:
+                return await self._move_stock_unsafe(moves, now=now, reason=reason)
+            await self._move_stock_transaction(moves, now=now, reason=reason)
+        except InsufficientStockError as exc:
+            exc.moves = await self._short_moves(moves)
+            raise
+        finally:
+            self._invalidate_cache()
+        return StockMoveResult(moved=list(range(len(moves))))
+
+    async def _move_stock_transaction(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> None:
+        operations, logs, events = self._move_writes(moves, now=now, reason=reason)
+
+        async def apply(session) -> None:
+            with self._observe("bulk_write") as event:
+                if event is not None:
+                    event.documents = len(operations)
+                result = await self._collection.bulk_write(
+                    operations, ordered=True, session=session
+                )
+            # every source must match its guard, every destination match or upsert
+            self._check_batch(
+                result.matched_count + result.upserted_count,
+                len(operations),
+                "Not enough stock for the whole batch",
+            )
+            await self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(
+                logs, ordered=False, session=session
+            )
+            await self._db[self.EVENTS_COLLECTION].insert_many(
+                events, ordered=False, session=session
+            )
+
+        async with await self._db.client.start_session() as session:
+            await session.with_transaction(apply)
+
+    async def _move_stock_unsafe(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> StockMoveResult:
+        result = StockMoveResult()
+        for position, move in enumerate(moves):
+            filter, update = source_update(move, now)
+            with self._observe("find_one_and_update", filter=filter):
+                source = await self._collection.find_one_and_update(
+                    filter, update, projection={"_id": 1}
+                )
+            if source is None:
+                result.failed.append(position)
+            else:
+                result.moved.append(position)
+        if not result.moved:
+            return result
+        operations, logs, events = self._destination_writes(
+            [moves[position] for position in result.moved], now=now, reason=reason
+        )
+        with self._observe("bulk_write") as event:
+            if event is not None:
+                event.documents = len(operations)
+            await self._collection.bulk_write(operations, ordered=False)
+        await self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(logs, ordered=False)
+        await self._db[self.EVENTS_COLLECTION].insert_many(events, ordered=False)
+        return result
+
+    async def allocate(
+        self,
+        umu_id: str,
+        lines: Iterable[Tuple[str, int]],
+        *,
+        reserve: bool = False,
+        allow_partial: bool = False,
+        include_expired: bool = False,
+    ) -> AllocationPlan:
+        """Async version of `LocationContentRepository.allocate`."""
+        requested = requested_quantities(lines)
+        if not requested:
+            return AllocationPlan()
+        expires_after = None if include_expired else now_ms()
+        if not reserve:
+            return await self._plan_allocation(
+                self._read_collection(), umu_id, requested, expires_after=expires_after
+            )
+        plan = AllocationPlan()
+
+        async def apply(session) -> None:
+            nonlocal plan
+            plan = await self._plan_allocation(
+                self._collection,
+                umu_id,
+                requested,
+                expires_after=expires_after,
+                session=session,
+            )
+            self._check_allocation(plan, umu_id, allow_partial=allow_partial)
+            operations = reservation_operations(plan.allocations, now_ms())
+            if operations:
+                with self._observe("bulk_write") as event:
+                    if event is not None:
+                        event.documents = len(operations)
+                    result = await self._collection.bulk_write(
+                        operations, ordered=True, session=session
+                    )
+                self._check_batch(
+                    result.matched_count, len(operations), "The allocated stock changed"
+                )
+            plan.reserved = True
+
+        try:
+            async with await self._db.client.start_session() as session:
+                await session.with_transaction(apply)
+        finally:
+            self._invalidate_cache()
+        return plan
+
+    async def release_allocation(self, plan: AllocationPlan) -> int:
+        if not plan.reserved:
+            return 0
+        summary = await self.bulk_write(
+            reservation_operations(plan.allocations, now_ms(), release=True),
+            ordered=False,
+        )
+        plan.reserved = False
+        return summary.modified_count
+
+    async def consume_allocation(
+        self,
+        plan: AllocationPlan,
+        *,
+        reason: Optional[str] = None,
+        reference: Optional[str] = None,
+    ) -> int:
+        """Async version of `LocationContentRepository.consume_allocation`."""
+        operations, logs, events = self._consumption(
+            plan, reason=reason, reference=reference
+        )
+
+        async def apply(session) -> None:
+            with self._observe("bulk_write") as event:
+                if event is not None:
+                    event.documents = len(operations)
+                result = await self._collection.bulk_write(
+                    operations, ordered=True, session=session
+                )
+            self._check_batch(
+                result.matched_count, len(operations), "The reserved stock changed"
+            )
+            await self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(
+                logs, ordered=False, session=session
+            )
+            await self._db[self.EVENTS_COLLECTION].insert_many(
+                events, ordered=False, session=session
+            )
+
+        if operations:
+            try:
+                async with await self._db.client.start_session() as session:
+                    await session.with_transaction(apply)
+            finally:
+                self._invalidate_cache()
+        plan.reserved = False
+        return len(operations)
+
+    async def _plan_allocation(
+        self,
+        collection: Any,
+        umu_id: str,
+        requested: Dict[str, int],
+        *,
+        expires_after: Optional[int],
+        session: Any = None,
+    ) -> AllocationPlan:
+        rows: List[dict] = []
+        for pipeline in self._allocation_pipelines(
+            umu_id, requested, expires_after=expires_after
+        ):
+            with self._observe("allocate", filter=pipeline[0]) as event:
+                batch = await collection.aggregate(
+                    pipeline, session=session, **self._max_time()
+                ).to_list(length=None)
+                self._record_documents(event, batch)
+            rows.extend(batch)
+        return build_plan(requested, rows)
+
+    async def _short_moves(self, moves: List[StockMove]) -> List[int]:
+        sources = await self._collection.find(
+            sources_filter(moves), SOURCE_PROJECTION
+        ).to_list(length=None)
+        return short_moves(moves, available_quantities(sources))
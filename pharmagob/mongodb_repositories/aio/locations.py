@@ -0,0 +1,37 @@
+from typing import AsyncIterator, List, Optional, Tuple, Union
+
+from ..locations import LocationRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncLocationRepository(LocationRepositoryCore, AsyncBaseMongoDbRepository):
+    async def get_by_umu_id(
+        self,
+        umu_id,
+        *,
+        label_code: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        filter = self._umu_id_filter(umu_id, label_code=label_code)
+        cache_key = self._query_cache_key(
+            "get_by_umu_id",
+            umu_id=umu_id,
+            label_code=label_code,
+            sort=sort,
+            projection=projection,
+            limit=limit,
+            count_policy=count_policy,
+        )
+        return await self._cached_find_page(
+            cache_key,
+            filter,
+            sort=sort,
+            projection=projection,
+            limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
+        )
@@ -0,0 +1,167 @@
+import asyncio
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple, Union
+
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from .._bulk import BulkWriteSummary, iter_batches
+from .._indexes import IndexDrift
+from .._instrumentation import logger
+from .._logs import LogRepositoryCore, archive_batch_filter
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncBaseLogRepository(LogRepositoryCore, AsyncBaseMongoDbRepository):
+    """Async version of `BaseLogRepository`.
+
+    The time-based flush runs as a task of the running event loop; `await
+    repository.aclose()` (or `async with`) writes what is left on shutdown.
+    """
+
+    def __init__(self, db_manager: Any, collection_name: str, **kwargs: Any):
+        super().__init__(db_manager, collection_name, **kwargs)
+        self._flusher: Optional["asyncio.Task[None]"] = None
+
+    async def __aenter__(self) -> "AsyncBaseLogRepository":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def log(self, entry: dict) -> None:
+        await self.log_many([entry])
+
+    async def log_many(self, entries: Iterable[dict]) -> None:
+        if self._buffer.add(self._stamp(entry) for entry in entries):
+            await self.flush()
+        elif self._buffer.interval > 0 and self._flusher is None:
+            self._flusher = asyncio.ensure_future(self._flush_periodically())
+
+    async def flush(self) -> BulkWriteSummary:
+        entries = self._buffer.drain()
+        summary = BulkWriteSummary()
+        offset = 0
+        for batch in iter_batches(entries, self.DEFAULT_BULK_BATCH_SIZE):
+            try:
+                with self._observe("insert_many") as event:
+                    if event is not None:
+                        event.documents = len(batch)
+                    result = await self._log_collection.insert_many(
+                        batch, ordered=False
+                    )
+            except BulkWriteError as exc:
+                summary.add_details(exc.details, offset=offset)
+                logger.error(
+                    "%s log entries rejected by %s",
+                    len(exc.details.get("writeErrors", [])),
+                    self._collection.name,
+                )
+            except Exception:
+                self._buffer.requeue(entries[offset:])
+                raise
+            else:
+                summary.inserted_count += len(result.inserted_ids)
+            offset += len(batch)
+        if entries:
+            self._invalidate_queries()
+        return summary
+
+    async def aclose(self) -> BulkWriteSummary:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        return await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._buffer.interval)
+            if not self._buffer.due():
+                continue
+            try:
+                await self.flush()
+            except Exception:  # retried on the next tick, the entries are requeued
+                logger.exception("Background flush of %s failed", self._collection.name)
+
+    async def iter_range(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        *,
+        umu_id: Optional[str] = None,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        descending: bool = False,
+        projection: Optional[Union[list, dict, str]] = None,
+        batch_size: int = AsyncBaseMongoDbRepository.DEFAULT_CURSOR_BATCH_SIZE,
+        raw: bool = False,
+    ) -> AsyncIterator[dict]:
+        await self.flush()
+        async for document in self.iter_all(
+            self._range_conditions(start, end, and_conditions),
+            umu_id=umu_id,
+            sort=self._range_sort(descending),
+            projection=projection,
+            batch_size=batch_size,
+            raw=raw,
+        ):
+            yield document
+
+    async def ensure_collection(self) -> bool:
+        if not self.TIME_SERIES:
+            return False
+        name = self._collection.name
+        if await self._db.list_collection_names(filter={"name": name}):
+            return False
+        try:
+            await self._db.create_collection(name, **self.collection_options())
+        except CollectionInvalid:
+            return False
+        return True
+
+    async def ensure_indexes(
+        self,
+        *,
+        dry_run: bool = False,
+        search_indexes: bool = True,
+        update_search_indexes: bool = False,
+    ) -> IndexDrift:
+        errors = []
+        if not dry_run:
+            try:
+                await self.ensure_collection()
+            except OperationFailure as exc:
+                errors.append(str(exc))
+        drift = await super().ensure_indexes(
+            dry_run=dry_run,
+            search_indexes=search_indexes,
+            update_search_indexes=update_search_indexes,
+        )
+        drift.errors[:0] = errors
+        return drift
+
+    async def archive(self, *, older_than: Optional[int] = None) -> int:
+        filter = self._conditions_filter(
+            self._range_conditions(None, self._archive_cutoff(older_than), None)
+        )
+        cursor = self._collection.find(
+            filter, {"_id": 1}, batch_size=self.DEFAULT_BULK_BATCH_SIZE
+        )
+        archived = 0
+        try:
+            while True:
+                batch = await cursor.to_list(length=self.DEFAULT_BULK_BATCH_SIZE)
+                if not batch:
+                    break
+                batch_filter = archive_batch_filter(batch)
+                await self._collection.aggregate(
+                    self._archive_pipeline(batch_filter), allowDiskUse=True
+                ).to_list(length=None)
+                with self._observe("delete_many", filter=batch_filter):
+                    result = await self._collection.delete_many(batch_filter)
+                archived += result.deleted_count
+        finally:
+            await cursor.close()
+            self._invalidate_cache()
+        return archived
@@ -0,0 +1,69 @@
+from typing import List, Optional, Tuple
+
+from ..patients import PatientsRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncPatientsRepository(PatientsRepositoryCore, AsyncBaseMongoDbRepository):
+    async def search_by_curp(
+        self,
+        curp: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        umu_id: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._curp_search(
+            curp,
+            exact=exact,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
+
+    async def search_by_full_name(
+        self,
+        full_name: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        umu_id: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._full_name_search(
+            full_name,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
@@ -0,0 +1,38 @@
+from typing import Optional
+
+from pharmagob.v1.models.reports import ReportRequestModel
+from pharmagob.v1.repository_interfaces.reports import ReportRepositoryInterface
+
+from ..reports import ReportRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncReportRepository(
+    ReportRepositoryCore, AsyncBaseMongoDbRepository, ReportRepositoryInterface
+):
+    """`ReportRepositoryInterface` with awaitable methods."""
+
+    async def get_by_id(self, report_id: str) -> Optional[ReportRequestModel]:
+        filter = self._report_filter(report_id)
+        if filter is None:
+            return None
+
+        data = await self._collection.find_one(filter)
+        if not data:
+            return None
+
+        return ReportRequestModel(**data)
+
+    async def create(self, report: ReportRequestModel) -> ReportRequestModel:
+        await self._collection.insert_one(self._report_document(report))
+        return report
+
+    async def update_status(self, report_id: str, status: str, progress: int) -> bool:
+        filter = self._report_filter(report_id)
+        if filter is None:
+            return False
+
+        result = await self._collection.update_one(
+            filter, self._status_update(status, progress)
+        )
+        return result.modified_count > 0
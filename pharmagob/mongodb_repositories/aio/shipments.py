@@ -0,0 +1,47 @@
+from typing import List, Optional, Tuple
+
+from ..shipments import ShipmentRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncShipmentRepository(ShipmentRepositoryCore, AsyncBaseMongoDbRepository):
+    async def search_by_order_number(
+        self,
+        order_number: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
+        umu_id: Optional[str] = None,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        review_status: Optional[List[str]] = None
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._order_number_search(
+            order_number,
+            exact=exact,
+            umu_id=umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            review_status=review_status,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
+
+    async def get_review_status(self, shipment_id: str) -> Optional[str]:
+        doc = await self._find_one(
+            {"_id": shipment_id}, projection={"review_status": 1}
+        )
+        return doc.get("review_status") if doc else None
@@ -0,0 +1,288 @@
+import asyncio
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+
+from pymongo.errors import OperationFailure
+
+from .._bulk import iter_batches
+from .._instrumentation import logger
+from .._stock import now_ms
+from .._stock_totals import (
+    CHANGE_STREAM_HISTORY_LOST_CODE,
+    CHANGE_STREAM_PIPELINE,
+    CHANGE_STREAMS_UNSUPPORTED_CODE,
+    RECOMPUTE_BATCH_SIZE,
+    SYNC_MODE_AUTO,
+    SYNC_MODE_CHANGE_STREAM,
+    SYNC_MODE_POLL,
+    TotalKey,
+    TotalsBatch,
+    change_keys,
+    checkpoint_update,
+    content_key,
+    keys_match,
+    rebuild_pipeline,
+    rebuilt_checkpoint,
+    recompute_operations,
+    totals_pipeline,
+    validate_sync_mode,
+)
+from ..stock_totals import StockTotalsRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+if TYPE_CHECKING:
+    from .location_contents import AsyncLocationContentRepository
+
+
+class AsyncStockTotalsRepository(StockTotalsRepositoryCore, AsyncBaseMongoDbRepository):
+    """Async version of `StockTotalsRepository`; `sync` stops on an `asyncio.Event`."""
+
+    async def get_total(self, umu_id: str, item_id: str) -> Optional[dict]:
+        return await self._find_one({"umu_id": umu_id, "item_id": item_id})
+
+    async def get_totals(
+        self,
+        umu_id: str,
+        *,
+        item_ids: Optional[List[str]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[dict]:
+        filter = self._totals_filter(umu_id, item_ids)
+        with self._observe("find", filter=filter) as event:
+            documents = (
+                await self._collection.find(
+                    filter, self._resolve_projection(projection)
+                )
+                .sort("item_id", self.ASCENDING_ORDER)
+                .to_list(length=None)
+            )
+            self._record_documents(event, documents)
+        return documents
+
+    async def checkpoint(self) -> Optional[dict]:
+        return await self._checkpoints.find_one({"_id": self._collection.name})
+
+    @property
+    def _checkpoints(self):
+        return self._db[self.CHECKPOINTS_COLLECTION]
+
+    async def enable_pre_images(
+        self, location_contents: "AsyncLocationContentRepository"
+    ) -> None:
+        await location_contents._db.command(
+            "collMod",
+            location_contents._collection.name,
+            changeStreamPreAndPostImages={"enabled": True},
+        )
+
+    async def rebuild(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        *,
+        change_stream: bool = True,
+    ) -> None:
+        await self._collection.create_indexes([spec.model() for spec in self.INDEXES])
+        source = location_contents._collection
+        now = now_ms()
+        start_token = None
+        if change_stream:
+            async with source.watch(CHANGE_STREAM_PIPELINE) as stream:
+                start_token = stream.resume_token
+        await source.aggregate(
+            rebuild_pipeline(self._db.name, self._collection.name, now),
+            allowDiskUse=True,
+        ).to_list(length=None)
+        await self._collection.delete_many({"updated_at": {"$lt": now}})
+        self._invalidate_cache()
+        resume_token = None
+        if change_stream:
+            keys = set()
+            async with source.watch(
+                CHANGE_STREAM_PIPELINE,
+                full_document="whenAvailable",
+                full_document_before_change="whenAvailable",
+                resume_after=start_token,
+                max_await_time_ms=1,
+            ) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    keys |= change_keys(change)
+                resume_token = stream.resume_token
+            await self.recompute(location_contents, keys)
+        await self._checkpoints.update_one(
+            {"_id": self._collection.name},
+            rebuilt_checkpoint(now_ms(), resume_token=resume_token, watermark=now),
+            upsert=True,
+        )
+
+    async def recompute(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        keys: Iterable[TotalKey],
+    ) -> int:
+        keys = list(keys)
+        now = now_ms()
+        operations = []
+        for chunk in iter_batches(keys, RECOMPUTE_BATCH_SIZE):
+            rows = await location_contents._collection.aggregate(
+                totals_pipeline(keys_match(chunk))
+            ).to_list(length=None)
+            operations.extend(recompute_operations(chunk, rows, now))
+        if operations:
+            await self.bulk_write(operations, ordered=False)
+        return len(keys)
+
+    async def sync(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        *,
+        mode: str = SYNC_MODE_AUTO,
+        stop: Optional[asyncio.Event] = None,
+        batch_size: int = 500,
+        max_await_ms: int = 1000,
+        poll_interval: float = 5.0,
+    ) -> None:
+        validate_sync_mode(mode)
+        stop = stop if stop is not None else asyncio.Event()
+        if mode != SYNC_MODE_POLL:
+            try:
+                await self._sync_change_stream(
+                    location_contents,
+                    stop=stop,
+                    batch_size=batch_size,
+                    max_await_ms=max_await_ms,
+                )
+                return
+            except OperationFailure as exc:
+                if (
+                    mode == SYNC_MODE_CHANGE_STREAM
+                    or exc.code != CHANGE_STREAMS_UNSUPPORTED_CODE
+                ):
+                    raise
+                logger.warning(
+                    "Change streams unavailable on %s, polling updated_at",
+                    location_contents._collection.name,
+                )
+        await self._sync_poll(location_contents, stop=stop, poll_interval=poll_interval)
+
+    async def _sync_change_stream(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        *,
+        stop: asyncio.Event,
+        batch_size: int,
+        max_await_ms: int,
+    ) -> None:
+        while not stop.is_set():
+            resume_token = (await self.checkpoint() or {}).get("resume_token")
+            if resume_token is None:
+                await self.rebuild(location_contents)
+                continue
+            try:
+                invalidated = await self._follow(
+                    location_contents,
+                    resume_token,
+                    stop=stop,
+                    batch_size=batch_size,
+                    max_await_ms=max_await_ms,
+                )
+            except OperationFailure as exc:
+                if exc.code != CHANGE_STREAM_HISTORY_LOST_CODE:
+                    raise
+                logger.warning(
+                    "Resume token of %s lost, rebuilding", self._collection.name
+                )
+                invalidated = True
+            if invalidated:
+                await self.rebuild(location_contents)
+
+    async def _follow(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        resume_token: dict,
+        *,
+        stop: asyncio.Event,
+        batch_size: int,
+        max_await_ms: int,
+    ) -> bool:
+        async with location_contents._collection.watch(
+            CHANGE_STREAM_PIPELINE,
+            full_document="whenAvailable",
+            full_document_before_change="whenAvailable",
+            resume_after=resume_token,
+            max_await_time_ms=max_await_ms,
+            batch_size=batch_size,
+        ) as stream:
+            batch = TotalsBatch()
+            while stream.alive and not stop.is_set():
+                change = await stream.try_next()
+                if change is not None:
+                    batch.add_change(change)
+                if batch.invalidated:
+                    return True
+                if len(batch) >= batch_size or (change is None and batch):
+                    await self._apply_changes(batch, stream.resume_token)
+                    batch = TotalsBatch()
+            if batch:
+                await self._apply_changes(batch, stream.resume_token)
+        return False
+
+    async def _apply_changes(self, batch: TotalsBatch, resume_token: dict) -> None:
+        now = now_ms()
+        operations = batch.operations(now)
+        checkpoint = checkpoint_update(
+            now,
+            resume_token=resume_token,
+            dirty=batch.dirty,
+            unresolved=batch.unresolved,
+        )
+        self._warn_unresolved(batch)
+
+        async def apply(session) -> None:
+            if operations:
+                with self._observe("bulk_write") as event:
+                    if event is not None:
+                        event.documents = len(operations)
+                    await self._collection.bulk_write(
+                        operations, ordered=False, session=session
+                    )
+            await self._checkpoints.update_one(
+                {"_id": self._collection.name}, checkpoint, upsert=True, session=session
+            )
+
+        async with await self._db.client.start_session() as session:
+            await session.with_transaction(apply)
+        self._invalidate_cache()
+
+    async def _sync_poll(
+        self,
+        location_contents: "AsyncLocationContentRepository",
+        *,
+        stop: asyncio.Event,
+        poll_interval: float,
+    ) -> None:
+        while not stop.is_set():
+            watermark = (await self.checkpoint() or {}).get("watermark")
+            if watermark is None:
+                await self.rebuild(location_contents, change_stream=False)
+                continue
+            keys = set()
+            latest = watermark
+            async for document in location_contents._collection.find(
+                {"updated_at": {"$gte": watermark}},
+                {"umu_id": 1, "item.id": 1, "updated_at": 1},
+            ):
+                keys.add(content_key(document))
+                latest = max(latest, document["updated_at"])
+            if keys:
+                await self.recompute(location_contents, keys)
+            await self._checkpoints.update_one(
+                {"_id": self._collection.name},
+                checkpoint_update(now_ms(), watermark=latest),
+                upsert=True,
+            )
+            try:
+                await asyncio.wait_for(stop.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,93 @@
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from .._stock_transfers import group_timelines
+from ..stock_transfer_events import StockTransferEventsRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncStockTransferEventsRepository(
+    StockTransferEventsRepositoryCore, AsyncBaseMongoDbRepository
+):
+    async def get_by_stock_transfer_id(
+        self,
+        stock_transfer_id: str,
+        *,
+        umu_id: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], AsyncIterator[dict]]:
+        filter, default_sort = self._stock_transfer_id_find(
+            stock_transfer_id, umu_id=umu_id, sort=sort
+        )
+        return await self._find_page(
+            filter,
+            sort=default_sort,
+            projection=projection,
+            limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
+        )
+
+    async def get_latest_by_stock_transfer_ids(
+        self,
+        stock_transfer_ids: Iterable[str],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[Optional[dict]]:
+        stock_transfer_ids = list(stock_transfer_ids)
+        unique_ids = self._unique_ids(stock_transfer_ids)
+        if not unique_ids:
+            return []
+        pipeline = self._latest_events_pipeline(
+            unique_ids, umu_id=umu_id, projection=projection
+        )
+        with self._observe("latest_events", filter=pipeline[0]) as event:
+            rows = (
+                await self._read_collection()
+                .aggregate(pipeline, **self._max_time())
+                .to_list(length=None)
+            )
+            self._record_documents(event, rows)
+        latest = {row["_id"]: row["event"] for row in rows}
+        return [
+            latest.get(stock_transfer_id) for stock_transfer_id in stock_transfer_ids
+        ]
+
+    async def get_timelines(
+        self,
+        stock_transfer_ids: Iterable[str],
+        *,
+        umu_id: Optional[str] = None,
+        descending: bool = False,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> Dict[str, List[dict]]:
+        unique_ids = self._unique_ids(list(stock_transfer_ids))
+        if not unique_ids:
+            return {}
+        filter, sort, projection = self._timelines_find(
+            unique_ids, umu_id=umu_id, descending=descending, projection=projection
+        )
+        with self._observe("timelines", filter=filter) as event:
+            events = (
+                await self._read_collection()
+                .find(
+                    filter,
+                    sort=sort,
+                    projection=projection,
+                    **self._max_time(option="max_time_ms"),
+                )
+                .to_list(length=None)
+            )
+            self._record_documents(event, events)
+        return group_timelines(unique_ids, events)
+
+    async def append(self, event: dict) -> bool:
+        await self.create(event)
+        result = await self._db[self.TRANSFERS_COLLECTION].update_one(
+            *self._last_event_write(event)
+        )
+        return result.modified_count == 1
@@ -0,0 +1,80 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .._stock_transfers import (
+    last_event_filter,
+    last_event_operation,
+    last_event_update,
+)
+from ..stock_transfers import StockTransfersRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncStockTransfersRepository(
+    StockTransfersRepositoryCore, AsyncBaseMongoDbRepository
+):
+    async def search_by_reference_id(
+        self,
+        search_str: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
+        sort: Optional[Dict[str, int]] = None,
+        last_event: Optional[str] = None,
+        umu_id: Optional[str] = None,
+        foreign_umu_id: Optional[str] = None,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._reference_search(
+            search_str,
+            exact=exact,
+            sort=sort,
+            last_event=last_event,
+            umu_id=umu_id,
+            foreign_umu_id=foreign_umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
+
+    async def set_last_event(self, stock_transfer_id: Any, event: dict) -> bool:
+        filter = last_event_filter(stock_transfer_id, event["transition_timestamp"])
+        with self._observe("update_one", filter=filter):
+            result = await self._collection.update_one(
+                filter, last_event_update(event, event_field=self.EVENT_FIELD)
+            )
+        self._invalidate_document(stock_transfer_id)
+        return result.modified_count == 1
+
+    async def refresh_last_events(self, stock_transfer_ids: Iterable[Any]) -> int:
+        stock_transfer_ids = self._unique_ids(list(stock_transfer_ids))
+        if not stock_transfer_ids:
+            return 0
+        pipeline = self._latest_events_pipeline(stock_transfer_ids)
+        rows = (
+            await self._db[self.EVENTS_COLLECTION]
+            .aggregate(pipeline)
+            .to_list(length=None)
+        )
+        summary = await self.bulk_write(
+            [
+                last_event_operation(row["event"], event_field=self.EVENT_FIELD)
+                for row in rows
+            ],
+            ordered=False,
+        )
+        return summary.modified_count
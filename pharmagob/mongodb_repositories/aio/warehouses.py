@@ -0,0 +1,40 @@
+from typing import Dict, List, Optional, Tuple
+
+from ..warehouses import WarehouseRepositoryCore
+from .base import AsyncBaseMongoDbRepository
+
+
+class AsyncWarehouseRepository(WarehouseRepositoryCore, AsyncBaseMongoDbRepository):
+    async def search_by_umu(
+        self,
+        search_str: str,
+        *,
+        page: int = 1,
+        limit: int = AsyncBaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        type: Optional[str] = None,
+        disable: Optional[bool] = None,
+        created_at_gt: Optional[int] = None,
+        created_at_lt: Optional[int] = None,
+        sort: Optional[Dict[str, int]] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._umu_search(
+            search_str,
+            type=type,
+            disable=disable,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            sort=sort,
+        )
+        return await self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
@@ -1,46 +1,164 @@
-from typing import Any, Iterator, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from infra.mongodb import MongoDbManager
-from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
 
-from ._utils import convert_conditions_to_mongo
+from ._bulk import (
+    BulkOperationBuilder,
+    BulkWriteSummary,
+    insert_operations,
+    iter_batches,
+    set_operations,
+    update_operations,
+)
+from ._cache import MISSING, TTLCache
+from ._core import MongoDbRepositoryCore
+from ._details import ordered_by_id
+from ._count import (
+    COUNT_ADAPTIVE,
+    COUNT_CACHED,
+    COUNT_CAPPED,
+    COUNT_ESTIMATED,
+    COUNT_EXACT,
+    COUNT_SKIP,
+    normalize_filter,
+)
+from ._indexes import IndexDrift, plan_indexes, plan_search_indexes
+from ._instrumentation import QueryHooks, logger
+from ._routing import DEFAULT_ANALYTICS_READ_PREFERENCE
+from ._search import SearchSpec, build_search_meta_pipeline, parse_search_meta_count
+from ._search_cache import SearchSessionCache
+from ._timeouts import Deadline, QueryTimeoutError
 
 
-class BaseMongoDbRepository:
-    ASCENDING_ORDER = ASCENDING
-    DESCENDING_ORDER = DESCENDING
-    DEFAULT_QUERY_LIMIT = 500
+class BaseMongoDbRepository(MongoDbRepositoryCore):
+    DEFAULT_QUERY_LIMIT = MongoDbRepositoryCore.DEFAULT_QUERY_LIMIT
+    DEFAULT_BULK_BATCH_SIZE = MongoDbRepositoryCore.DEFAULT_BULK_BATCH_SIZE
+    DEFAULT_CURSOR_BATCH_SIZE = MongoDbRepositoryCore.DEFAULT_CURSOR_BATCH_SIZE
 
     def __init__(
-        self, db_manager: MongoDbManager, collection_name: str, *, verbose: bool = False
+        self,
+        db_manager: MongoDbManager,
+        collection_name: str,
+        *,
+        verbose: bool = False,
+        count_policy: str = COUNT_EXACT,
+        count_cap: int = 1000,
+        count_cache_ttl: float = 30.0,
+        cache: Optional[TTLCache] = None,
+        hooks: Optional[QueryHooks] = None,
+        read_preference: Optional[str] = None,
+        read_concern: Optional[str] = None,
+        max_staleness_seconds: Optional[int] = None,
+        analytics_read_preference: Optional[str] = DEFAULT_ANALYTICS_READ_PREFERENCE,
+        max_time_ms: Optional[int] = None,
+        search_cache: Optional[SearchSessionCache] = None,
     ):
-        self._collection = db_manager.get_collection(collection_name)
-        self.verbose = verbose
+        super().__init__(
+            db_manager,
+            collection_name,
+            verbose=verbose,
+            count_policy=count_policy,
+            count_cap=count_cap,
+            count_cache_ttl=count_cache_ttl,
+            cache=cache,
+            hooks=hooks,
+            read_preference=read_preference,
+            read_concern=read_concern,
+            max_staleness_seconds=max_staleness_seconds,
+            analytics_read_preference=analytics_read_preference,
+            max_time_ms=max_time_ms,
+            search_cache=search_cache,
+        )
+
+    def ensure_indexes(
+        self,
+        *,
+        dry_run: bool = False,
+        search_indexes: bool = True,
+        update_search_indexes: bool = False,
+    ) -> IndexDrift:
+        """Create the declared indexes that are missing and report the drift.
+
+        Indexes whose options differ are reported in `changed` but never dropped;
+        changed search indexes are reported in `search_changed`. With `dry_run`
+        nothing is written, so it can run as a check against any environment.
+
+        Parameters:
+            search_indexes: Also check the Atlas Search indexes; disable it on
+                deployments without Atlas Search.
+            update_search_indexes: Replace the changed search indexes with the
+                declared definitions. Off by default, the declared definition is
+                derived from the fields the repository searches and would drop
+                what was added to the index elsewhere (e.g. `dynamic: true`).
+        """
+        drift = IndexDrift(self._collection.name)
+        to_create = plan_indexes(
+            drift, self.index_specs(), self._collection.index_information()
+        )
+        if to_create and not dry_run:
+            try:
+                self._collection.create_indexes([spec.model() for spec in to_create])
+            except OperationFailure as exc:
+                drift.errors.append(str(exc))
+            else:
+                drift.created, drift.missing = drift.missing, []
+        search_specs = self.search_index_specs()
+        if not search_indexes or not search_specs:
+            return drift
+        try:
+            existing = list(self._collection.list_search_indexes())
+        except OperationFailure as exc:
+            drift.errors.append(str(exc))
+            return drift
+        to_create_search, to_update = plan_search_indexes(drift, search_specs, existing)
+        if dry_run:
+            return drift
+        try:
+            for spec in to_create_search:
+                self._collection.create_search_index(
+                    {"name": spec.name, "definition": spec.definition}
+                )
+                drift.search_missing.remove(spec.name)
+                drift.search_created.append(spec.name)
+            for spec in to_update if update_search_indexes else ():
+                self._collection.update_search_index(spec.name, spec.definition)
+                drift.search_changed.remove(spec.name)
+                drift.search_updated.append(spec.name)
+        except OperationFailure as exc:
+            drift.errors.append(str(exc))
+        return drift
 
     def create(self, data: dict) -> None:
-        self._collection.insert_one(data)
+        with self._observe("insert_one"), self._write_timeout():
+            self._collection.insert_one(data)
+        self._invalidate_queries()
 
     def update(self, document_id, *, data: dict) -> int:
         update = {"$set": data}
-        result = self._collection.update_one(
-            {"_id": document_id},
-            update=update,
-            upsert=False,  # Only update, not insert
-        )
+        with self._observe("update_one", filter={"_id": document_id}):
+            with self._write_timeout():
+                result = self._collection.update_one(
+                    {"_id": document_id},
+                    update=update,
+                    upsert=False,  # Only update, not insert
+                )
+        self._invalidate_document(document_id)
         return result.modified_count  # number of documents that were modified
 
     def update_many(
         self, and_conditions: Optional[List[Tuple[str, str, Any]]], *, data: dict
     ) -> int:
-        parsed_filter: dict = {}
-        if and_conditions:
-            parsed_filter = convert_conditions_to_mongo(and_conditions)
+        parsed_filter = self._conditions_filter(and_conditions)
         update = {"$set": data}
-        result = self._collection.update_many(
-            parsed_filter,
-            update=update,
-            upsert=False,  # Only update, not insert
-        )
+        with self._observe("update_many", filter=parsed_filter):
+            with self._write_timeout():
+                result = self._collection.update_many(
+                    parsed_filter,
+                    update=update,
+                    upsert=False,  # Only update, not insert
+                )
+        self._invalidate_cache()
         return result.modified_count  # number of documents that were modified
 
     def set(
@@ -49,20 +167,114 @@ class BaseMongoDbRepository:
         update = {"$set": data}
         if write_only_if_insert:  # Only write if document not exists
             update = {"$setOnInsert": data}
-        result = self._collection.update_one(
-            {"_id": document_id},
-            update=update,
-            upsert=True,  # updated or insert
-        )
+        with self._observe("upsert_one", filter={"_id": document_id}):
+            with self._write_timeout():
+                result = self._collection.update_one(
+                    {"_id": document_id},
+                    update=update,
+                    upsert=True,  # updated or insert
+                )
+        self._invalidate_document(document_id)
         return result.matched_count  # number of documents that matched the _id
 
+    def bulk(
+        self, *, ordered: bool = True, batch_size: int = DEFAULT_BULK_BATCH_SIZE
+    ) -> BulkOperationBuilder:
+        """Start a builder that collects writes and sends them with `bulk_write`."""
+        return BulkOperationBuilder(self, ordered=ordered, batch_size=batch_size)
+
+    def bulk_write(
+        self,
+        operations: Iterable[Any],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        """Send pymongo write models in batches of `batch_size`.
+
+        Parameters:
+            operations: `InsertOne`, `UpdateOne`, `DeleteOne`... models.
+            ordered: In ordered mode the first failing operation stops the whole
+                write, including the batches that follow. In unordered mode every
+                operation is attempted and each failure is reported.
+
+        Returns:
+            BulkWriteSummary: The counters and per-operation errors of all batches.
+
+        Raises:
+            QueryTimeoutError: The batches did not fit in `max_time_ms`, which
+                bounds the whole call; the batches already sent stay written.
+        """
+        summary = BulkWriteSummary()
+        offset = 0
+        try:
+            with self._write_timeout():
+                for batch in iter_batches(operations, batch_size):
+                    try:
+                        with self._observe("bulk_write") as event:
+                            if event is not None:
+                                event.documents = len(batch)
+                            result = self._collection.bulk_write(batch, ordered=ordered)
+                    except BulkWriteError as exc:
+                        summary.add_details(exc.details, offset=offset)
+                        if ordered:
+                            break
+                    else:
+                        summary.add_result(result)
+                    offset += len(batch)
+        finally:
+            self._invalidate_cache()
+        return summary
+
+    def create_many(
+        self,
+        documents: Iterable[dict],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        return self.bulk_write(
+            insert_operations(documents),
+            ordered=ordered,
+            batch_size=batch_size,
+        )
+
+    def update_many_by_id(
+        self,
+        updates: Iterable[Tuple[Any, dict]],
+        *,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        """Bulk version of `update`, one `(document_id, data)` pair per document."""
+        return self.bulk_write(
+            update_operations(updates),
+            ordered=ordered,
+            batch_size=batch_size,
+        )
+
+    def set_many(
+        self,
+        documents: Iterable[Tuple[Any, dict]],
+        *,
+        write_only_if_insert: bool = False,
+        ordered: bool = True,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+    ) -> BulkWriteSummary:
+        """Bulk version of `set`, one `(document_id, data)` pair per document."""
+        return self.bulk_write(
+            set_operations(documents, write_only_if_insert=write_only_if_insert),
+            ordered=ordered,
+            batch_size=batch_size,
+        )
+
     def get(
         self,
         document_id,
         *,
         umu_id: Optional[str] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
     ) -> Optional[dict]:
         """Retrieve a document based on its unique identifier.
 
@@ -72,14 +284,128 @@ class BaseMongoDbRepository:
         Returns:
             Optional[dict]: An dict representation of the found document
         """
-        filter = {"_id": document_id}
-        if umu_id:
-            filter.update({"umu_id": umu_id})
-        document_data = self._collection.find_one(
-            filter, sort=sort, projection=projection
+        projection = self._resolve_projection(projection)
+        cache_key = self._document_cache_key(
+            document_id, umu_id=umu_id, sort=sort, projection=projection
         )
+        if cache_key is not None and self.cache is not None:
+            cached_data = self.cache.get(cache_key)
+            if cached_data is not MISSING:
+                return cached_data
+        document_data = self._find_one(
+            self._id_filter(document_id, umu_id), sort=sort, projection=projection
+        )
+        self._cache_document(cache_key, document_data)
         return document_data
 
+    def get_many(
+        self,
+        document_ids: Iterable[Any],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[Optional[dict]]:
+        """Retrieve many documents by their unique identifiers in one query.
+
+        Parameters:
+            document_ids: The unique identifiers, duplicates are allowed.
+
+        Returns:
+            List[Optional[dict]]: One entry per input id, in the same order, None
+                for the ids that were not found.
+        """
+        document_ids = list(document_ids)
+        projection = self._resolve_projection(projection)
+        found, pending = self._cached_many(
+            document_ids, umu_id=umu_id, projection=projection
+        )
+        if pending:
+            filter, full_projection = self._many_query(
+                pending, umu_id=umu_id, projection=projection
+            )
+            with self._observe(
+                "find_many",
+                filter=filter,
+                command=self._find_command(filter, projection=full_projection),
+            ) as event:
+                documents = list(
+                    self._read_collection().find(
+                        filter,
+                        projection=full_projection,
+                        **self._max_time(option="max_time_ms"),
+                    )
+                )
+                self._record_documents(event, documents)
+            self._store_many(found, documents, umu_id=umu_id, projection=projection)
+        return [found.get(document_id) for document_id in document_ids]
+
+    def get_with_details(
+        self,
+        document_id,
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        details_projection: Optional[Union[list, dict, str]] = None,
+        details_sort: Optional[List[Tuple[str, int]]] = None,
+        details_limit: Optional[int] = None,
+    ) -> Optional[dict]:
+        """Retrieve a document and its `DETAILS_COLLECTION` lines in one query.
+
+        The lines are in `DETAILS_FIELD`. The result is never cached: the lines
+        are written by another repository, which cannot invalidate it.
+
+        Parameters:
+            umu_id: Restricts both the document and its lines.
+            details_projection: Fields of the lines, or a `DETAILS_PROJECTIONS`
+                preset.
+            details_limit: Caps the lines returned.
+
+        Raises:
+            ValueError: If the repository declares no `DETAILS_COLLECTION`.
+        """
+        documents = self._aggregate_details(
+            self._id_filter(document_id, umu_id),
+            umu_id=umu_id,
+            projection=projection,
+            details_projection=details_projection,
+            details_sort=details_sort,
+            details_limit=details_limit,
+        )
+        return documents[0] if documents else None
+
+    def get_many_with_details(
+        self,
+        document_ids: Iterable[Any],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        details_projection: Optional[Union[list, dict, str]] = None,
+        details_sort: Optional[List[Tuple[str, int]]] = None,
+        details_limit: Optional[int] = None,
+    ) -> List[Optional[dict]]:
+        """Batch version of `get_with_details`, for list pages.
+
+        Returns:
+            List[Optional[dict]]: One entry per input id, in the same order, None
+                for the ids that were not found.
+        """
+        document_ids = list(document_ids)
+        unique_ids = self._unique_ids(document_ids)
+        if not unique_ids:
+            return []
+        match: dict = {"_id": {"$in": unique_ids}}
+        if umu_id:
+            match["umu_id"] = umu_id
+        documents = self._aggregate_details(
+            match,
+            umu_id=umu_id,
+            projection=projection,
+            details_projection=details_projection,
+            details_sort=details_sort,
+            details_limit=details_limit,
+        )
+        return ordered_by_id(document_ids, documents)
+
     def get_paginated(
         self,
         page: int = 1,
@@ -88,20 +414,525 @@ class BaseMongoDbRepository:
         umu_id: Optional[str] = None,
         and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[List[str]] = None,
-    ) -> Tuple[int, Iterator[dict]]:
-        parsed_filter: dict = {}
-        if and_conditions:
-            parsed_filter = convert_conditions_to_mongo(and_conditions)
-        if umu_id:
-            parsed_filter.update({"umu_id": umu_id})
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        """Retrieve one page of the documents matching the conditions.
+
+        Parameters:
+            projection: Fields to return, or the name of a `PROJECTIONS` preset.
+            raw: Return `RawBSONDocument`s, decoded lazily on field access.
+        """
+        parsed_filter = self._conditions_filter(and_conditions, umu_id)
         skip = (page - 1) * limit
-        total_count = self._collection.count_documents(parsed_filter)
-        results = self._collection.find(
+        return self._find_page(
             parsed_filter,
             sort=sort,
             skip=skip,
             limit=limit,
             projection=projection,
+            count_policy=count_policy,
+            raw=raw,
+        )
+
+    def get_paginated_by_cursor(
+        self,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        *,
+        cursor: Optional[str] = None,
+        umu_id: Optional[str] = None,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[str], List[dict]]:
+        """Retrieve a page using keyset (seek) pagination.
+
+        Instead of skipping the previous pages, the query resumes right after the
+        last seen sort key (plus `_id` as tie-breaker), so every page costs the same.
+
+        Parameters:
+            limit: The maximum number of documents of the page.
+            cursor: The opaque token returned by the previous call, None for the
+                first page. It is only valid with the same `sort`.
+            raw: Return `RawBSONDocument`s, decoded lazily on field access.
+
+        Returns:
+            Tuple[Optional[str], List[dict]]: The token of the next page (None when
+                there are no more documents) and the documents of the page.
+        """
+        parsed_filter, full_sort, full_projection = self._cursor_query(
+            self._conditions_filter(and_conditions, umu_id),
+            cursor=cursor,
+            sort=sort,
+            projection=self._resolve_projection(projection),
+        )
+        with self._observe(
+            "find",
+            filter=parsed_filter,
+            command=self._find_command(
+                parsed_filter, sort=full_sort, limit=limit, projection=full_projection
+            ),
+        ) as event:
+            results = list(
+                self._read_collection(raw).find(
+                    parsed_filter,
+                    sort=full_sort,
+                    limit=limit,
+                    projection=full_projection,
+                    **self._max_time(option="max_time_ms"),
+                )
+            )
+            self._record_documents(event, results)
+        return self._next_cursor(results, limit=limit, sort=full_sort), results
+
+    def iter_all(
+        self,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        *,
+        umu_id: Optional[str] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+        raw: bool = False,
+    ) -> Iterator[dict]:
+        """Stream every document matching the conditions, `batch_size` at a time.
+
+        Meant for exports: documents are yielded as the cursor fetches them, so
+        memory stays flat whatever the size of the result.
+        """
+        filter = self._conditions_filter(and_conditions, umu_id)
+        projection = self._resolve_projection(projection)
+        yield from self._observe_cursor(
+            "iter",
+            self._read_collection(raw, analytics=True).find(
+                filter,
+                sort=sort,
+                projection=projection,
+                batch_size=batch_size,
+                **self._max_time(option="max_time_ms"),
+            ),
+            filter=filter,
+            command=self._find_command(filter, sort=sort, projection=projection),
+        )
+
+    def iter_search(
+        self,
+        spec: SearchSpec,
+        query: str,
+        *,
+        limit: Optional[int] = None,
+        batch_size: int = DEFAULT_CURSOR_BATCH_SIZE,
+        sort: Optional[Dict[str, int]] = None,
+        ranges: Optional[Dict[str, Tuple[Any, Any]]] = None,
+        equals: Optional[Dict[str, Any]] = None,
+        in_filters: Optional[Dict[str, List[Any]]] = None,
+        not_in_filters: Optional[Dict[str, List[Any]]] = None,
+    ) -> Iterator[dict]:
+        """Stream the matches of a search spec straight from the `$search` cursor.
+
+        Unlike the paginated `search_by_*` methods, nothing is collected in a
+        `$facet` document, so there is no 16 MB cap and the first document is
+        available before the last one is fetched.
+
+        Parameters:
+            spec: The `SearchSpec` of the repository, e.g. `ITEM_SEARCH`.
+            query: The autocomplete input.
+            limit: Optional maximum number of documents.
+            batch_size: Documents fetched per round trip.
+            ranges, equals, in_filters, not_in_filters: See `SearchSpec.compile`.
+        """
+        pipeline = self._search_stream_query(
+            spec,
+            query,
+            limit=limit,
+            sort=sort,
+            ranges=ranges,
+            equals=equals,
+            in_filters=in_filters,
+            not_in_filters=not_in_filters,
+        )
+        yield from self._observe_cursor(
+            "iter_search",
+            self._read_collection(analytics=True).aggregate(
+                pipeline=pipeline, batchSize=batch_size, **self._max_time()
+            ),
+            filter=pipeline[0],
+            command=self._aggregate_command(pipeline),
+        )
+
+    def _count_documents(
+        self,
+        filter: dict,
+        *,
+        count_policy: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[int]:
+        """Count the documents matching `filter` following the given count policy.
+
+        Parameters:
+            count_policy: Overrides the repository `count_policy` for this call.
+            deadline: What is left of the budget of the call, for "adaptive".
+
+        Returns:
+            Optional[int]: The total, None when the policy is "skip" or when an
+                "adaptive" count does not fit in the budget.
+        """
+        policy = self._count_strategy(filter, count_policy)
+        if policy == COUNT_SKIP:
+            return None
+        cache_key = None
+        if policy == COUNT_CACHED:
+            cache_key = normalize_filter(filter)
+            cached_count = self._count_cache.get(cache_key)
+            if cached_count is not None:
+                return cached_count
+        if policy == COUNT_ADAPTIVE:
+            deadline = deadline or self._deadline()
+            if deadline is not None and not deadline.allows_count():
+                return None
+        max_time = self._max_time(deadline)
+        try:
+            with self._observe(
+                "count", filter=filter, command=self._count_command(filter)
+            ) as event:
+                if policy == COUNT_ESTIMATED:
+                    count = self._read_collection().estimated_document_count(**max_time)
+                elif policy == COUNT_CAPPED:
+                    count = self._read_collection().count_documents(
+                        filter, limit=self.count_cap + 1, **max_time
+                    )
+                else:
+                    count = self._read_collection().count_documents(filter, **max_time)
+                if event is not None:
+                    event.documents = count
+        except QueryTimeoutError:
+            if policy != COUNT_ADAPTIVE:
+                raise
+            logger.info("Count on %s skipped, over budget", self._collection.name)
+            return None
+        if cache_key is not None:
+            self._count_cache.put(cache_key, count)
+        return count
+
+    def _find_page(
+        self,
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        skip: int = 0,
+        limit: int = 0,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        deadline = self._deadline()
+        adaptive = self._count_strategy(filter, count_policy) == COUNT_ADAPTIVE
+        documents_count = None
+        if not adaptive:
+            documents_count = self._count_documents(filter, count_policy=count_policy)
+        projection = self._resolve_projection(projection)
+        documents_cursor = self._read_collection(raw).find(
+            filter,
+            sort=sort,
+            skip=skip,
+            limit=limit,
+            projection=projection,
+            **self._max_time(option="max_time_ms"),
         )
-        return total_count, map(lambda item: item, results)
+        documents_cursor = self._observe_cursor(
+            "find",
+            documents_cursor,
+            filter=filter,
+            command=self._find_command(
+                filter, sort=sort, skip=skip, limit=limit, projection=projection
+            ),
+        )
+        if adaptive:  # the page first, the count only gets what is left
+            documents = list(documents_cursor)
+            documents_count = self._count_documents(
+                filter, count_policy=count_policy, deadline=deadline
+            )
+            return documents_count, iter(documents)
+        return documents_count, map(lambda item: item, documents_cursor)
+
+    def _aggregate_details(self, match: dict, **options: Any) -> List[dict]:
+        pipeline = self._details_query(match, **options)
+        with self._observe(
+            "find_with_details",
+            filter=match,
+            command=self._aggregate_command(pipeline),
+        ) as event:
+            documents = list(
+                self._read_collection().aggregate(pipeline, **self._max_time())
+            )
+            self._record_documents(event, documents)
+        return documents
+
+    def _find_one(
+        self,
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> Optional[dict]:
+        """`find_one` reported to the query hooks."""
+        projection = self._resolve_projection(projection)
+        with self._observe(
+            "find_one",
+            filter=filter,
+            command=self._find_command(
+                filter, sort=sort, limit=1, projection=projection
+            ),
+        ) as event:
+            document = self._read_collection().find_one(
+                filter,
+                sort=sort,
+                projection=projection,
+                **self._max_time(option="max_time_ms"),
+            )
+            self._record_documents(event, [document])
+        return document
+
+    def _cached_find_page(
+        self,
+        cache_key: Optional[tuple],
+        filter: dict,
+        *,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 0,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        """`_find_page` through the repository cache when `cache_key` is set.
+
+        Cached pages are materialized, so only use it for small reference lookups.
+        Raw pages are never cached.
+        """
+        if cache_key is None or self.cache is None or raw:
+            return self._find_page(
+                filter,
+                sort=sort,
+                limit=limit,
+                projection=projection,
+                count_policy=count_policy,
+                raw=raw,
+            )
+        cached_page = self.cache.get(cache_key)
+        if cached_page is MISSING:
+            documents_count, documents = self._find_page(
+                filter,
+                sort=sort,
+                limit=limit,
+                projection=projection,
+                count_policy=count_policy,
+            )
+            cached_page = (documents_count, list(documents))
+            self._cache_query(cache_key, cached_page)
+        documents_count, documents = cached_page
+        return documents_count, iter(documents)
+
+    def _search(
+        self,
+        search: dict,
+        *,
+        page: int = 1,
+        limit: int = DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        analytics: bool = False,
+        exact_filter: Optional[dict] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        """Run a compiled `$search` stage and return one page of its results.
+
+        Totals come from Atlas Search itself (`count` + `$$SEARCH_META`), so only
+        the documents of the page go through the aggregation framework. Policies
+        other than "exact" and "skip" ask for a lower bound up to `count_cap`.
+        With a `search_cache`, pages of a cached complete set are answered from
+        memory and identical searches in flight share one aggregation.
+
+        Parameters:
+            search: The `$search` stage body, usually built by `SearchSpec.compile`.
+            search_after: Sequence token of the last document already seen; when
+                set, `page` is ignored.
+            search_before: Sequence token of the first document already seen, to
+                page backwards.
+            search_tokens: Add the sequence token of every document in
+                `search_token`, implied by `search_after`/`search_before`.
+            analytics: Read with the analytics read preference, for searches
+                across every UMU.
+            exact_filter: `SearchSpec.exact_filter` of a complete identifier; the
+                pages are then read from the B-tree index, and `$search` only
+                runs when nothing matches it.
+
+        Returns:
+            Tuple[Optional[int], List[dict]]: The total of matches (None when the
+                count is skipped) and the documents of the page.
+        """
+        if (
+            exact_filter is not None
+            and search_after is None
+            and search_before is None
+            and not search_tokens
+        ):
+            exact_page = self._exact_page(
+                exact_filter,
+                sort=list(search["sort"].items()),
+                page=page or 1,
+                limit=limit or self.DEFAULT_QUERY_LIMIT,
+                count_policy=count_policy,
+                analytics=analytics,
+            )
+            if exact_page is not None:
+                return exact_page
+        scope = self._search_scope(
+            search,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+        if scope is None:
+            return self._run_search(
+                search,
+                page=page,
+                limit=limit,
+                count_policy=count_policy,
+                search_after=search_after,
+                search_before=search_before,
+                search_tokens=search_tokens,
+                analytics=analytics,
+            )
+        page, limit = page or 1, limit or self.DEFAULT_QUERY_LIMIT
+        cached_page = self.search_cache.lookup(
+            scope,
+            page=page,
+            limit=limit,
+            count=self._search_count(count_policy) is not None,
+        )
+        if cached_page is not None:
+            return cached_page
+
+        def load() -> Tuple[Optional[int], List[dict]]:
+            total_count, results = self._run_search(
+                search,
+                page=page,
+                limit=limit,
+                count_policy=count_policy,
+                analytics=analytics,
+            )
+            self.search_cache.store(scope, results, page=page, limit=limit)
+            return total_count, results
+
+        return self.search_cache.load(
+            (scope, page, limit, count_policy or self.count_policy), load
+        )
+
+    def _run_search(
+        self,
+        search: dict,
+        *,
+        page: int,
+        limit: int,
+        count_policy: Optional[str],
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        analytics: bool = False,
+    ) -> Tuple[Optional[int], List[dict]]:
+        pipeline, count = self._search_query(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
+        total_count: Optional[int] = None
+        deadline = self._deadline()
+        with self._observe(
+            "search", filter=search, command=self._aggregate_command(pipeline)
+        ) as event:
+            aggregation_cursor = self._read_collection(analytics=analytics).aggregate(
+                pipeline=pipeline, **self._max_time(deadline)
+            )
+            if count is None:
+                results = list(aggregation_cursor)
+            else:
+                data: dict = aggregation_cursor.next()
+                results = data.get("results", [])
+                metas = data.get("meta", [])
+                if metas:
+                    total_count = parse_search_meta_count(metas[0])
+                else:
+                    # an empty page has no $$SEARCH_META row, ask Atlas Search directly
+                    meta_cursor = self._read_collection(analytics=analytics).aggregate(
+                        pipeline=build_search_meta_pipeline(search, count=count),
+                        **self._max_time(deadline),
+                    )
+                    total_count = parse_search_meta_count(next(meta_cursor, None))
+            self._record_documents(event, results)
+        if search_before is not None:
+            results.reverse()  # searchBefore returns the documents in reverse order
+        return total_count, results
+
+    def _exact_page(
+        self,
+        filter: dict,
+        *,
+        sort: List[Tuple[str, int]],
+        page: int,
+        limit: int,
+        count_policy: Optional[str] = None,
+        analytics: bool = False,
+    ) -> Optional[Tuple[Optional[int], List[dict]]]:
+        """A page of an exact identifier lookup, None when nothing matches.
+
+        Later pages stay on the index while the filter matches anything, so a
+        lookup that started exact never switches to `$search` halfway through.
+        """
+        deadline = self._deadline()
+        skip = limit * (page - 1)
+        collection = self._read_collection(analytics=analytics)
+        with self._observe(
+            "search_exact",
+            filter=filter,
+            command=self._find_command(filter, sort=sort, skip=skip, limit=limit),
+        ) as event:
+            results = list(
+                collection.find(
+                    filter,
+                    sort=sort,
+                    skip=skip,
+                    limit=limit,
+                    **self._max_time(deadline, option="max_time_ms"),
+                )
+            )
+            self._record_documents(event, results)
+        if not results and (
+            page == 1
+            or collection.find_one(
+                filter, {"_id": 1}, **self._max_time(deadline, option="max_time_ms")
+            )
+            is None
+        ):
+            return None
+        if self._count_strategy(filter, count_policy) == COUNT_SKIP:
+            return None, results
+        if 0 < len(results) < limit:
+            return skip + len(results), results
+        return (
+            self._count_documents(filter, count_policy=count_policy, deadline=deadline),
+            results,
+        )
+
+    def _explain(self, command: Optional[dict]) -> Optional[dict]:
+        try:
+            return self._db.command("explain", command, verbosity="executionStats")
+        except Exception:  # the plan is best effort, never fail the query for it
+            logger.exception("Explain failed for %s", self._collection.name)
+            return None
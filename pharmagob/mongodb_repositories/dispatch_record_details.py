@@ -1,26 +1,52 @@
 from typing import Iterator, List, Optional, Tuple, Union
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
 from .base import BaseMongoDbRepository
 
 
-class DispatchRecordDetailRepository(BaseMongoDbRepository):
+class DispatchRecordDetailRepositoryCore(MongoDbRepositoryCore):
+    """Indexes and filters shared by the sync and async dispatch record detail
+    repositories."""
+
+    INDEXES = (
+        IndexSpec(
+            [
+                ("dispatch_record.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+
+    def _dispatch_record_id_filter(
+        self, dispatch_record_id, *, umu_id: Optional[str]
+    ) -> dict:
+        filter = {"dispatch_record.id": dispatch_record_id}
+        if umu_id:
+            filter.update({"umu_id": umu_id})
+        return filter
+
+
+class DispatchRecordDetailRepository(
+    DispatchRecordDetailRepositoryCore, BaseMongoDbRepository
+):
     def get_by_dispatch_record_id(
         self,
         dispatch_record_id,
         *,
         umu_id: Optional[str] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
-        limit: Optional[int] = None
-    ) -> Tuple[int, Iterator[dict]]:
-        filter = {"dispatch_record.id": dispatch_record_id}
-        if umu_id:
-            filter.update({"umu_id": umu_id})
-        documents_count: int = self._collection.count_documents(filter)
-        documents_cursor = self._collection.find(
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        filter = self._dispatch_record_id_filter(dispatch_record_id, umu_id=umu_id)
+        return self._find_page(
             filter,
             sort=sort,
             projection=projection,
             limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
         )
-        return documents_count, map(lambda item: item, documents_cursor)
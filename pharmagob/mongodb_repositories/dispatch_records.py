@@ -1,65 +1,98 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._search import SearchSpec
 from .base import BaseMongoDbRepository
 
 
-class DispatchRecordRepository(BaseMongoDbRepository):
+class DispatchRecordRepositoryCore(MongoDbRepositoryCore):
+    """Searches, indexes and details shared by the sync and async dispatch
+    record repositories."""
+
+    REFERENCE_SEARCH = SearchSpec(
+        "autocomplete_reference_id_range_created_at_and_dispatch",
+        "reference_id",
+        default_sort={"created_at": MongoDbRepositoryCore.DESCENDING_ORDER},
+        ranges=("created_at", "dispatch_at"),
+        equals=("umu_id", "service"),
+    )
+    INDEXES = (
+        # complete references of `search_by_reference`
+        IndexSpec(
+            [
+                ("reference_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+    # `get_with_details` joins the lines, served by the dispatch_record.id index
+    DETAILS_COLLECTION = "dispatch_record_details"
+    DETAILS_FOREIGN_FIELD = "dispatch_record.id"
+
+    def _reference_search(
+        self,
+        reference_id: str,
+        *,
+        exact: Optional[bool],
+        umu_id: Optional[str],
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+        dispatch_at_gt: Optional[int],
+        dispatch_at_lt: Optional[int],
+        service: Optional[str],
+    ) -> Tuple[dict, Optional[dict]]:
+        """The `$search` of a reference and the filter of its exact lookup."""
+        filters = dict(
+            ranges={
+                "created_at": (created_at_gt, created_at_lt),
+                "dispatch_at": (dispatch_at_gt, dispatch_at_lt),
+            },
+            equals={"umu_id": umu_id, "service": service},
+        )
+        search = self.REFERENCE_SEARCH.compile(reference_id, **filters)
+        exact_filter = self.REFERENCE_SEARCH.exact_filter(
+            reference_id, exact=exact, **filters
+        )
+        return search, exact_filter
+
+
+class DispatchRecordRepository(DispatchRecordRepositoryCore, BaseMongoDbRepository):
     def search_by_reference(
         self,
         reference_id: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
         umu_id: Optional[str] = None,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
         dispatch_at_gt: Optional[int] = None,
         dispatch_at_lt: Optional[int] = None,
-        service: Optional[str] = None
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_reference_id_range_created_at_and_dispatch"
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [
-                    {"autocomplete": {"query": reference_id, "path": "reference_id"}}
-                ]
-            },
-            "sort": {"created_at": BaseMongoDbRepository.DESCENDING_ORDER},
-        }
-        if created_at_gt is not None or created_at_lt is not None:
-            created_at_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_at_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_at_range["lt"] = created_at_lt
-            search["compound"]["must"].append({"range": created_at_range})
-        if dispatch_at_gt is not None or dispatch_at_lt is not None:
-            dispatch_at_range: Dict[str, Any] = {"path": "dispatch_at"}
-            if dispatch_at_gt is not None:
-                dispatch_at_range["gt"] = dispatch_at_gt
-            if dispatch_at_lt is not None:
-                dispatch_at_range["lt"] = dispatch_at_lt
-            search["compound"]["must"].append({"range": dispatch_at_range})
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        if service:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "service", "value": service}}
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+        service: Optional[str] = None,
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._reference_search(
+            reference_id,
+            exact=exact,
+            umu_id=umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            dispatch_at_gt=dispatch_at_gt,
+            dispatch_at_lt=dispatch_at_lt,
+            service=service,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
@@ -1,5 +1,5 @@
-from .base import BaseMongoDbRepository
+from .logs import BaseLogRepository
 
 
-class ItemLogRepository(BaseMongoDbRepository):
+class ItemLogRepository(BaseLogRepository):
     pass
@@ -1,18 +1,41 @@
 from typing import Iterator, List, Optional, Tuple, Union
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
 from .base import BaseMongoDbRepository
 
 
-class ItemsRepository(BaseMongoDbRepository):
+class ItemsRepositoryCore(MongoDbRepositoryCore):
+    """Indexes and filters shared by the sync and async items repositories."""
+
+    INDEXES = (
+        IndexSpec(
+            [
+                ("foreign_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+
+    def _foreign_id_filter(self, foreign_id, *, umu_id: Optional[str]) -> dict:
+        filter = {"foreign_id": foreign_id}
+        if umu_id is not None:
+            filter["umu_id"] = umu_id
+        return filter
+
+
+class ItemsRepository(ItemsRepositoryCore, BaseMongoDbRepository):
     def get_by_foreign_id(
         self,
         foreign_id,
         *,
         umu_id: Optional[str] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
         limit: Optional[int] = None,
-    ) -> Tuple[int, Iterator[dict]]:
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
         """Retrieve a document based on its an paremeter.
 
         Parameters:
@@ -21,14 +44,22 @@ class ItemsRepository(BaseMongoDbRepository):
         Returns:
             Tuple[int, Iterator[dict]]: The retrieved resources if found
         """
-        filter = {"foreign_id": foreign_id}
-        if umu_id is not None:
-            filter["umu_id"] = umu_id
-        documents_count: int = self._collection.count_documents(filter)
-        documents_cursor = self._collection.find(
+        filter = self._foreign_id_filter(foreign_id, umu_id=umu_id)
+        cache_key = self._query_cache_key(
+            "get_by_foreign_id",
+            foreign_id=foreign_id,
+            umu_id=umu_id,
+            sort=sort,
+            projection=projection,
+            limit=limit,
+            count_policy=count_policy,
+        )
+        return self._cached_find_page(
+            cache_key,
             filter,
             sort=sort,
             projection=projection,
             limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
         )
-        return documents_count, map(lambda item: item, documents_cursor)
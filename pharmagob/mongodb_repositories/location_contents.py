@@ -1,15 +1,318 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+from pymongo import ReturnDocument, UpdateOne
+
+from ._allocation import (
+    ALLOCATION_BATCH_SIZE,
+    AllocationPlan,
+    allocation_pipeline,
+    build_plan,
+    consumption_operations,
+    consumption_records,
+    requested_quantities,
+    reservation_operations,
+)
+from ._bulk import iter_batches
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._reports import (
+    REPORT_STATUS_COMPLETED,
+    REPORT_STATUS_FAILED,
+    REPORT_STATUS_PROCESSING,
+    REPORT_TTL_SECONDS,
+    ReportAggregationHandle,
+    build_stock_report_pipeline,
+    chunk_done_update,
+    chunk_filter,
+    plan_report,
+    report_chunks_collection_name,
+    report_collection_name,
+)
+from ._search import SearchSpec
+from ._stock import (
+    EVENTS_COLLECTION,
+    QUANTITY_LOGS_COLLECTION,
+    SOURCE_PROJECTION,
+    InsufficientStockError,
+    StockMove,
+    StockMoveResult,
+    adjustment_records,
+    available_quantities,
+    destination_operation,
+    guarded_filter,
+    increment,
+    move_operations,
+    move_records,
+    now_ms,
+    short_moves,
+    source_update,
+    sources_filter,
+    triad_filter,
+)
 from .base import BaseMongoDbRepository
 
+if TYPE_CHECKING:
+    from .reports import ReportRepository
+
+
+class LocationContentRepositoryCore(MongoDbRepositoryCore):
+    """Searches, indexes and queries shared by the sync and async location
+    content repositories."""
+
+    ITEM_SEARCH = SearchSpec(
+        "autocomplete_item_id_range_expiration_date_range_quantity",
+        "item.id",
+        default_sort={"expiration_date": MongoDbRepositoryCore.ASCENDING_ORDER},
+        ranges=("expiration_date", "quantity"),
+        equals=("umu_id", "lot", "location.id", "location.label_code"),
+        in_filters=("umu_id",),
+        not_in_filters=("umu_id",),
+    )
+
+    INDEXES = (
+        IndexSpec(
+            [
+                ("item.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("lot", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("location.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+        # umu_id lists sorted by expiration; covers the "summary" projection
+        IndexSpec(
+            [
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("expiration_date", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("item.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("lot", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("quantity", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ],
+            name="umu_id_expiration_date_summary",
+        ),
+        # polling fallback of `StockTotalsRepository.sync`
+        IndexSpec([("updated_at", MongoDbRepositoryCore.ASCENDING_ORDER)]),
+        # FEFO walk of `allocate`
+        IndexSpec(
+            [
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("item.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("expiration_date", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+    # report collections are dropped by the server a day after their last write
+    REPORT_TTL_INDEX = IndexSpec(
+        [("createdAt", MongoDbRepositoryCore.ASCENDING_ORDER)],
+        expire_after_seconds=REPORT_TTL_SECONDS,
+    )
+    # written together with the quantity changes of `adjust_quantity`/`move_stock`
+    QUANTITY_LOGS_COLLECTION = QUANTITY_LOGS_COLLECTION
+    EVENTS_COLLECTION = EVENTS_COLLECTION
 
-class LocationContentRepository(BaseMongoDbRepository):
+    PROJECTIONS = {
+        "summary": {
+            "_id": 1,
+            "umu_id": 1,
+            "expiration_date": 1,
+            "item.id": 1,
+            "lot": 1,
+            "quantity": 1,
+        },
+        "card": {
+            "_id": 1,
+            "umu_id": 1,
+            "expiration_date": 1,
+            "item.id": 1,
+            "item.short_description": 1,
+            "lot": 1,
+            "quantity": 1,
+            "location.id": 1,
+            "location.label_code": 1,
+        },
+    }
+
+    def _item_search(
+        self,
+        search_str: str,
+        *,
+        sort: Optional[Dict[str, int]],
+        umu_id: Optional[str],
+        expiration_date_gt: Optional[int],
+        expiration_date_lt: Optional[int],
+        quantity_gt: Optional[int],
+        quantity_lt: Optional[int],
+        lot: Optional[str],
+        location_id: Optional[str],
+        location_label_code: Optional[str],
+    ) -> dict:
+        return self.ITEM_SEARCH.compile(
+            search_str,
+            sort=sort,
+            ranges={
+                "expiration_date": (expiration_date_gt, expiration_date_lt),
+                "quantity": (quantity_gt, quantity_lt),
+            },
+            equals={
+                "umu_id": umu_id,
+                "lot": lot,
+                "location.id": location_id,
+                "location.label_code": location_label_code,
+            },
+        )
+
+    def _item_global_search(
+        self,
+        search_str: str,
+        *,
+        sort: Optional[Dict[str, int]],
+        umu_id_in: Optional[List[str]],
+        umu_id_not_in: Optional[List[str]],
+        expiration_date_gt: Optional[int],
+        expiration_date_lt: Optional[int],
+        quantity_gt: Optional[int],
+        quantity_lt: Optional[int],
+        lot: Optional[str],
+        location_id: Optional[str],
+        location_label_code: Optional[str],
+    ) -> dict:
+        return self.ITEM_SEARCH.compile(
+            search_str,
+            sort=sort,
+            ranges={
+                "expiration_date": (expiration_date_gt, expiration_date_lt),
+                "quantity": (quantity_gt, quantity_lt),
+            },
+            equals={
+                "lot": lot,
+                "location.id": location_id,
+                "location.label_code": location_label_code,
+            },
+            in_filters={"umu_id": umu_id_in},
+            not_in_filters={"umu_id": umu_id_not_in},
+        )
+
+    def _allocation_pipelines(
+        self,
+        umu_id: str,
+        requested: Dict[str, int],
+        *,
+        expires_after: Optional[int],
+    ) -> Iterator[List[dict]]:
+        """One FEFO pipeline per `ALLOCATION_BATCH_SIZE` requested items."""
+        for item_ids in iter_batches(requested, ALLOCATION_BATCH_SIZE):
+            yield allocation_pipeline(
+                umu_id,
+                {item_id: requested[item_id] for item_id in item_ids},
+                expires_after=expires_after,
+            )
+
+    def _report_collections(self, report_id: str) -> Tuple[Any, Any]:
+        """The output and chunks collections of a report; both need
+        `REPORT_TTL_INDEX`."""
+        return (
+            self._db[report_collection_name(report_id)],
+            self._db[report_chunks_collection_name(report_id)],
+        )
+
+    def _report_chunk_pipeline(
+        self, filters: Dict[str, Any], umu_id: Any, collection_name: str
+    ) -> List[dict]:
+        return build_stock_report_pipeline(
+            chunk_filter(filters, umu_id), collection_name
+        )
+
+    def _adjustment(
+        self,
+        item_id: str,
+        lot: str,
+        location_id: str,
+        delta: int,
+        *,
+        allow_negative: bool,
+    ) -> Tuple[dict, dict, int]:
+        """The guarded filter, the update and the time of an `adjust_quantity`."""
+        if not delta:
+            raise ValueError("delta must not be 0")
+        filter = guarded_filter(
+            item_id, lot, location_id, delta, allow_negative=allow_negative
+        )
+        now = now_ms()
+        return filter, increment(delta, now), now
+
+    @staticmethod
+    def _adjustment_error(
+        item_id: str, lot: str, location_id: str, delta: int
+    ) -> InsufficientStockError:
+        return InsufficientStockError(
+            f"Not enough stock of {item_id}/{lot} at {location_id} to take {-delta}"
+        )
+
+    @staticmethod
+    def _check_batch(matched: int, expected: int, message: str) -> None:
+        """Raise when fewer guarded operations matched than were sent."""
+        if matched < expected:
+            raise InsufficientStockError(message)
+
+    def _move_writes(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> Tuple[List[UpdateOne], List[dict], List[dict]]:
+        """The source decrements and destination upserts, logs and events of a
+        transactional `move_stock`."""
+        logs, events = move_records(moves, now=now, reason=reason)
+        return move_operations(moves, now), logs, events
+
+    def _destination_writes(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> Tuple[List[UpdateOne], List[dict], List[dict]]:
+        """Destination upserts, logs and events of the moves whose source moved."""
+        logs, events = move_records(moves, now=now, reason=reason)
+        return [destination_operation(move, now) for move in moves], logs, events
+
+    def _check_allocation(
+        self, plan: AllocationPlan, umu_id: str, *, allow_partial: bool
+    ) -> None:
+        if not plan.ok and not allow_partial:
+            raise InsufficientStockError(
+                f"Not enough stock in {umu_id} of {', '.join(plan.shortages)}"
+            )
+
+    def _consumption(
+        self,
+        plan: AllocationPlan,
+        *,
+        reason: Optional[str],
+        reference: Optional[str],
+    ) -> Tuple[List[UpdateOne], List[dict], List[dict]]:
+        """The decrements, logs and events of `consume_allocation`."""
+        if not plan.reserved:
+            raise ValueError("Only a reserved allocation plan can be consumed")
+        now = now_ms()
+        logs, events = consumption_records(
+            plan.allocations, now=now, reason=reason, reference=reference
+        )
+        return consumption_operations(plan.allocations, now), logs, events
+
+
+class LocationContentRepository(LocationContentRepositoryCore, BaseMongoDbRepository):
     def search_by_item(
         self,
         search_str: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
         sort: Optional[Dict[str, int]] = None,
         umu_id: Optional[str] = None,
         expiration_date_gt: Optional[int] = None,
@@ -19,69 +322,28 @@ class LocationContentRepository(BaseMongoDbRepository):
         lot: Optional[str] = None,
         location_id: Optional[str] = None,
         location_label_code: Optional[str] = None
-    ) -> Tuple[int, List[dict]]:
-        page = page or 1
-        limit = limit or BaseMongoDbRepository.DEFAULT_QUERY_LIMIT
-        SEARCH_INDEX = "autocomplete_item_id_range_expiration_date_range_quantity"
-        default_sort = sort
-        if default_sort is None:
-            default_sort = {"expiration_date": BaseMongoDbRepository.ASCENDING_ORDER}
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [{"autocomplete": {"query": search_str, "path": "item.id"}}]
-            },
-            "sort": default_sort,
-        }
-        if expiration_date_gt is not None or expiration_date_lt is not None:
-            expiration_date_range: Dict[str, Any] = {"path": "expiration_date"}
-            if expiration_date_gt is not None:
-                expiration_date_range["gt"] = expiration_date_gt
-            if expiration_date_lt is not None:
-                expiration_date_range["lt"] = expiration_date_lt
-            search["compound"]["must"].append({"range": expiration_date_range})
-        if quantity_gt is not None or quantity_lt is not None:
-            quantity_range: Dict[str, Any] = {"path": "quantity"}
-            if quantity_gt is not None:
-                quantity_range["gt"] = quantity_gt
-            if quantity_lt is not None:
-                quantity_range["lt"] = quantity_lt
-            search["compound"]["must"].append({"range": quantity_range})
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        if lot:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "lot", "value": lot}}
-            )
-        if location_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "location.id", "value": location_id}}
-            )
-        if location_label_code:
-            search["compound"]["filter"].append(
-                {
-                    "equals": {
-                        "path": "location.label_code",
-                        "value": location_label_code,
-                    }
-                }
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._item_search(
+            search_str,
+            sort=sort,
+            umu_id=umu_id,
+            expiration_date_gt=expiration_date_gt,
+            expiration_date_lt=expiration_date_lt,
+            quantity_gt=quantity_gt,
+            quantity_lt=quantity_lt,
+            lot=lot,
+            location_id=location_id,
+            location_label_code=location_label_code,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
 
     def search_by_item_global(
         self,
@@ -89,6 +351,10 @@ class LocationContentRepository(BaseMongoDbRepository):
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
         sort: Optional[Dict[str, int]] = None,
         umu_id_in: Optional[List[str]] = None,
         umu_id_not_in: Optional[List[str]] = None,
@@ -99,109 +365,108 @@ class LocationContentRepository(BaseMongoDbRepository):
         lot: Optional[str] = None,
         location_id: Optional[str] = None,
         location_label_code: Optional[str] = None
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_item_id_range_expiration_date_range_quantity"
-        default_sort = sort
-        if default_sort is None:
-            default_sort = {"expiration_date": BaseMongoDbRepository.ASCENDING_ORDER}
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [{"autocomplete": {"query": search_str, "path": "item.id"}}]
-            },
-            "sort": default_sort,
-        }
-        if expiration_date_gt is not None or expiration_date_lt is not None:
-            expiration_date_range: Dict[str, Any] = {"path": "expiration_date"}
-            if expiration_date_gt is not None:
-                expiration_date_range["gt"] = expiration_date_gt
-            if expiration_date_lt is not None:
-                expiration_date_range["lt"] = expiration_date_lt
-            search["compound"]["must"].append({"range": expiration_date_range})
-        if quantity_gt is not None or quantity_lt is not None:
-            quantity_range: Dict[str, Any] = {"path": "quantity"}
-            if quantity_gt is not None:
-                quantity_range["gt"] = quantity_gt
-            if quantity_lt is not None:
-                quantity_range["lt"] = quantity_lt
-            search["compound"]["must"].append({"range": quantity_range})
-        search["compound"]["filter"] = []
-        if lot:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "lot", "value": lot}}
-            )
-        if location_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "location.id", "value": location_id}}
-            )
-        if location_label_code:
-            search["compound"]["filter"].append(
-                {
-                    "equals": {
-                        "path": "location.label_code",
-                        "value": location_label_code,
-                    }
-                }
-            )
-        if umu_id_in:
-            search["compound"]["filter"].append(
-                {"in": {"path": "umu_id", "value": umu_id_in}}
-            )
-        if umu_id_not_in:
-            search["compound"].setdefault("mustNot", []).extend(
-                [{"in": {"path": "umu_id", "value": umu_id_not_in}}]
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._item_global_search(
+            search_str,
+            sort=sort,
+            umu_id_in=umu_id_in,
+            umu_id_not_in=umu_id_not_in,
+            expiration_date_gt=expiration_date_gt,
+            expiration_date_lt=expiration_date_lt,
+            quantity_gt=quantity_gt,
+            quantity_lt=quantity_lt,
+            lot=lot,
+            location_id=location_id,
+            location_label_code=location_label_code,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            analytics=True,
+        )
 
     def trigger_report_aggregation(
-        self, 
-        report_id: str, 
-        filters: Dict[str, Any]
+        self, report_id: str, filters: Dict[str, Any]
     ) -> str:
-        temp_collection_name = f"report_{report_id}"
-        
-        pipeline = [
-            {"$match": filters},
-            {"$group": {
-                "_id": {
-                    "umu_id": "$umu_id",
-                    "item_id": "$item.id"
-                },
-                "total_quantity": {"$sum": "$quantity"},
-                "description": {"$first": "$item.short_description"}
-            }},
-            {"$project": {
-                "_id": 0,
-                "umu_id": "$_id.umu_id",
-                "item_id": "$_id.item_id",
-                "description": "$description",
-                "total_quantity": "$total_quantity",
-                "createdAt": "$$NOW"
-            }},
-            {"$out": temp_collection_name}
-        ]
-        
-        self._collection.aggregate(pipeline)
-        
-        self._db[temp_collection_name].create_index(
-            "createdAt", 
-            expireAfterSeconds=86400
-        )
-        
-        return temp_collection_name
-    
+        """Build the per-UMU/item stock report and wait for it.
+
+        Returns:
+            str: The name of the collection holding the report rows.
+        """
+        handle = ReportAggregationHandle(report_id, report_collection_name(report_id))
+        self._run_report_aggregation(handle, filters, reports=None)
+        return handle.collection_name
+
+    def start_report_aggregation(
+        self,
+        report_id: str,
+        filters: Dict[str, Any],
+        *,
+        reports: Optional["ReportRepository"] = None,
+    ) -> ReportAggregationHandle:
+        """Build the per-UMU/item stock report in a background thread.
+
+        The report is computed one UMU at a time with `allowDiskUse` and merged into
+        `report_<report_id>`; finished UMUs are recorded in
+        `report_<report_id>_chunks`, so calling it again with the same `report_id`
+        resumes an interrupted run. Progress goes to `reports.update_status`.
+
+        Returns:
+            ReportAggregationHandle: A handle the caller can poll or wait on.
+        """
+        handle = ReportAggregationHandle(report_id, report_collection_name(report_id))
+        handle.start(
+            lambda running: self._run_report_aggregation(
+                running, filters, reports=reports
+            )
+        )
+        return handle
+
+    def _run_report_aggregation(
+        self,
+        handle: ReportAggregationHandle,
+        filters: Dict[str, Any],
+        *,
+        reports: Optional["ReportRepository"],
+    ) -> None:
+        output, chunks = self._report_collections(handle.report_id)
+        output.create_indexes([self.REPORT_TTL_INDEX.model()])
+        chunks.create_indexes([self.REPORT_TTL_INDEX.model()])
+        # only the read-only distinct goes to the analytics reader, the $merge
+        # writes and must run on the primary
+        reader = self._read_collection(analytics=True)
+        run = plan_report(reader.distinct("umu_id", filters), chunks.distinct("_id"))
+        handle.progress = run.progress
+        try:
+            for umu_id in run.pending():
+                self._collection.aggregate(
+                    self._report_chunk_pipeline(
+                        filters, umu_id, handle.collection_name
+                    ),
+                    allowDiskUse=True,
+                )
+                chunks.update_one({"_id": umu_id}, chunk_done_update(), upsert=True)
+                run.done.add(umu_id)
+                handle.progress = run.progress
+                if reports is not None:
+                    reports.update_status(
+                        handle.report_id, REPORT_STATUS_PROCESSING, handle.progress
+                    )
+        except Exception:
+            if reports is not None:
+                reports.update_status(
+                    handle.report_id, REPORT_STATUS_FAILED, handle.progress
+                )
+            raise
+        handle.progress = 100
+        if reports is not None:
+            reports.update_status(handle.report_id, REPORT_STATUS_COMPLETED, 100)
+
     def find_by_logic_triad(
         self, item_id: str, lot: str, location_id: str
     ) -> Optional[dict]:
@@ -210,4 +475,309 @@ class LocationContentRepository(BaseMongoDbRepository):
             "lot": lot,
             "location.id": location_id
         }
-        return self._collection.find_one(query)
\ No newline at end of file
+        return self._find_one(query)
+
+    def adjust_quantity(
+        self,
+        item_id: str,
+        lot: str,
+        location_id: str,
+        delta: int,
+        *,
+        allow_negative: bool = False,
+        reason: Optional[str] = None,
+        reference: Optional[str] = None,
+        session: Any = None,
+    ) -> Optional[dict]:
+        """Add `delta` (negative to take stock out) to one location content.
+
+        The guard and the `$inc` are a single `find_one_and_update`, so concurrent
+        adjustments can never take more than the available quantity, the one not
+        reserved by `allocate`. The
+        quantity log and the event are written next, in `session` when given
+        (pass one inside a transaction to make the three writes atomic).
+
+        Returns:
+            Optional[dict]: The updated document, None if the triad does not exist.
+
+        Raises:
+            InsufficientStockError: If the available quantity is lower than
+                `-delta`.
+        """
+        filter, update, now = self._adjustment(
+            item_id, lot, location_id, delta, allow_negative=allow_negative
+        )
+        with self._observe("find_one_and_update", filter=filter):
+            document = self._collection.find_one_and_update(
+                filter, update, return_document=ReturnDocument.AFTER, session=session
+            )
+        if document is None:
+            if "$expr" in filter and self._find_one(
+                triad_filter(item_id, lot, location_id), projection={"_id": 1}
+            ):
+                raise self._adjustment_error(item_id, lot, location_id, delta)
+            return None
+        self._invalidate_document(document["_id"])
+        log, event = adjustment_records(
+            document, delta, now=now, reason=reason, reference=reference
+        )
+        self._db[self.QUANTITY_LOGS_COLLECTION].insert_one(log, session=session)
+        self._db[self.EVENTS_COLLECTION].insert_one(event, session=session)
+        return document
+
+    def move_stock(
+        self,
+        moves: Iterable[StockMove],
+        *,
+        reason: Optional[str] = None,
+        transactional: bool = True,
+    ) -> StockMoveResult:
+        """Apply a batch of stock moves with their quantity logs and events.
+
+        With `transactional` (needs a replica set) every source decrement and
+        destination upsert goes in one ordered `bulk_write`, and the logs and
+        events in one `insert_many` each, all inside one transaction: either the
+        whole batch is applied or none of it.
+
+        Without it each source is decremented by its own guarded update, then the
+        destinations, logs and events of the accepted moves are written in bulk;
+        moves lacking stock are skipped and reported in `failed`.
+
+        Raises:
+            InsufficientStockError: In transactional mode, if any source lacks
+                stock; `moves` lists the offending positions.
+        """
+        moves = list(moves)
+        if not moves:
+            return StockMoveResult()
+        now = now_ms()
+        try:
+            if not transactional:
+                return self._move_stock_unsafe(moves, now=now, reason=reason)
+            self._move_stock_transaction(moves, now=now, reason=reason)
+        except InsufficientStockError as exc:
+            exc.moves = self._short_moves(moves)
+            raise
+        finally:
+            self._invalidate_cache()
+        return StockMoveResult(moved=list(range(len(moves))))
+
+    def _move_stock_transaction(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> None:
+        operations, logs, events = self._move_writes(moves, now=now, reason=reason)
+
+        def apply(session) -> None:
+            with self._observe("bulk_write") as event:
+                if event is not None:
+                    event.documents = len(operations)
+                result = self._collection.bulk_write(
+                    operations, ordered=True, session=session
+                )
+            # every source must match its guard, every destination match or upsert
+            self._check_batch(
+                result.matched_count + result.upserted_count,
+                len(operations),
+                "Not enough stock for the whole batch",
+            )
+            self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(
+                logs, ordered=False, session=session
+            )
+            self._db[self.EVENTS_COLLECTION].insert_many(
+                events, ordered=False, session=session
+            )
+
+        with self._db.client.start_session() as session:
+            session.with_transaction(apply)
+
+    def _move_stock_unsafe(
+        self, moves: List[StockMove], *, now: int, reason: Optional[str]
+    ) -> StockMoveResult:
+        result = StockMoveResult()
+        for position, move in enumerate(moves):
+            filter, update = source_update(move, now)
+            with self._observe("find_one_and_update", filter=filter):
+                source = self._collection.find_one_and_update(
+                    filter, update, projection={"_id": 1}
+                )
+            if source is None:
+                result.failed.append(position)
+            else:
+                result.moved.append(position)
+        if not result.moved:
+            return result
+        operations, logs, events = self._destination_writes(
+            [moves[position] for position in result.moved], now=now, reason=reason
+        )
+        with self._observe("bulk_write") as event:
+            if event is not None:
+                event.documents = len(operations)
+            self._collection.bulk_write(operations, ordered=False)
+        self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(logs, ordered=False)
+        self._db[self.EVENTS_COLLECTION].insert_many(events, ordered=False)
+        return result
+
+    def allocate(
+        self,
+        umu_id: str,
+        lines: Iterable[Tuple[str, int]],
+        *,
+        reserve: bool = False,
+        allow_partial: bool = False,
+        include_expired: bool = False,
+    ) -> AllocationPlan:
+        """Pick the lots of `(item_id, quantity)` lines, first expired first out.
+
+        The server walks the lots of up to `ALLOCATION_BATCH_SIZE` items per
+        aggregation and returns only the ones the request needs, so a whole
+        prescription costs one round trip per batch. Quantities already reserved
+        are not available.
+
+        With `reserve`, planning and the guarded `$inc` of `reserved` run in one
+        transaction (needs a replica set); a concurrent change to the same lots
+        makes the driver retry it, so the reserved plan is always consistent.
+
+        Parameters:
+            lines: Repeated items are summed.
+            allow_partial: Reserve what is available when some item falls short
+                instead of raising; the plan lists the `shortages`.
+            include_expired: Also allocate lots whose `expiration_date` passed.
+
+        Raises:
+            InsufficientStockError: With `reserve`, if some item falls short and
+                `allow_partial` is False; nothing is reserved.
+        """
+        requested = requested_quantities(lines)
+        if not requested:
+            return AllocationPlan()
+        expires_after = None if include_expired else now_ms()
+        if not reserve:
+            return self._plan_allocation(
+                self._read_collection(), umu_id, requested, expires_after=expires_after
+            )
+        plan = AllocationPlan()
+
+        def apply(session) -> None:
+            nonlocal plan
+            plan = self._plan_allocation(
+                self._collection,
+                umu_id,
+                requested,
+                expires_after=expires_after,
+                session=session,
+            )
+            self._check_allocation(plan, umu_id, allow_partial=allow_partial)
+            operations = reservation_operations(plan.allocations, now_ms())
+            if operations:
+                with self._observe("bulk_write") as event:
+                    if event is not None:
+                        event.documents = len(operations)
+                    result = self._collection.bulk_write(
+                        operations, ordered=True, session=session
+                    )
+                self._check_batch(
+                    result.matched_count, len(operations), "The allocated stock changed"
+                )
+            plan.reserved = True
+
+        try:
+            with self._db.client.start_session() as session:
+                session.with_transaction(apply)
+        finally:
+            self._invalidate_cache()
+        return plan
+
+    def release_allocation(self, plan: AllocationPlan) -> int:
+        """Give back what a reserved plan set aside, e.g. for a cancelled dispatch.
+
+        Returns:
+            int: The number of location contents released.
+        """
+        if not plan.reserved:
+            return 0
+        summary = self.bulk_write(
+            reservation_operations(plan.allocations, now_ms(), release=True),
+            ordered=False,
+        )
+        plan.reserved = False
+        return summary.modified_count
+
+    def consume_allocation(
+        self,
+        plan: AllocationPlan,
+        *,
+        reason: Optional[str] = None,
+        reference: Optional[str] = None,
+    ) -> int:
+        """Take a reserved plan out of stock, e.g. once the dispatch leaves.
+
+        The `quantity` and `reserved` of every allocation drop together, and
+        the quantity logs and events are written, in one transaction (needs a
+        replica set): either the whole plan is consumed or none of it.
+
+        Returns:
+            int: The number of location contents consumed.
+
+        Raises:
+            ValueError: If the plan is not reserved.
+            InsufficientStockError: If part of the plan is no longer reserved,
+                e.g. it was released or already consumed; nothing is consumed.
+        """
+        operations, logs, events = self._consumption(
+            plan, reason=reason, reference=reference
+        )
+
+        def apply(session) -> None:
+            with self._observe("bulk_write") as event:
+                if event is not None:
+                    event.documents = len(operations)
+                result = self._collection.bulk_write(
+                    operations, ordered=True, session=session
+                )
+            self._check_batch(
+                result.matched_count, len(operations), "The reserved stock changed"
+            )
+            self._db[self.QUANTITY_LOGS_COLLECTION].insert_many(
+                logs, ordered=False, session=session
+            )
+            self._db[self.EVENTS_COLLECTION].insert_many(
+                events, ordered=False, session=session
+            )
+
+        if operations:
+            try:
+                with self._db.client.start_session() as session:
+                    session.with_transaction(apply)
+            finally:
+                self._invalidate_cache()
+        plan.reserved = False
+        return len(operations)
+
+    def _plan_allocation(
+        self,
+        collection: Any,
+        umu_id: str,
+        requested: Dict[str, int],
+        *,
+        expires_after: Optional[int],
+        session: Any = None,
+    ) -> AllocationPlan:
+        rows: List[dict] = []
+        for pipeline in self._allocation_pipelines(
+            umu_id, requested, expires_after=expires_after
+        ):
+            with self._observe(
+                "allocate",
+                filter=pipeline[0],
+                command=self._aggregate_command(pipeline),
+            ) as event:
+                batch = list(
+                    collection.aggregate(pipeline, session=session, **self._max_time())
+                )
+                self._record_documents(event, batch)
+            rows.extend(batch)
+        return build_plan(requested, rows)
+
+    def _short_moves(self, moves: List[StockMove]) -> List[int]:
+        sources = self._collection.find(sources_filter(moves), SOURCE_PROJECTION)
+        return short_moves(moves, available_quantities(sources))
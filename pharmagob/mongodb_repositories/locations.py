@@ -1,18 +1,41 @@
 from typing import Iterator, List, Optional, Tuple, Union
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
 from .base import BaseMongoDbRepository
 
 
-class LocationRepository(BaseMongoDbRepository):
+class LocationRepositoryCore(MongoDbRepositoryCore):
+    """Indexes and filters shared by the sync and async location repositories."""
+
+    INDEXES = (
+        IndexSpec(
+            [
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("label_code", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+
+    def _umu_id_filter(self, umu_id, *, label_code: Optional[str]) -> dict:
+        filter = {"umu_id": umu_id}
+        if label_code is not None:
+            filter["label_code"] = label_code
+        return filter
+
+
+class LocationRepository(LocationRepositoryCore, BaseMongoDbRepository):
     def get_by_umu_id(
         self,
         umu_id,
         *,
         label_code: Optional[str] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
-        limit: Optional[int] = None
-    ) -> Tuple[int, Iterator[dict]]:
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
         """Retrieve a document based on its unique identifier.
 
         Parameters:
@@ -21,14 +44,22 @@ class LocationRepository(BaseMongoDbRepository):
         Returns:
             Tuple[int, Iterator[dict]]: The retrieved resources if found
         """
-        filter = {"umu_id": umu_id}
-        if label_code is not None:
-            filter["label_code"] = label_code
-        documents_count: int = self._collection.count_documents(filter)
-        documents_cursor = self._collection.find(
+        filter = self._umu_id_filter(umu_id, label_code=label_code)
+        cache_key = self._query_cache_key(
+            "get_by_umu_id",
+            umu_id=umu_id,
+            label_code=label_code,
+            sort=sort,
+            projection=projection,
+            limit=limit,
+            count_policy=count_policy,
+        )
+        return self._cached_find_page(
+            cache_key,
             filter,
             sort=sort,
             projection=projection,
             limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
         )
-        return documents_count, map(lambda item: item, documents_cursor)
@@ -0,0 +1,200 @@
+from threading import Event, Thread
+from typing import Any, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+
+from ._bulk import BulkWriteSummary, iter_batches
+from ._indexes import IndexDrift
+from ._instrumentation import logger
+from ._logs import LogRepositoryCore, archive_batch_filter
+from .base import BaseMongoDbRepository
+
+
+class BaseLogRepository(LogRepositoryCore, BaseMongoDbRepository):
+    """Base of the append-mostly `*_logs`/`*_events` repositories.
+
+    `log` buffers entries and writes them with unordered `insert_many` once
+    `flush_size` entries are pending or, from a background thread, every
+    `flush_interval` seconds. Call `close` (or use the repository as a context
+    manager) to write what is left on shutdown; `create` still writes at once.
+    """
+
+    def __init__(self, db_manager: Any, collection_name: str, **kwargs: Any):
+        super().__init__(db_manager, collection_name, **kwargs)
+        self._closed = Event()
+        self._flusher: Optional[Thread] = None
+
+    def __enter__(self) -> "BaseLogRepository":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def log(self, entry: dict) -> None:
+        """Queue one entry, stamping its timestamp when missing."""
+        self.log_many([entry])
+
+    def log_many(self, entries: Iterable[dict]) -> None:
+        if self._buffer.add(self._stamp(entry) for entry in entries):
+            self.flush()
+        elif self._buffer.interval > 0 and self._flusher is None:
+            self._start_flusher()
+
+    def flush(self) -> BulkWriteSummary:
+        """Write the buffered entries now.
+
+        Entries rejected by the server (e.g. a duplicate `_id`) are reported in
+        the summary and dropped; on any other error the unwritten entries go back
+        to the buffer and the error is raised.
+        """
+        entries = self._buffer.drain()
+        summary = BulkWriteSummary()
+        offset = 0
+        for batch in iter_batches(entries, self.DEFAULT_BULK_BATCH_SIZE):
+            try:
+                with self._observe("insert_many") as event:
+                    if event is not None:
+                        event.documents = len(batch)
+                    result = self._log_collection.insert_many(batch, ordered=False)
+            except BulkWriteError as exc:
+                summary.add_details(exc.details, offset=offset)
+                logger.error(
+                    "%s log entries rejected by %s",
+                    len(exc.details.get("writeErrors", [])),
+                    self._collection.name,
+                )
+            except Exception:
+                self._buffer.requeue(entries[offset:])
+                raise
+            else:
+                summary.inserted_count += len(result.inserted_ids)
+            offset += len(batch)
+        if entries:
+            self._invalidate_queries()
+        return summary
+
+    def close(self) -> BulkWriteSummary:
+        """Stop the background flush and write the remaining entries."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        return self.flush()
+
+    def _start_flusher(self) -> None:
+        self._closed.clear()
+        self._flusher = Thread(
+            target=self._flush_periodically,
+            name=f"log-flush-{self._collection.name}",
+            daemon=True,
+        )
+        self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self._buffer.interval):
+            if not self._buffer.due():
+                continue
+            try:
+                self.flush()
+            except Exception:  # retried on the next tick, the entries are requeued
+                logger.exception("Background flush of %s failed", self._collection.name)
+
+    def iter_range(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        *,
+        umu_id: Optional[str] = None,
+        and_conditions: Optional[List[Tuple[str, str, Any]]] = None,
+        descending: bool = False,
+        projection: Optional[Union[list, dict, str]] = None,
+        batch_size: int = BaseMongoDbRepository.DEFAULT_CURSOR_BATCH_SIZE,
+        raw: bool = False,
+    ) -> Iterator[dict]:
+        """Stream the entries logged in `[start, end)` (milliseconds) in time order.
+
+        Pending buffered entries are flushed first, so they are part of the range.
+        """
+        self.flush()
+        yield from self.iter_all(
+            self._range_conditions(start, end, and_conditions),
+            umu_id=umu_id,
+            sort=self._range_sort(descending),
+            projection=projection,
+            batch_size=batch_size,
+            raw=raw,
+        )
+
+    def ensure_collection(self) -> bool:
+        """Create the `TIME_SERIES` collection if it does not exist yet.
+
+        Returns:
+            bool: True if the collection was created.
+        """
+        if not self.TIME_SERIES:
+            return False
+        name = self._collection.name
+        if self._db.list_collection_names(filter={"name": name}):
+            return False
+        try:
+            self._db.create_collection(name, **self.collection_options())
+        except CollectionInvalid:  # created concurrently
+            return False
+        return True
+
+    def ensure_indexes(
+        self,
+        *,
+        dry_run: bool = False,
+        search_indexes: bool = True,
+        update_search_indexes: bool = False,
+    ) -> IndexDrift:
+        """Create the time-series collection first, then as the base class does."""
+        errors = []
+        if not dry_run:
+            try:
+                self.ensure_collection()
+            except OperationFailure as exc:
+                errors.append(str(exc))
+        drift = super().ensure_indexes(
+            dry_run=dry_run,
+            search_indexes=search_indexes,
+            update_search_indexes=update_search_indexes,
+        )
+        drift.errors[:0] = errors
+        return drift
+
+    def archive(self, *, older_than: Optional[int] = None) -> int:
+        """Move the entries older than `older_than` to `ARCHIVE_COLLECTION`.
+
+        The `_id`s of the entries are read first, then each batch of them is
+        copied with `$merge` and deleted, so an entry landing in the range while
+        the archive runs is never deleted without a copy, and an interrupted
+        archive can simply be run again.
+
+        Parameters:
+            older_than: Millisecond timestamp, `ARCHIVE_AFTER_SECONDS` ago by default.
+
+        Returns:
+            int: The number of entries moved.
+        """
+        filter = self._conditions_filter(
+            self._range_conditions(None, self._archive_cutoff(older_than), None)
+        )
+        cursor = self._collection.find(
+            filter, {"_id": 1}, batch_size=self.DEFAULT_BULK_BATCH_SIZE
+        )
+        archived = 0
+        try:
+            for batch in iter_batches(cursor, self.DEFAULT_BULK_BATCH_SIZE):
+                batch_filter = archive_batch_filter(batch)
+                self._collection.aggregate(
+                    self._archive_pipeline(batch_filter), allowDiskUse=True
+                )
+                with self._observe("delete_many", filter=batch_filter):
+                    result = self._collection.delete_many(batch_filter)
+                archived += result.deleted_count
+        finally:
+            cursor.close()
+            self._invalidate_cache()
+        return archived
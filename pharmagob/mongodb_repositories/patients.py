@@ -1,50 +1,107 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._search import SearchSpec
 from .base import BaseMongoDbRepository
 
+# a complete CURP: initials, birth date, sex, state, consonants, homoclave, digit
+CURP_PATTERN = r"[A-Z]{4}\d{6}[HMX][A-Z]{5}[A-Z0-9]\d"
 
-class PatientsRepository(BaseMongoDbRepository):
+
+class PatientsRepositoryCore(MongoDbRepositoryCore):
+    """Searches and indexes shared by the sync and async patients repositories."""
+
+    CURP_SEARCH = SearchSpec(
+        "autocomplete_curp_range_created_at",
+        "curp",
+        default_sort={"created_at": MongoDbRepositoryCore.DESCENDING_ORDER},
+        ranges=("created_at",),
+        equals=("umu_id",),
+        exact_pattern=CURP_PATTERN,
+    )
+    INDEXES = (
+        # exact CURP lookups of `search_by_curp`
+        IndexSpec(
+            [
+                ("curp", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+    FULL_NAME_SEARCH = SearchSpec(
+        "autocomplete_fullname_range_created_at",
+        "full_name",
+        default_sort={"created_at": MongoDbRepositoryCore.DESCENDING_ORDER},
+        ranges=("created_at",),
+        equals=("umu_id",),
+    )
+
+    def _curp_search(
+        self,
+        curp: str,
+        *,
+        exact: Optional[bool],
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+        umu_id: Optional[str],
+    ) -> Tuple[dict, Optional[dict]]:
+        """The `$search` of a CURP and the filter of its exact lookup, if any."""
+        filters = dict(
+            ranges={"created_at": (created_at_gt, created_at_lt)},
+            equals={"umu_id": umu_id},
+        )
+        search = self.CURP_SEARCH.compile(curp, **filters)
+        return search, self.CURP_SEARCH.exact_filter(curp, exact=exact, **filters)
+
+    def _full_name_search(
+        self,
+        full_name: str,
+        *,
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+        umu_id: Optional[str],
+    ) -> dict:
+        return self.FULL_NAME_SEARCH.compile(
+            full_name,
+            ranges={"created_at": (created_at_gt, created_at_lt)},
+            equals={"umu_id": umu_id},
+        )
+
+
+class PatientsRepository(PatientsRepositoryCore, BaseMongoDbRepository):
     def search_by_curp(
         self,
         curp: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
         umu_id: Optional[str] = None,
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_curp_range_created_at"
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {"must": [{"autocomplete": {"query": curp, "path": "curp"}}]},
-            "sort": {"created_at": BaseMongoDbRepository.DESCENDING_ORDER},
-        }
-        if created_at_gt is not None or created_at_lt is not None:
-            created_at_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_at_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_at_range["lt"] = created_at_lt
-            search["compound"]["must"].append({"range": created_at_range})
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._curp_search(
+            curp,
+            exact=exact,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
 
     def search_by_full_name(
         self,
@@ -52,40 +109,26 @@ class PatientsRepository(BaseMongoDbRepository):
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
         umu_id: Optional[str] = None,
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_fullname_range_created_at"
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [{"autocomplete": {"query": full_name, "path": "full_name"}}]
-            },
-            "sort": {"created_at": BaseMongoDbRepository.DESCENDING_ORDER},
-        }
-        if created_at_gt is not None or created_at_lt is not None:
-            created_at_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_at_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_at_range["lt"] = created_at_lt
-            search["compound"]["must"].append({"range": created_at_range})
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._full_name_search(
+            full_name,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            umu_id=umu_id,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
@@ -3,40 +3,59 @@ from bson import ObjectId
 from time import time
 from pharmagob.v1.models.reports import ReportRequestModel
 from pharmagob.v1.repository_interfaces.reports import ReportRepositoryInterface
+from ._core import MongoDbRepositoryCore
 from .base import BaseMongoDbRepository
 
-class ReportRepository(BaseMongoDbRepository, ReportRepositoryInterface):
-    def get_by_id(self, report_id: str) -> Optional[ReportRequestModel]:
+
+class ReportRepositoryCore(MongoDbRepositoryCore):
+    """Filters and updates shared by the sync and async report repositories."""
+
+    def _report_filter(self, report_id: str) -> Optional[dict]:
+        """The `_id` filter of a report, None when the id is not an ObjectId."""
         if not ObjectId.is_valid(report_id):
             return None
+        return {"_id": ObjectId(report_id)}
+
+    def _report_document(self, report: ReportRequestModel) -> dict:
+        report_data = report.dict()
+        if isinstance(report_data.get("_id"), str):
+            report_data["_id"] = ObjectId(report_data["_id"])
+        return report_data
+
+    def _status_update(self, status: str, progress: int) -> dict:
+        return {
+            "$set": {
+                "status": status,
+                "progress": progress,
+                "updated_at": round(time() * 1000),
+            }
+        }
+
+
+class ReportRepository(
+    ReportRepositoryCore, BaseMongoDbRepository, ReportRepositoryInterface
+):
+    def get_by_id(self, report_id: str) -> Optional[ReportRequestModel]:
+        filter = self._report_filter(report_id)
+        if filter is None:
+            return None
             
-        data = self._collection.find_one({"_id": ObjectId(report_id)})
+        data = self._collection.find_one(filter)
         if not data:
             return None
             
         return ReportRequestModel(**data)
 
     def create(self, report: ReportRequestModel) -> ReportRequestModel:
-        report_data = report.dict()
-        
-        if isinstance(report_data.get("_id"), str):
-            report_data["_id"] = ObjectId(report_data["_id"])
-            
-        self._collection.insert_one(report_data)
+        self._collection.insert_one(self._report_document(report))
         return report
 
     def update_status(self, report_id: str, status: str, progress: int) -> bool:
-        if not ObjectId.is_valid(report_id):
+        filter = self._report_filter(report_id)
+        if filter is None:
             return False
             
         result = self._collection.update_one(
-            {"_id": ObjectId(report_id)},
-            {
-                "$set": {
-                    "status": status,
-                    "progress": progress,
-                    "updated_at": round(time() * 1000)
-                }
-            }
+            filter, self._status_update(status, progress)
         )
         return result.modified_count > 0
\ No newline at end of file
@@ -1,26 +1,71 @@
 from typing import Iterator, List, Optional, Tuple, Union
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
 from .base import BaseMongoDbRepository
 
 
-class ShipmentDetailRepository(BaseMongoDbRepository):
+class ShipmentDetailRepositoryCore(MongoDbRepositoryCore):
+    """Indexes, projections and filters shared by the sync and async shipment
+    detail repositories."""
+
+    INDEXES = (
+        # covers the "summary" projection of `get_by_shipment_id`
+        IndexSpec(
+            [
+                ("shipment.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("item.id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("quantity", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ],
+            name="shipment_id_umu_id_summary",
+        ),
+    )
+    PROJECTIONS = {
+        "summary": {
+            "_id": 1,
+            "shipment.id": 1,
+            "umu_id": 1,
+            "item.id": 1,
+            "quantity": 1,
+        },
+        "card": {
+            "_id": 1,
+            "shipment.id": 1,
+            "umu_id": 1,
+            "item": 1,
+            "quantity": 1,
+            "lot": 1,
+            "expiration_date": 1,
+        },
+    }
+
+    def _shipment_id_filter(self, shipment_id, *, umu_id: Optional[str]) -> dict:
+        filter = {"shipment.id": shipment_id}
+        if umu_id:
+            filter.update({"umu_id": umu_id})
+        return filter
+
+
+class ShipmentDetailRepository(ShipmentDetailRepositoryCore, BaseMongoDbRepository):
     def get_by_shipment_id(
         self,
         shipment_id,
         *,
         umu_id: Optional[str] = None,
         sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
-        limit: Optional[int] = None
-    ) -> Tuple[int, Iterator[dict]]:
-        filter = {"shipment.id": shipment_id}
-        if umu_id:
-            filter.update({"umu_id": umu_id})
-        documents_count: int = self._collection.count_documents(filter)
-        documents_cursor = self._collection.find(
+        projection: Optional[Union[list, dict, str]] = None,
+        limit: Optional[int] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        filter = self._shipment_id_filter(shipment_id, umu_id=umu_id)
+        return self._find_page(
             filter,
             sort=sort,
             projection=projection,
             limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
         )
-        return documents_count, map(lambda item: item, documents_cursor)
@@ -1,6 +1,6 @@
-from .base import BaseMongoDbRepository
+from .logs import BaseLogRepository
 
 
 
-class ShipmentDetailsLogRepository(BaseMongoDbRepository):
+class ShipmentDetailsLogRepository(BaseLogRepository):
     pass
@@ -1,5 +1,5 @@
-from .base import BaseMongoDbRepository
+from .logs import BaseLogRepository
 
 
-class ShipmentLogRepository(BaseMongoDbRepository):
+class ShipmentLogRepository(BaseLogRepository):
     pass
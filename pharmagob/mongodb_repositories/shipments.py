@@ -1,62 +1,100 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import List, Optional, Tuple
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._search import SearchSpec
 from .base import BaseMongoDbRepository
+from .shipment_details import ShipmentDetailRepository
 
 
-class ShipmentRepository(BaseMongoDbRepository):
+class ShipmentRepositoryCore(MongoDbRepositoryCore):
+    """Searches, indexes and details shared by the sync and async shipment
+    repositories."""
+
+    ORDER_NUMBER_SEARCH = SearchSpec(
+        "autocomplete_order_number_range_created_at",
+        "order_number",
+        default_sort={"created_at": MongoDbRepositoryCore.DESCENDING_ORDER},
+        ranges=("created_at",),
+        equals=("umu_id",),
+        in_filters=("review_status",),
+    )
+    INDEXES = (
+        # complete order numbers of `search_by_order_number`
+        IndexSpec(
+            [
+                ("order_number", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+    # `get_with_details` joins the lines, served by the shipment.id index
+    DETAILS_COLLECTION = "shipment_details"
+    DETAILS_FOREIGN_FIELD = "shipment.id"
+    DETAILS_PROJECTIONS = ShipmentDetailRepository.PROJECTIONS
+
+    def _order_number_search(
+        self,
+        order_number: str,
+        *,
+        exact: Optional[bool],
+        umu_id: Optional[str],
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+        review_status: Optional[List[str]],
+    ) -> Tuple[dict, Optional[dict]]:
+        """The `$search` of an order number and the filter of its exact lookup."""
+        filters = dict(
+            ranges={"created_at": (created_at_gt, created_at_lt)},
+            equals={"umu_id": umu_id},
+            in_filters={"review_status": review_status},
+        )
+        search = self.ORDER_NUMBER_SEARCH.compile(order_number, **filters)
+        exact_filter = self.ORDER_NUMBER_SEARCH.exact_filter(
+            order_number, exact=exact, **filters
+        )
+        return search, exact_filter
+
+
+class ShipmentRepository(ShipmentRepositoryCore, BaseMongoDbRepository):
     def search_by_order_number(
         self,
         order_number: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
         umu_id: Optional[str] = None,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
         review_status: Optional[List[str]] = None
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_order_number_range_created_at"
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [
-                    {"autocomplete": {"query": order_number, "path": "order_number"}}
-                ]
-            },
-            "sort": {"created_at": BaseMongoDbRepository.DESCENDING_ORDER},
-        }
-        if created_at_gt is not None or created_at_lt is not None:
-            created_at_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_at_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_at_range["lt"] = created_at_lt
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        if review_status:
-            search["compound"]["filter"].append(
-                {"in": {"path": "review_status", "value": review_status}}
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._order_number_search(
+            order_number,
+            exact=exact,
+            umu_id=umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            review_status=review_status,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
 
     def get_review_status(self, shipment_id: str) -> Optional[str]:
-        doc = self._collection.find_one(
+        doc = self._find_one(
             {"_id": shipment_id}, 
-            {"review_status": 1}
+            projection={"review_status": 1}
         )
         return doc.get("review_status") if doc else None
\ No newline at end of file
@@ -0,0 +1,347 @@
+from threading import Event
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+
+from pymongo.errors import OperationFailure
+
+from ._bulk import iter_batches
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._instrumentation import logger
+from ._stock import now_ms
+from ._stock_totals import (
+    CHANGE_STREAM_HISTORY_LOST_CODE,
+    CHANGE_STREAM_PIPELINE,
+    CHANGE_STREAMS_UNSUPPORTED_CODE,
+    RECOMPUTE_BATCH_SIZE,
+    STOCK_TOTALS_CHECKPOINTS_COLLECTION,
+    SYNC_MODE_AUTO,
+    SYNC_MODE_CHANGE_STREAM,
+    SYNC_MODE_POLL,
+    TotalKey,
+    TotalsBatch,
+    change_keys,
+    checkpoint_update,
+    content_key,
+    keys_match,
+    rebuild_pipeline,
+    rebuilt_checkpoint,
+    recompute_operations,
+    totals_pipeline,
+    validate_sync_mode,
+)
+from .base import BaseMongoDbRepository
+
+if TYPE_CHECKING:
+    from .location_contents import LocationContentRepository
+
+
+class StockTotalsRepositoryCore(MongoDbRepositoryCore):
+    """Indexes and filters shared by the sync and async stock totals repositories."""
+
+    INDEXES = (
+        IndexSpec(
+            [
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("item_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ],
+            unique=True,
+        ),
+    )
+    CHECKPOINTS_COLLECTION = STOCK_TOTALS_CHECKPOINTS_COLLECTION
+
+    def _totals_filter(self, umu_id: str, item_ids: Optional[List[str]]) -> dict:
+        filter = {"umu_id": umu_id}
+        if item_ids is not None:
+            filter["item_id"] = {"$in": list(item_ids)}
+        return filter
+
+    def _warn_unresolved(self, batch: TotalsBatch) -> None:
+        if batch.dirty or batch.unresolved:
+            logger.warning(
+                "%s change events without images on %s, rebuild to fix the totals",
+                len(batch.dirty) + batch.unresolved,
+                self._collection.name,
+            )
+
+
+class StockTotalsRepository(StockTotalsRepositoryCore, BaseMongoDbRepository):
+    """Per-UMU/item stock totals materialized from `location_contents`.
+
+    `rebuild` computes every total once; `sync` then keeps them up to date with
+    `$inc` deltas read from a change stream on `location_contents` (which needs a
+    replica set and pre/post-images, see `enable_pre_images`), or falls back to
+    recomputing the totals of the documents whose `updated_at` moved. Its progress
+    (resume token or `updated_at` watermark) is stored in
+    `stock_totals_checkpoints`, so a restarted `sync` carries on where it stopped.
+    """
+
+    def get_total(self, umu_id: str, item_id: str) -> Optional[dict]:
+        return self._find_one({"umu_id": umu_id, "item_id": item_id})
+
+    def get_totals(
+        self,
+        umu_id: str,
+        *,
+        item_ids: Optional[List[str]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[dict]:
+        """The totals of one UMU, sorted by item id."""
+        filter = self._totals_filter(umu_id, item_ids)
+        with self._observe("find", filter=filter) as event:
+            documents = list(
+                self._collection.find(
+                    filter, self._resolve_projection(projection)
+                ).sort("item_id", self.ASCENDING_ORDER)
+            )
+            self._record_documents(event, documents)
+        return documents
+
+    def checkpoint(self) -> Optional[dict]:
+        """The stored sync state: `resume_token`/`watermark`, `dirty` totals..."""
+        return self._checkpoints.find_one({"_id": self._collection.name})
+
+    @property
+    def _checkpoints(self):
+        return self._db[self.CHECKPOINTS_COLLECTION]
+
+    def enable_pre_images(self, location_contents: "LocationContentRepository") -> None:
+        """Make `location_contents` record the images the deltas are computed from."""
+        location_contents._db.command(
+            "collMod",
+            location_contents._collection.name,
+            changeStreamPreAndPostImages={"enabled": True},
+        )
+
+    def rebuild(
+        self,
+        location_contents: "LocationContentRepository",
+        *,
+        change_stream: bool = True,
+    ) -> None:
+        """Recompute every total and restart the checkpoint from now.
+
+        The totals are merged in place and the ones left over are deleted, so
+        readers never see an empty collection. With `change_stream`, the events
+        that arrived during the aggregation are caught up by recomputing their
+        totals; writes landing during that last short step may still be counted
+        twice by the next `sync`, so run it in a quiet period for exact totals.
+        The `(umu_id, item_id)` index the totals are read by is created when
+        missing.
+        """
+        self._collection.create_indexes([spec.model() for spec in self.INDEXES])
+        source = location_contents._collection
+        now = now_ms()
+        start_token = None
+        if change_stream:
+            with source.watch(CHANGE_STREAM_PIPELINE) as stream:
+                start_token = stream.resume_token
+        source.aggregate(
+            rebuild_pipeline(self._db.name, self._collection.name, now),
+            allowDiskUse=True,
+        )
+        self._collection.delete_many({"updated_at": {"$lt": now}})
+        self._invalidate_cache()
+        resume_token = None
+        if change_stream:
+            keys = set()
+            with source.watch(
+                CHANGE_STREAM_PIPELINE,
+                full_document="whenAvailable",
+                full_document_before_change="whenAvailable",
+                resume_after=start_token,
+                max_await_time_ms=1,
+            ) as stream:
+                for change in iter(stream.try_next, None):
+                    keys |= change_keys(change)
+                resume_token = stream.resume_token
+            self.recompute(location_contents, keys)
+        self._checkpoints.update_one(
+            {"_id": self._collection.name},
+            rebuilt_checkpoint(now_ms(), resume_token=resume_token, watermark=now),
+            upsert=True,
+        )
+
+    def recompute(
+        self, location_contents: "LocationContentRepository", keys: Iterable[TotalKey]
+    ) -> int:
+        """Overwrite the `(umu_id, item_id)` totals of `keys` from scratch.
+
+        Returns:
+            int: The number of totals recomputed.
+        """
+        keys = list(keys)
+        now = now_ms()
+        operations = []
+        for chunk in iter_batches(keys, RECOMPUTE_BATCH_SIZE):
+            rows = location_contents._collection.aggregate(
+                totals_pipeline(keys_match(chunk))
+            )
+            operations.extend(recompute_operations(chunk, rows, now))
+        if operations:
+            self.bulk_write(operations, ordered=False)
+        return len(keys)
+
+    def sync(
+        self,
+        location_contents: "LocationContentRepository",
+        *,
+        mode: str = SYNC_MODE_AUTO,
+        stop: Optional[Event] = None,
+        batch_size: int = 500,
+        max_await_ms: int = 1000,
+        poll_interval: float = 5.0,
+    ) -> None:
+        """Keep the totals up to date until `stop` is set (forever without it).
+
+        Parameters:
+            mode: "change_stream", "poll" (`updated_at` watermark, deletes are only
+                caught by `rebuild`) or "auto": change stream, polling when the
+                deployment does not support change streams.
+            batch_size: Change events applied per transaction.
+            max_await_ms: How long an idle change stream waits for events before
+                the pending batch is flushed and `stop` is checked.
+        """
+        validate_sync_mode(mode)
+        stop = stop if stop is not None else Event()
+        if mode != SYNC_MODE_POLL:
+            try:
+                self._sync_change_stream(
+                    location_contents,
+                    stop=stop,
+                    batch_size=batch_size,
+                    max_await_ms=max_await_ms,
+                )
+                return
+            except OperationFailure as exc:
+                if (
+                    mode == SYNC_MODE_CHANGE_STREAM
+                    or exc.code != CHANGE_STREAMS_UNSUPPORTED_CODE
+                ):
+                    raise
+                logger.warning(
+                    "Change streams unavailable on %s, polling updated_at",
+                    location_contents._collection.name,
+                )
+        self._sync_poll(location_contents, stop=stop, poll_interval=poll_interval)
+
+    def _sync_change_stream(
+        self,
+        location_contents: "LocationContentRepository",
+        *,
+        stop: Event,
+        batch_size: int,
+        max_await_ms: int,
+    ) -> None:
+        while not stop.is_set():
+            resume_token = (self.checkpoint() or {}).get("resume_token")
+            if resume_token is None:
+                self.rebuild(location_contents)
+                continue
+            try:
+                invalidated = self._follow(
+                    location_contents,
+                    resume_token,
+                    stop=stop,
+                    batch_size=batch_size,
+                    max_await_ms=max_await_ms,
+                )
+            except OperationFailure as exc:
+                if exc.code != CHANGE_STREAM_HISTORY_LOST_CODE:
+                    raise
+                logger.warning(
+                    "Resume token of %s lost, rebuilding", self._collection.name
+                )
+                invalidated = True
+            if invalidated:
+                self.rebuild(location_contents)
+
+    def _follow(
+        self,
+        location_contents: "LocationContentRepository",
+        resume_token: dict,
+        *,
+        stop: Event,
+        batch_size: int,
+        max_await_ms: int,
+    ) -> bool:
+        """Apply change events until `stop`; True if the stream was invalidated."""
+        with location_contents._collection.watch(
+            CHANGE_STREAM_PIPELINE,
+            full_document="whenAvailable",
+            full_document_before_change="whenAvailable",
+            resume_after=resume_token,
+            max_await_time_ms=max_await_ms,
+            batch_size=batch_size,
+        ) as stream:
+            batch = TotalsBatch()
+            while stream.alive and not stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    batch.add_change(change)
+                if batch.invalidated:
+                    return True
+                if len(batch) >= batch_size or (change is None and batch):
+                    self._apply_changes(batch, stream.resume_token)
+                    batch = TotalsBatch()
+            if batch:
+                self._apply_changes(batch, stream.resume_token)
+        return False
+
+    def _apply_changes(self, batch: TotalsBatch, resume_token: dict) -> None:
+        """Apply the deltas and move the resume token in one transaction."""
+        now = now_ms()
+        operations = batch.operations(now)
+        checkpoint = checkpoint_update(
+            now,
+            resume_token=resume_token,
+            dirty=batch.dirty,
+            unresolved=batch.unresolved,
+        )
+        self._warn_unresolved(batch)
+
+        def apply(session) -> None:
+            if operations:
+                with self._observe("bulk_write") as event:
+                    if event is not None:
+                        event.documents = len(operations)
+                    self._collection.bulk_write(
+                        operations, ordered=False, session=session
+                    )
+            self._checkpoints.update_one(
+                {"_id": self._collection.name}, checkpoint, upsert=True, session=session
+            )
+
+        with self._db.client.start_session() as session:
+            session.with_transaction(apply)
+        self._invalidate_cache()
+
+    def _sync_poll(
+        self,
+        location_contents: "LocationContentRepository",
+        *,
+        stop: Event,
+        poll_interval: float,
+    ) -> None:
+        while not stop.is_set():
+            watermark = (self.checkpoint() or {}).get("watermark")
+            if watermark is None:
+                self.rebuild(location_contents, change_stream=False)
+                continue
+            keys = set()
+            latest = watermark
+            # $gte: documents sharing the watermark millisecond are seen again,
+            # recomputing is idempotent
+            for document in location_contents._collection.find(
+                {"updated_at": {"$gte": watermark}},
+                {"umu_id": 1, "item.id": 1, "updated_at": 1},
+            ):
+                keys.add(content_key(document))
+                latest = max(latest, document["updated_at"])
+            if keys:
+                self.recompute(location_contents, keys)
+            self._checkpoints.update_one(
+                {"_id": self._collection.name},
+                checkpoint_update(now_ms(), watermark=latest),
+                upsert=True,
+            )
+            stop.wait(poll_interval)
@@ -1,31 +1,204 @@
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._stock_transfers import (
+    EVENT_FIELD,
+    STOCK_TRANSFERS_COLLECTION,
+    group_timelines,
+    last_event_filter,
+    last_event_update,
+    latest_events_pipeline,
+    timeline_sort,
+    with_transfer_id,
+)
 from .base import BaseMongoDbRepository
 
 
-class StockTransferEventsRepository(BaseMongoDbRepository):
-    def get_by_stock_transfer_id(
+class StockTransferEventsRepositoryCore(MongoDbRepositoryCore):
+    """Indexes and queries shared by the sync and async stock transfer event
+    repositories."""
+
+    INDEXES = (
+        # also serves the `$sort` + `$group`/`$first` of the latest-event lookup
+        IndexSpec(
+            [
+                ("stock_transfer_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("transition_timestamp", MongoDbRepositoryCore.DESCENDING_ORDER),
+            ]
+        ),
+    )
+    # `append` keeps `last_event` of the transfers in this collection up to date
+    TRANSFERS_COLLECTION = STOCK_TRANSFERS_COLLECTION
+    EVENT_FIELD = EVENT_FIELD
+
+    def _stock_transfer_id_find(
         self,
         stock_transfer_id: str,
         *,
-        umu_id: Optional[List[str]] = None,
-        limit: Optional[int] = None,
-        sort: Optional[List[Tuple[str, int]]] = None,
-        projection: Optional[Union[list, dict]] = None,
-    ) -> Tuple[int, Iterator[dict]]:
+        umu_id: Optional[List[str]],
+        sort: Optional[List[Tuple[str, int]]],
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+        """The filter and sort of `get_by_stock_transfer_id`, newest first."""
         default_sort = sort
         if default_sort is None:
             default_sort = [
-                ("transition_timestamp", BaseMongoDbRepository.DESCENDING_ORDER)
+                ("transition_timestamp", MongoDbRepositoryCore.DESCENDING_ORDER)
             ]
         filter: Dict[str, Any] = {"stock_transfer_id": stock_transfer_id}
         if umu_id:
             filter.update({"umu_id": umu_id})
-        documents_count: int = self._collection.count_documents(filter)
-        documents_cursor = self._collection.find(
+        return filter, default_sort
+
+    def _latest_events_pipeline(
+        self,
+        unique_ids: List[str],
+        *,
+        umu_id: Optional[str],
+        projection: Optional[Union[list, dict, str]],
+    ) -> List[dict]:
+        return latest_events_pipeline(
+            unique_ids,
+            umu_id=umu_id,
+            projection=self._resolve_projection(projection),
+        )
+
+    def _timelines_find(
+        self,
+        unique_ids: List[str],
+        *,
+        umu_id: Optional[str],
+        descending: bool,
+        projection: Optional[Union[list, dict, str]],
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, int]], Optional[Union[list, dict]]]:
+        """The filter, sort and projection of the find of `get_timelines`."""
+        filter: Dict[str, Any] = {"stock_transfer_id": {"$in": unique_ids}}
+        if umu_id:
+            filter["umu_id"] = umu_id
+        sort = timeline_sort(descending)
+        projection = with_transfer_id(self._resolve_projection(projection))
+        return filter, sort, projection
+
+    def _last_event_write(self, event: dict) -> Tuple[dict, dict]:
+        """The filter and update advancing `last_event` of the event's transfer."""
+        return (
+            last_event_filter(
+                event["stock_transfer_id"], event["transition_timestamp"]
+            ),
+            last_event_update(event, event_field=self.EVENT_FIELD),
+        )
+
+
+class StockTransferEventsRepository(
+    StockTransferEventsRepositoryCore, BaseMongoDbRepository
+):
+    def get_by_stock_transfer_id(
+        self,
+        stock_transfer_id: str,
+        *,
+        umu_id: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+        count_policy: Optional[str] = None,
+        raw: bool = False,
+    ) -> Tuple[Optional[int], Iterator[dict]]:
+        filter, default_sort = self._stock_transfer_id_find(
+            stock_transfer_id, umu_id=umu_id, sort=sort
+        )
+        return self._find_page(
             filter,
             sort=default_sort,
             projection=projection,
             limit=(limit or self.DEFAULT_QUERY_LIMIT),
+            count_policy=count_policy,
+            raw=raw,
+        )
+
+    def get_latest_by_stock_transfer_ids(
+        self,
+        stock_transfer_ids: Iterable[str],
+        *,
+        umu_id: Optional[str] = None,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> List[Optional[dict]]:
+        """Retrieve the newest event of many transfers in one aggregation.
+
+        Returns:
+            List[Optional[dict]]: One entry per input id, in the same order, None
+                for the transfers without events.
+        """
+        stock_transfer_ids = list(stock_transfer_ids)
+        unique_ids = self._unique_ids(stock_transfer_ids)
+        if not unique_ids:
+            return []
+        pipeline = self._latest_events_pipeline(
+            unique_ids, umu_id=umu_id, projection=projection
+        )
+        with self._observe(
+            "latest_events",
+            filter=pipeline[0],
+            command=self._aggregate_command(pipeline),
+        ) as event:
+            rows = list(self._read_collection().aggregate(pipeline, **self._max_time()))
+            self._record_documents(event, rows)
+        latest = {row["_id"]: row["event"] for row in rows}
+        return [
+            latest.get(stock_transfer_id) for stock_transfer_id in stock_transfer_ids
+        ]
+
+    def get_timelines(
+        self,
+        stock_transfer_ids: Iterable[str],
+        *,
+        umu_id: Optional[str] = None,
+        descending: bool = False,
+        projection: Optional[Union[list, dict, str]] = None,
+    ) -> Dict[str, List[dict]]:
+        """Retrieve the whole history of many transfers with one find.
+
+        Parameters:
+            descending: Newest event first; oldest first by default.
+
+        Returns:
+            Dict[str, List[dict]]: The events of each input id, in the order of
+                the ids; transfers without events map to an empty list.
+        """
+        unique_ids = self._unique_ids(list(stock_transfer_ids))
+        if not unique_ids:
+            return {}
+        filter, sort, projection = self._timelines_find(
+            unique_ids, umu_id=umu_id, descending=descending, projection=projection
+        )
+        with self._observe(
+            "timelines",
+            filter=filter,
+            command=self._find_command(filter, sort=sort, projection=projection),
+        ) as event:
+            events = list(
+                self._read_collection().find(
+                    filter,
+                    sort=sort,
+                    projection=projection,
+                    **self._max_time(option="max_time_ms"),
+                )
+            )
+            self._record_documents(event, events)
+        return group_timelines(unique_ids, events)
+
+    def append(self, event: dict) -> bool:
+        """Insert an event and advance `last_event` of its transfer.
+
+        The transfer is only updated when the event is newer than the one it
+        records, so events written out of order never move it backwards. The two
+        writes are not atomic; `StockTransfersRepository.refresh_last_events`
+        repairs a transfer left behind.
+
+        Returns:
+            bool: True if the transfer now records this event.
+        """
+        self.create(event)
+        result = self._db[self.TRANSFERS_COLLECTION].update_one(
+            *self._last_event_write(event)
         )
-        return documents_count, map(lambda item: item, documents_cursor)
+        return result.modified_count == 1
@@ -1,70 +1,156 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from ._core import MongoDbRepositoryCore
+from ._indexes import IndexSpec
+from ._search import SearchSpec
+from ._stock_transfers import (
+    EVENT_FIELD,
+    STOCK_TRANSFER_EVENTS_COLLECTION,
+    last_event_filter,
+    last_event_operation,
+    last_event_update,
+    latest_events_pipeline,
+)
 from .base import BaseMongoDbRepository
 
 
-class StockTransfersRepository(BaseMongoDbRepository):
+class StockTransfersRepositoryCore(MongoDbRepositoryCore):
+    """Searches, indexes and events shared by the sync and async stock transfer
+    repositories."""
+
+    REFERENCE_SEARCH = SearchSpec(
+        "autocomplete_reference_id_range_created_at",
+        "reference_id",
+        default_sort={"created_at": MongoDbRepositoryCore.ASCENDING_ORDER},
+        ranges=("created_at",),
+        equals=("umu_id", "last_event", "foreign_location_content.umu_id"),
+    )
+    INDEXES = (
+        # complete references of `search_by_reference_id`
+        IndexSpec(
+            [
+                ("reference_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+                ("umu_id", MongoDbRepositoryCore.ASCENDING_ORDER),
+            ]
+        ),
+    )
+    # `last_event`, `last_event_timestamp` and `last_event_id` denormalize the
+    # newest event of this collection
+    EVENTS_COLLECTION = STOCK_TRANSFER_EVENTS_COLLECTION
+    EVENT_FIELD = EVENT_FIELD
+
+    def _reference_search(
+        self,
+        search_str: str,
+        *,
+        exact: Optional[bool],
+        sort: Optional[Dict[str, int]],
+        last_event: Optional[str],
+        umu_id: Optional[str],
+        foreign_umu_id: Optional[str],
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+    ) -> Tuple[dict, Optional[dict]]:
+        """The `$search` of a reference and the filter of its exact lookup."""
+        filters = dict(
+            ranges={"created_at": (created_at_gt, created_at_lt)},
+            equals={
+                "umu_id": umu_id,
+                "last_event": last_event,
+                "foreign_location_content.umu_id": foreign_umu_id,
+            },
+        )
+        search = self.REFERENCE_SEARCH.compile(search_str, sort=sort, **filters)
+        exact_filter = self.REFERENCE_SEARCH.exact_filter(
+            search_str, exact=exact, **filters
+        )
+        return search, exact_filter
+
+    def _latest_events_pipeline(self, stock_transfer_ids: List[Any]) -> List[dict]:
+        return latest_events_pipeline(
+            stock_transfer_ids,
+            projection=[
+                "_id",
+                "stock_transfer_id",
+                "transition_timestamp",
+                self.EVENT_FIELD,
+            ],
+        )
+
+
+class StockTransfersRepository(StockTransfersRepositoryCore, BaseMongoDbRepository):
     def search_by_reference_id(
         self,
         search_str: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
+        exact: Optional[bool] = None,
         sort: Optional[Dict[str, int]] = None,
         last_event: Optional[str] = None,
         umu_id: Optional[str] = None,
         foreign_umu_id: Optional[str] = None,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_reference_id_range_created_at"
-        default_sort = sort
-        if default_sort is None:
-            default_sort = {"created_at": BaseMongoDbRepository.ASCENDING_ORDER}
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [
-                    {"autocomplete": {"query": search_str, "path": "reference_id"}}
-                ]
-            },
-            "sort": default_sort,
-        }
-        search["compound"]["filter"] = []
-        if umu_id:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "umu_id", "value": umu_id}}
-            )
-        if last_event:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "last_event", "value": last_event}}
-            )
-        if foreign_umu_id:
-            search["compound"]["filter"].append(
-                {
-                    "equals": {
-                        "path": "foreign_location_content.umu_id",
-                        "value": foreign_umu_id,
-                    }
-                }
+    ) -> Tuple[Optional[int], List[dict]]:
+        search, exact_filter = self._reference_search(
+            search_str,
+            exact=exact,
+            sort=sort,
+            last_event=last_event,
+            umu_id=umu_id,
+            foreign_umu_id=foreign_umu_id,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+            exact_filter=exact_filter,
+        )
+
+    def set_last_event(self, stock_transfer_id: Any, event: dict) -> bool:
+        """Record `event` as the last one of the transfer unless a newer one is.
+
+        Returns:
+            bool: True if the transfer was updated.
+        """
+        filter = last_event_filter(stock_transfer_id, event["transition_timestamp"])
+        with self._observe("update_one", filter=filter):
+            result = self._collection.update_one(
+                filter, last_event_update(event, event_field=self.EVENT_FIELD)
             )
-        if created_at_gt is not None or created_at_lt is not None:
-            created_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_range["lt"] = created_at_lt
-            search["compound"]["must"].append({"range": created_range})
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+        self._invalidate_document(stock_transfer_id)
+        return result.modified_count == 1
+
+    def refresh_last_events(self, stock_transfer_ids: Iterable[Any]) -> int:
+        """Rebuild `last_event` of the transfers from their events.
+
+        Repairs the transfers an interrupted `StockTransferEventsRepository.append`
+        left behind; transfers already up to date are not written.
+
+        Returns:
+            int: The number of transfers updated.
+        """
+        stock_transfer_ids = self._unique_ids(list(stock_transfer_ids))
+        if not stock_transfer_ids:
+            return 0
+        pipeline = self._latest_events_pipeline(stock_transfer_ids)
+        rows = self._db[self.EVENTS_COLLECTION].aggregate(pipeline)
+        summary = self.bulk_write(
+            [
+                last_event_operation(row["event"], event_field=self.EVENT_FIELD)
+                for row in rows
+            ],
+            ordered=False,
+        )
+        return summary.modified_count
@@ -1,58 +1,71 @@
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from ._core import MongoDbRepositoryCore
+from ._search import SearchSpec
 from .base import BaseMongoDbRepository
 
 
-class WarehouseRepository(BaseMongoDbRepository):
+class WarehouseRepositoryCore(MongoDbRepositoryCore):
+    """Searches shared by the sync and async warehouse repositories."""
+
+    UMU_SEARCH = SearchSpec(
+        "autocomplete_umu_id_range_created_at",
+        "umu_id",
+        default_sort={"created_at": MongoDbRepositoryCore.DESCENDING_ORDER},
+        ranges=("created_at",),
+        equals=("type", "disable"),
+        field_types={"disable": "boolean"},
+    )
+
+    def _umu_search(
+        self,
+        search_str: str,
+        *,
+        type: Optional[str],
+        disable: Optional[bool],
+        created_at_gt: Optional[int],
+        created_at_lt: Optional[int],
+        sort: Optional[Dict[str, int]],
+    ) -> dict:
+        return self.UMU_SEARCH.compile(
+            search_str,
+            sort=sort,
+            ranges={"created_at": (created_at_gt, created_at_lt)},
+            equals={"type": type, "disable": disable},
+        )
+
+
+class WarehouseRepository(WarehouseRepositoryCore, BaseMongoDbRepository):
     def search_by_umu(
         self,
         search_str: str,
         *,
         page: int = 1,
         limit: int = BaseMongoDbRepository.DEFAULT_QUERY_LIMIT,
+        count_policy: Optional[str] = None,
+        search_after: Optional[str] = None,
+        search_before: Optional[str] = None,
+        search_tokens: bool = False,
         type: Optional[str] = None,
         disable: Optional[bool] = None,
         created_at_gt: Optional[int] = None,
         created_at_lt: Optional[int] = None,
         sort: Optional[Dict[str, int]] = None,
-    ) -> Tuple[int, List[dict]]:
-        SEARCH_INDEX = "autocomplete_umu_id_range_created_at"
-        default_sort = sort
-        if default_sort is None:
-            default_sort = {"created_at": BaseMongoDbRepository.DESCENDING_ORDER}
-        search: dict = {
-            "index": SEARCH_INDEX,
-            "compound": {
-                "must": [{"autocomplete": {"query": search_str, "path": "umu_id"}}]
-            },
-            "sort": default_sort,
-        }
-        if created_at_gt is not None or created_at_lt is not None:
-            created_at_range: Dict[str, Any] = {"path": "created_at"}
-            if created_at_gt is not None:
-                created_at_range["gt"] = created_at_gt
-            if created_at_lt is not None:
-                created_at_range["lt"] = created_at_lt
-            search["compound"]["must"].append({"range": created_at_range})
-        search["compound"]["filter"] = []
-        if type:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "type", "value": type}}
-            )
-        if disable:
-            search["compound"]["filter"].append(
-                {"equals": {"path": "disable", "value": disable}}
-            )
-        pipeline: List[dict] = [
-            {"$search": search},
-            {
-                "$facet": {
-                    "results": [{"$skip": limit * (page - 1)}, {"$limit": limit}],
-                    "totalCount": [{"$count": "count"}],
-                }
-            },
-            {"$addFields": {"count": {"$arrayElemAt": ["$totalCount.count", 0]}}},
-        ]
-        aggregation_cursor = self._collection.aggregate(pipeline=pipeline)
-        data: dict = aggregation_cursor.next()
-        return data.get("count", 0), data.get("results", [])
+    ) -> Tuple[Optional[int], List[dict]]:
+        search = self._umu_search(
+            search_str,
+            type=type,
+            disable=disable,
+            created_at_gt=created_at_gt,
+            created_at_lt=created_at_lt,
+            sort=sort,
+        )
+        return self._search(
+            search,
+            page=page,
+            limit=limit,
+            count_policy=count_policy,
+            search_after=search_after,
+            search_before=search_before,
+            search_tokens=search_tokens,
+        )
@@ -0,0 +1,90 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+try:
+    importlib.import_module("infra.mongodb")
+except ImportError:
+    # infra-mongodb-python only provides the type of the db manager; the
+    # repositories under test get mocked collections, so any stand-in works
+    _infra = types.ModuleType("infra")
+    _mongodb = types.ModuleType("infra.mongodb")
+    _mongodb.MongoDbManager = object  # type: ignore[attr-defined]
+    _mongodb.AsyncMongoDbManager = object  # type: ignore[attr-defined]
+    _infra.mongodb = _mongodb  # type: ignore[attr-defined]
+    sys.modules["infra"] = _infra
+    sys.modules["infra.mongodb"] = _mongodb
+
+# Motor methods returning a coroutine; find and aggregate return cursors
+ASYNC_COLLECTION_METHODS = (
+    "bulk_write",
+    "count_documents",
+    "create_index",
+    "create_indexes",
+    "delete_many",
+    "delete_one",
+    "distinct",
+    "estimated_document_count",
+    "find_one",
+    "find_one_and_update",
+    "index_information",
+    "insert_many",
+    "insert_one",
+    "update_many",
+    "update_one",
+)
+
+
+@pytest.fixture
+def collection_name():
+    return "documents"
+
+
+@pytest.fixture
+def collection(mocker, collection_name):
+    """A pymongo collection whose read options return itself."""
+    collection = mocker.MagicMock(name=collection_name)
+    collection.name = collection_name
+    collection.with_options.return_value = collection
+    return collection
+
+
+@pytest.fixture
+def db_manager(mocker, collection):
+    db_manager = mocker.MagicMock()
+    db_manager.get_collection.return_value = collection
+    return db_manager
+
+
+@pytest.fixture
+def async_collection(mocker, collection_name):
+    """`collection` for Motor: the I/O methods are `AsyncMock`s."""
+    collection = mocker.MagicMock(name=collection_name)
+    collection.name = collection_name
+    collection.with_options.return_value = collection
+    for method in ASYNC_COLLECTION_METHODS:
+        setattr(collection, method, mocker.AsyncMock(name=method))
+    return collection
+
+
+@pytest.fixture
+def async_db_manager(mocker, async_collection):
+    db_manager = mocker.MagicMock()
+    db_manager.get_collection.return_value = async_collection
+    return db_manager
+
+
+@pytest.fixture
+def async_cursor(mocker):
+    """Build a Motor cursor over some documents, for `to_list` and `async for`."""
+
+    def make(documents):
+        cursor = mocker.MagicMock()
+        cursor.to_list = mocker.AsyncMock(return_value=list(documents))
+        cursor.close = mocker.AsyncMock()
+        cursor.__aiter__.return_value = list(documents)
+        return cursor
+
+    return make
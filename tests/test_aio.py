@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+
+from pharmagob.mongodb_repositories._reports import (
+    REPORT_STATUS_COMPLETED,
+    chunk_filter,
+)
+from pharmagob.mongodb_repositories._stock import InsufficientStockError, StockMove
+from pharmagob.mongodb_repositories.aio.location_contents import (
+    AsyncLocationContentRepository,
+)
+from pharmagob.mongodb_repositories.aio.shipments import AsyncShipmentRepository
+
+from .conftest import ASYNC_COLLECTION_METHODS
+
+MOVE = StockMove(
+    item_id="item",
+    lot="lot",
+    from_location_id="a",
+    to_location_id="b",
+    quantity=5,
+)
+
+
+async def _collect(cursor):
+    return [document async for document in cursor]
+
+
+@pytest.fixture
+def async_db(mocker, async_collection):
+    """The Motor database of `async_collection`, with a transaction session."""
+    db = async_collection.database
+    others = {}
+
+    def get(name):
+        if name not in others:
+            others[name] = mocker.MagicMock(name=name)
+            for method in ASYNC_COLLECTION_METHODS:
+                setattr(others[name], method, mocker.AsyncMock(name=method))
+        return others[name]
+
+    db.__getitem__.side_effect = get
+    session = mocker.MagicMock()
+    session.__aenter__.return_value = session
+
+    async def with_transaction(apply):
+        return await apply(session)
+
+    session.with_transaction = mocker.AsyncMock(side_effect=with_transaction)
+    db.client.start_session = mocker.AsyncMock(return_value=session)
+    return db
+
+
+@pytest.fixture
+def shipments(async_db_manager):
+    return AsyncShipmentRepository(async_db_manager, "shipments")
+
+
+@pytest.fixture
+def location_contents(async_db_manager, async_db):
+    return AsyncLocationContentRepository(async_db_manager, "location_contents")
+
+
+def test_find_page_counts_and_skips_the_previous_pages(
+    shipments, async_collection, async_cursor
+):
+    async_collection.count_documents.return_value = 41
+    async_collection.find.return_value = async_cursor([{"_id": "s41"}])
+
+    total, cursor = asyncio.run(shipments.get_paginated(page=3, limit=20))
+
+    assert total == 41
+    assert asyncio.run(_collect(cursor)) == [{"_id": "s41"}]
+    assert async_collection.find.call_args.kwargs["skip"] == 40
+    assert async_collection.find.call_args.kwargs["limit"] == 20
+
+
+def test_get_many_keeps_the_order_of_the_ids(shipments, async_collection, async_cursor):
+    async_collection.find.return_value = async_cursor([{"_id": "s2"}, {"_id": "s1"}])
+
+    documents = asyncio.run(shipments.get_many(["s1", "s3", "s2", "s1"]))
+
+    assert documents == [{"_id": "s1"}, None, {"_id": "s2"}, {"_id": "s1"}]
+    assert async_collection.find.call_count == 1
+
+
+def test_exact_search_reads_the_page_from_the_index(
+    shipments, async_collection, async_cursor
+):
+    async_collection.find.return_value = async_cursor([{"_id": "s3"}])
+
+    total, results = asyncio.run(
+        shipments.search_by_order_number("OC-2024-0001", page=2, limit=2, exact=True)
+    )
+
+    assert (total, results) == (3, [{"_id": "s3"}])
+    assert async_collection.find.call_args.kwargs["skip"] == 2
+    async_collection.aggregate.assert_not_called()
+
+
+def test_exact_search_passes_the_budget_as_max_time_ms(
+    async_db_manager, async_collection, async_cursor
+):
+    shipments = AsyncShipmentRepository(async_db_manager, "shipments", max_time_ms=500)
+    async_collection.find.return_value = async_cursor([])
+    async_collection.find_one.return_value = {"_id": "s1"}
+    async_collection.count_documents.return_value = 1
+
+    total, results = asyncio.run(
+        shipments.search_by_order_number("OC-2024-0001", page=2, limit=2, exact=True)
+    )
+
+    assert (total, results) == (1, [])
+    assert 0 < async_collection.find.call_args.kwargs["max_time_ms"] <= 500
+    assert 0 < async_collection.find_one.call_args.kwargs["max_time_ms"] <= 500
+
+
+def test_search_without_an_exact_match_runs_search(
+    shipments, async_collection, async_cursor
+):
+    async_collection.find.return_value = async_cursor([])
+    async_collection.aggregate.return_value = async_cursor(
+        [{"results": [{"_id": "s1"}], "meta": [{"count": {"total": 1}}]}]
+    )
+
+    total, results = asyncio.run(
+        shipments.search_by_order_number("OC-2024-0001", exact=True)
+    )
+
+    assert (total, results) == (1, [{"_id": "s1"}])
+    pipeline = async_collection.aggregate.call_args.kwargs["pipeline"]
+    assert "$search" in pipeline[0]
+
+
+def test_report_runs_every_chunk_and_completes(
+    mocker, location_contents, async_collection, async_db, async_cursor
+):
+    async_collection.distinct.return_value = ["u1", None]
+    async_collection.aggregate.return_value = async_cursor([])
+    chunks = async_db["report_r1_chunks"]
+    chunks.distinct.return_value = ["u1"]
+    reports = mocker.MagicMock()
+    reports.update_status = mocker.AsyncMock()
+
+    collection_name = asyncio.run(
+        location_contents.trigger_report_aggregation(
+            "r1", {"lot": "x"}, reports=reports
+        )
+    )
+
+    assert collection_name == "report_r1"
+    # the finished u1 chunk is not aggregated again
+    pipeline = async_collection.aggregate.call_args.args[0]
+    assert pipeline[0]["$match"] == chunk_filter({"lot": "x"}, None)
+    assert async_collection.aggregate.call_count == 1
+    assert chunks.update_one.call_args.args[0] == {"_id": None}
+    assert async_db["report_r1"].create_indexes.called
+    reports.update_status.assert_called_with("r1", REPORT_STATUS_COMPLETED, 100)
+
+
+def test_move_stock_writes_the_batch_in_a_transaction(
+    mocker, location_contents, async_collection, async_db
+):
+    async_collection.bulk_write.return_value = mocker.MagicMock(
+        matched_count=1, upserted_count=1
+    )
+
+    result = asyncio.run(location_contents.move_stock([MOVE], reason="refill"))
+
+    assert result.ok and result.moved == [0]
+    assert len(async_collection.bulk_write.call_args.args[0]) == 2
+    logs = async_db[location_contents.QUANTITY_LOGS_COLLECTION]
+    assert logs.insert_many.call_args.kwargs["session"] is not None
+    assert async_db[location_contents.EVENTS_COLLECTION].insert_many.called
+
+
+def test_move_stock_reports_the_short_moves(
+    mocker, location_contents, async_collection, async_db, async_cursor
+):
+    async_collection.bulk_write.return_value = mocker.MagicMock(
+        matched_count=1, upserted_count=0
+    )
+    async_collection.find.return_value = async_cursor(
+        [
+            {
+                "item": {"id": "item"},
+                "lot": "lot",
+                "location": {"id": "a"},
+                "quantity": 7,
+                "reserved": 4,
+            }
+        ]
+    )
+
+    with pytest.raises(InsufficientStockError) as excinfo:
+        asyncio.run(location_contents.move_stock([MOVE]))
+
+    assert excinfo.value.moves == [0]
+    logs = async_db[location_contents.QUANTITY_LOGS_COLLECTION]
+    logs.insert_many.assert_not_called()
@@ -0,0 +1,74 @@
+from pymongo import UpdateOne
+
+from pharmagob.mongodb_repositories._allocation import (
+    LotAllocation,
+    consumption_operations,
+    consumption_records,
+    reservation_operations,
+)
+from pharmagob.mongodb_repositories._stock import (
+    AVAILABLE_QUANTITY,
+    RESERVED_FIELD,
+    guarded_filter,
+)
+
+ALLOCATION = LotAllocation(
+    location_content_id="lc1",
+    item_id="item",
+    lot="lot",
+    location_id="loc",
+    expiration_date=1,
+    quantity=4,
+)
+
+
+def test_guarded_filter_excludes_reserved_stock():
+    filter = guarded_filter("item", "lot", "loc", -3, allow_negative=False)
+
+    assert filter["$expr"] == {"$gte": [AVAILABLE_QUANTITY, 3]}
+    assert "quantity" not in filter
+
+
+def test_guarded_filter_without_guard():
+    assert "$expr" not in guarded_filter("item", "lot", "loc", 3, allow_negative=False)
+    assert "$expr" not in guarded_filter("item", "lot", "loc", -3, allow_negative=True)
+
+
+def test_reservation_uses_the_same_guard():
+    assert reservation_operations([ALLOCATION], 10) == [
+        UpdateOne(
+            {"_id": "lc1", "$expr": {"$gte": [AVAILABLE_QUANTITY, 4]}},
+            {"$inc": {RESERVED_FIELD: 4}, "$set": {"updated_at": 10}},
+        )
+    ]
+
+
+def test_release_needs_the_quantity_to_be_reserved():
+    assert reservation_operations([ALLOCATION], 10, release=True) == [
+        UpdateOne(
+            {"_id": "lc1", RESERVED_FIELD: {"$gte": 4}},
+            {"$inc": {RESERVED_FIELD: -4}, "$set": {"updated_at": 10}},
+        )
+    ]
+
+
+def test_consumption_lowers_quantity_and_reserved_together():
+    assert consumption_operations([ALLOCATION], 10) == [
+        UpdateOne(
+            {"_id": "lc1", RESERVED_FIELD: {"$gte": 4}, "quantity": {"$gte": 4}},
+            {
+                "$inc": {"quantity": -4, RESERVED_FIELD: -4},
+                "$set": {"updated_at": 10},
+            },
+        )
+    ]
+
+
+def test_consumption_records():
+    logs, events = consumption_records(
+        [ALLOCATION], now=10, reason="dispatch", reference="d1"
+    )
+
+    assert logs[0]["delta"] == -4
+    assert logs[0]["location_id"] == "loc"
+    assert events[0]["data"]["location_content_id"] == "lc1"
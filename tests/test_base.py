@@ -0,0 +1,26 @@
+import pytest
+
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return ShipmentRepository(db_manager, "shipments")
+
+
+def test_get_paginated_without_limit_reads_every_document(repository, collection):
+    repository.get_paginated(limit=0)
+
+    assert collection.find.call_args.kwargs["limit"] == 0
+
+
+def test_get_paginated_skips_the_previous_pages(repository, collection):
+    repository.get_paginated(page=3, limit=20)
+
+    assert collection.find.call_args.kwargs["skip"] == 40
+    assert collection.find.call_args.kwargs["limit"] == 20
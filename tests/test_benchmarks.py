@@ -0,0 +1,106 @@
+import pytest
+
+from benchmarks.cases import CASES, Context
+from benchmarks.datasets import seed
+from benchmarks.run import compare, measure, parse_args, result_key, selected
+
+CASES_BY_NAME = {case.name: case for case in CASES}
+
+
+def test_case_names_are_unique():
+    assert len(CASES_BY_NAME) == len(CASES)
+
+
+def test_result_key_of_a_database_less_case_has_no_size():
+    assert (
+        result_key(CASES_BY_NAME["location_contents.get_many"], 10, 1000)
+        == "location_contents.get_many[10]@1000"
+    )
+    assert (
+        result_key(CASES_BY_NAME["convert_conditions_to_mongo"], None, 1000)
+        == "convert_conditions_to_mongo"
+    )
+
+
+def test_search_cases_need_atlas_search():
+    search_case = CASES_BY_NAME["shipments.search_by_order_number"]
+
+    assert not selected(search_case, parse_args([]))
+    assert selected(search_case, parse_args(["--atlas-search"]))
+    assert not selected(
+        search_case, parse_args(["--atlas-search", "--only", "items.*"])
+    )
+
+
+def test_measure_counts_the_documents_per_call():
+    calls = []
+
+    def call():
+        calls.append(None)
+        return 3
+
+    result = measure(call, iterations=4, warmup=2)
+
+    assert len(calls) == 6
+    assert result["iterations"] == 4
+    assert result["docs_per_call"] == 3
+    assert 0 <= result["p50_ms"] <= result["p99_ms"]
+
+
+@pytest.mark.parametrize(
+    "current, regressed",
+    [
+        ({"p50_ms": 11.0, "p99_ms": 20.0}, False),  # within the tolerance
+        ({"p50_ms": 10.2, "p99_ms": 20.0}, False),
+        ({"p50_ms": 15.0, "p99_ms": 20.0}, True),
+        ({"p50_ms": 10.0, "p99_ms": 30.0}, True),
+    ],
+)
+def test_compare_flags_slower_cases(current, regressed):
+    baseline = {"case": {"p50_ms": 10.0, "p99_ms": 20.0}}
+
+    regressions = compare(
+        {"case": current, "new": current}, baseline, tolerance=0.2, noise_ms=0.5
+    )
+
+    assert bool(regressions) is regressed
+
+
+def test_compare_ignores_timer_noise():
+    regressions = compare(
+        {"case": {"p50_ms": 0.3, "p99_ms": 0.4}},
+        {"case": {"p50_ms": 0.1, "p99_ms": 0.1}},
+        tolerance=0.2,
+        noise_ms=0.5,
+    )
+
+    assert regressions == []
+
+
+def test_seed_is_deterministic(mocker):
+    def seeded():
+        database = mocker.MagicMock()
+        collections = {}
+        database.__getitem__.side_effect = lambda name: collections.setdefault(
+            name, mocker.MagicMock(name=name)
+        )
+        samples = seed(database, 200, random_seed=7)
+        inserted = {
+            name: [call.args[0] for call in collection.insert_many.call_args_list]
+            for name, collection in collections.items()
+        }
+        return samples, inserted
+
+    samples, inserted = seeded()
+
+    assert seeded() == (samples, inserted)
+    assert len(sum(inserted["location_contents"], [])) == 200
+    assert samples.item_ids and samples.triads
+
+
+def test_database_less_case_runs_without_a_database(mocker):
+    case = CASES_BY_NAME["convert_conditions_to_mongo"]
+    context = Context(mocker.MagicMock(), seed(mocker.MagicMock(), 10))
+
+    for param in case.params:
+        assert case.setup(context, param)() >= 0
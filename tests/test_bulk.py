@@ -0,0 +1,118 @@
+import pytest
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from pharmagob.mongodb_repositories._bulk import iter_batches
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return ShipmentRepository(db_manager, "shipments")
+
+
+def _result(mocker, **counts):
+    zeros = dict.fromkeys(
+        (
+            "inserted_count",
+            "matched_count",
+            "modified_count",
+            "upserted_count",
+            "deleted_count",
+        ),
+        0,
+    )
+    return mocker.MagicMock(**{**zeros, **counts})
+
+
+def _failure(index, *, inserted=0):
+    return BulkWriteError(
+        {
+            "nInserted": inserted,
+            "writeErrors": [{"index": index, "code": 11000, "errmsg": "duplicate"}],
+        }
+    )
+
+
+def test_iter_batches_needs_a_positive_size():
+    assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    with pytest.raises(ValueError):
+        list(iter_batches(range(5), 0))
+
+
+def test_create_many_adds_up_the_batches(mocker, repository, collection):
+    collection.bulk_write.side_effect = [
+        _result(mocker, inserted_count=2),
+        _result(mocker, inserted_count=1),
+    ]
+
+    summary = repository.create_many([{"_id": 1}, {"_id": 2}, {"_id": 3}], batch_size=2)
+
+    assert summary.ok and summary.inserted_count == 3
+    batches = [call.args[0] for call in collection.bulk_write.call_args_list]
+    assert batches == [
+        [InsertOne({"_id": 1}), InsertOne({"_id": 2})],
+        [InsertOne({"_id": 3})],
+    ]
+
+
+def test_ordered_failure_stops_the_following_batches(mocker, repository, collection):
+    collection.bulk_write.side_effect = [
+        _result(mocker, inserted_count=2),
+        _failure(0),
+        _result(mocker, inserted_count=2),
+    ]
+
+    summary = repository.create_many([{"_id": n} for n in range(6)], batch_size=2)
+
+    assert not summary.ok
+    assert summary.inserted_count == 2
+    assert [error["index"] for error in summary.errors] == [2]
+    assert collection.bulk_write.call_count == 2
+
+
+def test_unordered_failure_reports_every_error(mocker, repository, collection):
+    collection.bulk_write.side_effect = [
+        _failure(1, inserted=1),
+        _result(mocker, inserted_count=2),
+        _failure(0, inserted=1),
+    ]
+
+    summary = repository.create_many(
+        [{"_id": n} for n in range(6)], ordered=False, batch_size=2
+    )
+
+    assert summary.inserted_count == 4
+    assert [(error["index"], error["code"]) for error in summary.errors] == [
+        (1, 11000),
+        (4, 11000),
+    ]
+    assert collection.bulk_write.call_args.kwargs["ordered"] is False
+
+
+def test_set_many_only_on_insert(repository, collection):
+    repository.set_many([("s1", {"status": "new"})], write_only_if_insert=True)
+
+    assert collection.bulk_write.call_args.args[0] == [
+        UpdateOne({"_id": "s1"}, {"$setOnInsert": {"status": "new"}}, upsert=True)
+    ]
+
+
+def test_builder_sends_the_collected_writes_once(repository, collection):
+    bulk = repository.bulk(ordered=False)
+    bulk.insert({"_id": "s1"}).update("s2", data={"status": "done"}).delete("s3")
+
+    assert len(bulk) == 3
+    bulk.execute()
+
+    assert collection.bulk_write.call_args.args[0] == [
+        InsertOne({"_id": "s1"}),
+        UpdateOne({"_id": "s2"}, {"$set": {"status": "done"}}, upsert=False),
+        DeleteOne({"_id": "s3"}),
+    ]
+    assert len(bulk) == 0
@@ -0,0 +1,41 @@
+from pharmagob.mongodb_repositories._cache import (
+    MISSING,
+    TTLCache,
+    collection_tag,
+    document_tag,
+    query_tag,
+)
+
+
+def test_invalidate_tag_drops_every_entry_carrying_it():
+    cache = TTLCache()
+    cache.put("a", 1, tags=(document_tag("items", 1), collection_tag("items")))
+    cache.put("b", 2, tags=(query_tag("items"), collection_tag("items")))
+    cache.put("c", 3, tags=(query_tag("locations"), collection_tag("locations")))
+
+    cache.invalidate_tag(collection_tag("items"))
+
+    assert cache.get("a") is MISSING
+    assert cache.get("b") is MISSING
+    assert cache.get("c") == 3
+
+
+def test_invalidate_document_keeps_other_collections():
+    cache = TTLCache()
+    cache.put("items", {"_id": 1}, tags=(document_tag("items", 1),))
+    cache.put("locations", {"_id": 1}, tags=(document_tag("locations", 1),))
+
+    cache.invalidate_tag(document_tag("items", 1))
+
+    assert cache.get("items") is MISSING
+    assert cache.get("locations") == {"_id": 1}
+
+
+def test_put_replaces_the_tags_of_a_key():
+    cache = TTLCache()
+    cache.put("a", 1, tag=query_tag("items"))
+    cache.put("a", 2, tag=query_tag("locations"))
+
+    cache.invalidate_tag(query_tag("items"))
+
+    assert cache.get("a") == 2
@@ -0,0 +1,108 @@
+import pytest
+
+from pharmagob.mongodb_repositories._details import details_pipeline
+from pharmagob.mongodb_repositories.dispatch_record_details import (
+    DispatchRecordDetailRepository,
+)
+from pharmagob.mongodb_repositories.dispatch_records import DispatchRecordRepository
+from pharmagob.mongodb_repositories.items import ItemsRepository
+from pharmagob.mongodb_repositories.shipment_details import (
+    ShipmentDetailRepository,
+)
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return ShipmentRepository(db_manager, "shipments")
+
+
+@pytest.mark.parametrize(
+    "header_class, details_class",
+    [
+        (ShipmentRepository, ShipmentDetailRepository),
+        (DispatchRecordRepository, DispatchRecordDetailRepository),
+    ],
+)
+def test_lookup_joins_on_an_indexed_prefix(header_class, details_class):
+    prefixes = {spec.keys[0][0] for spec in details_class.index_specs()}
+
+    assert header_class.DETAILS_FOREIGN_FIELD in prefixes
+
+
+def test_details_pipeline_filters_the_lines_inside_the_lookup():
+    pipeline = details_pipeline(
+        {"_id": "s1"},
+        from_collection="shipment_details",
+        foreign_field="shipment.id",
+        as_field="details",
+        umu_id="u1",
+        projection=["status"],
+        details_projection=["item.id"],
+        details_sort=[("created_at", 1)],
+        details_limit=20,
+    )
+
+    assert pipeline == [
+        {"$match": {"_id": "s1"}},
+        {"$project": {"status": 1, "_id": 1}},
+        {
+            "$lookup": {
+                "from": "shipment_details",
+                "localField": "_id",
+                "foreignField": "shipment.id",
+                "as": "details",
+                "pipeline": [
+                    {"$match": {"umu_id": "u1"}},
+                    {"$sort": {"created_at": 1}},
+                    {"$limit": 20},
+                    {"$project": {"item.id": 1}},
+                ],
+            }
+        },
+    ]
+
+
+def test_exclusion_projection_keeps_the_join_key():
+    pipeline = details_pipeline(
+        {},
+        from_collection="shipment_details",
+        foreign_field="shipment.id",
+        as_field="details",
+        projection={"_id": 0, "notes": 0},
+    )
+
+    assert pipeline[1] == {"$project": {"notes": 0}}
+    assert "pipeline" not in pipeline[2]["$lookup"]
+
+
+def test_get_many_with_details_keeps_the_input_order(repository, collection):
+    collection.aggregate.return_value = iter(
+        [{"_id": "s2", "details": []}, {"_id": "s1", "details": [{"_id": "d1"}]}]
+    )
+
+    documents = repository.get_many_with_details(
+        ["s1", "s3", "s2"], details_projection="summary"
+    )
+
+    assert documents == [
+        {"_id": "s1", "details": [{"_id": "d1"}]},
+        None,
+        {"_id": "s2", "details": []},
+    ]
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[0] == {"$match": {"_id": {"$in": ["s1", "s3", "s2"]}}}
+    assert pipeline[-1]["$lookup"]["pipeline"] == [
+        {"$project": ShipmentDetailRepository.PROJECTIONS["summary"]}
+    ]
+    collection.aggregate.assert_called_once()
+
+
+def test_repository_without_details_is_rejected(db_manager):
+    with pytest.raises(ValueError, match="DETAILS_COLLECTION"):
+        ItemsRepository(db_manager, "items").get_with_details("i1")
@@ -0,0 +1,37 @@
+import pytest
+
+from pharmagob.mongodb_repositories.location_contents import (
+    LocationContentRepository,
+)
+
+
+@pytest.fixture
+def collection_name():
+    return "location_contents"
+
+
+@pytest.fixture
+def repository(db_manager, collection):
+    collection.index_information.return_value = {}
+    repository = LocationContentRepository(db_manager, "location_contents")
+    spec = repository.search_index_specs()[0]
+    collection.list_search_indexes.return_value = [
+        {"name": spec.name, "latestDefinition": {"mappings": {"dynamic": True}}}
+    ]
+    return repository
+
+
+def test_changed_search_index_is_only_reported(repository, collection):
+    drift = repository.ensure_indexes()
+
+    collection.update_search_index.assert_not_called()
+    assert drift.search_changed
+    assert not drift.search_updated
+
+
+def test_changed_search_index_is_updated_on_request(repository, collection):
+    drift = repository.ensure_indexes(update_search_indexes=True)
+
+    collection.update_search_index.assert_called_once()
+    assert not drift.search_changed
+    assert drift.search_updated
@@ -0,0 +1,113 @@
+import pytest
+
+from pharmagob.mongodb_repositories._instrumentation import (
+    LatencyHistogram,
+    QueryEvent,
+    QueryHooks,
+    filter_shape,
+)
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def repository(db_manager, events):
+    return ShipmentRepository(
+        db_manager, "shipments", hooks=QueryHooks(post=[events.append])
+    )
+
+
+def test_filter_shape_hides_the_values():
+    assert filter_shape(
+        {"umu_id": "u1", "$or": [{"a": 1}, {"b": {"$in": [1, 2]}}]}
+    ) == {"umu_id": "?", "$or": [{"a": "?"}, {"b": {"$in": "?"}}]}
+
+
+def test_hooks_see_the_documents_read(repository, collection, events):
+    collection.find.return_value = [{"_id": "s1"}, {"_id": "s2"}]
+
+    repository.get_many(["s1", "s2", "s3"])
+
+    (event,) = events
+    assert (event.collection, event.operation) == ("shipments", "find_many")
+    assert event.documents == 2
+    assert event.duration_ms >= 0
+    assert event.error is None
+
+
+def test_lazy_cursor_reports_once_exhausted(repository, collection, events):
+    collection.find.return_value = iter([{"_id": "s1"}, {"_id": "s2"}])
+
+    documents = repository.iter_all()
+    next(documents)
+    assert events == []
+    list(documents)
+
+    (event,) = events
+    assert (event.operation, event.documents) == ("iter", 2)
+
+
+def test_failed_operation_reaches_the_hooks(db_manager, collection):
+    events = []
+
+    def broken(event):
+        raise RuntimeError("hook")
+
+    repository = ShipmentRepository(
+        db_manager, "shipments", hooks=QueryHooks(post=[broken, events.append])
+    )
+    collection.find.side_effect = ValueError("query")
+
+    with pytest.raises(ValueError, match="query"):
+        repository.get_many(["s1"])
+
+    # the broken hook is logged and the next one still runs
+    assert isinstance(events[0].error, ValueError)
+
+
+def test_slow_operations_are_explained(db_manager, collection, events):
+    repository = ShipmentRepository(
+        db_manager,
+        "shipments",
+        hooks=QueryHooks(post=[events.append], measure_bytes=True, explain_slow_ms=0),
+    )
+    collection.find.return_value = iter([{"_id": "s1"}])
+    collection.database.command.return_value = {"executionStats": {}}
+
+    list(repository.iter_all(sort=[("_id", 1)]))
+
+    (event,) = events
+    assert event.explain == {"executionStats": {}}
+    assert event.bytes > 0
+    command = collection.database.command.call_args.args[1]
+    assert command == {"find": "shipments", "filter": {}, "sort": {"_id": 1}}
+
+
+def test_latency_histogram_exports_every_series():
+    histogram = LatencyHistogram(buckets_ms=(10, 100))
+    histogram(QueryEvent("find", "items", duration_ms=5, documents=3))
+    histogram(QueryEvent("find", "items", duration_ms=50, documents=1))
+    histogram(QueryEvent("find", "items", duration_ms=500, error=ValueError()))
+
+    assert histogram.export() == {
+        "items.find": {
+            "buckets_ms": {"10": 1, "100": 1, "+Inf": 1},
+            "count": 3,
+            "sum_ms": 555,
+            "documents": 4,
+            "errors": 1,
+        }
+    }
+    assert (
+        'pharmagob_mongodb_query_ms_bucket{collection="items",operation="find",'
+        'le="100"} 2' in histogram.export_prometheus().splitlines()
+    )
@@ -0,0 +1,57 @@
+import pytest
+
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return ShipmentRepository(db_manager, "shipments")
+
+
+def test_iter_all_streams_the_find_cursor(repository, collection):
+    collection.find.return_value = iter([{"_id": "s1"}, {"_id": "s2"}])
+
+    documents = repository.iter_all(
+        [("status", "=", "open")], umu_id="u1", sort=[("_id", 1)], batch_size=50
+    )
+
+    collection.find.assert_not_called()  # nothing is read before iterating
+    assert next(documents) == {"_id": "s1"}
+    assert list(documents) == [{"_id": "s2"}]
+    assert collection.find.call_args.args[0] == {
+        "status": {"$eq": "open"},
+        "umu_id": "u1",
+    }
+    assert collection.find.call_args.kwargs["batch_size"] == 50
+    assert collection.find.call_args.kwargs["sort"] == [("_id", 1)]
+
+
+def test_iter_search_streams_without_a_facet(repository, collection):
+    collection.aggregate.return_value = iter([{"_id": "s1"}])
+
+    documents = list(
+        repository.iter_search(
+            repository.ORDER_NUMBER_SEARCH,
+            "OC-2024",
+            limit=500,
+            batch_size=100,
+            equals={"umu_id": "u1"},
+        )
+    )
+
+    assert documents == [{"_id": "s1"}]
+    pipeline = collection.aggregate.call_args.kwargs["pipeline"]
+    assert pipeline == [
+        {
+            "$search": repository.ORDER_NUMBER_SEARCH.compile(
+                "OC-2024", equals={"umu_id": "u1"}
+            )
+        },
+        {"$limit": 500},
+    ]
+    assert collection.aggregate.call_args.kwargs["batchSize"] == 100
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from pharmagob.mongodb_repositories.aio.loader import DocumentLoader
+
+
+class _Repository:
+    def __init__(self):
+        self.calls = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def get_many(self, document_ids, *, umu_id=None, projection=None):
+        self.calls.append(document_ids)
+        self.started.set()
+        await self.release.wait()
+        return [{"_id": document_id} for document_id in document_ids]
+
+
+def test_concurrent_loads_share_one_batch():
+    async def scenario():
+        repository = _Repository()
+        repository.release.set()
+        loader = DocumentLoader(repository)
+        documents = await loader.load_many([1, 2, 1])
+        return repository.calls, documents, loader._tasks
+
+    calls, documents, tasks = asyncio.run(scenario())
+
+    assert calls == [[1, 2]]
+    assert documents == [{"_id": 1}, {"_id": 2}, {"_id": 1}]
+    assert not tasks
+
+
+def test_cancelled_batch_cancels_the_waiting_loads():
+    async def scenario():
+        repository = _Repository()
+        loader = DocumentLoader(repository)
+        load = asyncio.ensure_future(loader.load(1))
+        await repository.started.wait()
+        (task,) = loader._tasks
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await load
+        await asyncio.sleep(0)
+        return loader._tasks
+
+    assert not asyncio.run(scenario())
@@ -0,0 +1,164 @@
+import pytest
+from pymongo import UpdateOne
+
+from pharmagob.mongodb_repositories._stock import (
+    AVAILABLE_QUANTITY,
+    InsufficientStockError,
+    StockMove,
+    destination_operation,
+)
+from pharmagob.mongodb_repositories.location_contents import (
+    LocationContentRepository,
+)
+
+MOVE = StockMove(
+    item_id="item",
+    lot="lot",
+    from_location_id="a",
+    to_location_id="b",
+    quantity=5,
+    destination_defaults={"umu_id": "u1", "quantity": 99},
+)
+
+
+@pytest.fixture
+def collection_name():
+    return "location_contents"
+
+
+@pytest.fixture
+def db(mocker, collection):
+    db = collection.database
+    others = {}
+    db.__getitem__.side_effect = lambda name: others.setdefault(
+        name, mocker.MagicMock(name=name)
+    )
+    session = db.client.start_session.return_value.__enter__.return_value
+    session.with_transaction.side_effect = lambda apply: apply(session)
+    return db
+
+
+@pytest.fixture
+def repository(db_manager, db):
+    return LocationContentRepository(db_manager, "location_contents")
+
+
+def _bulk_result(mocker, *, matched, upserted=0):
+    return mocker.MagicMock(matched_count=matched, upserted_count=upserted)
+
+
+def test_adjust_quantity_rejects_taking_more_than_available(repository, collection):
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = {"_id": 1}
+
+    with pytest.raises(InsufficientStockError):
+        repository.adjust_quantity("item", "lot", "a", -5)
+
+    filter = collection.find_one_and_update.call_args.args[0]
+    assert "$expr" in filter
+    repository._db[repository.QUANTITY_LOGS_COLLECTION].insert_one.assert_not_called()
+
+
+def test_adjust_quantity_of_a_missing_triad_returns_none(repository, collection):
+    collection.find_one_and_update.return_value = None
+    collection.find_one.return_value = None
+
+    assert repository.adjust_quantity("item", "lot", "a", -5) is None
+
+
+def test_adjust_quantity_allow_negative_drops_the_guard(repository, collection, db):
+    document = {
+        "_id": 1,
+        "item": {"id": "item"},
+        "lot": "lot",
+        "location": {"id": "a"},
+        "quantity": -2,
+    }
+    collection.find_one_and_update.return_value = document
+
+    assert (
+        repository.adjust_quantity(
+            "item", "lot", "a", -5, allow_negative=True, reason="count"
+        )
+        == document
+    )
+
+    filter = collection.find_one_and_update.call_args.args[0]
+    assert filter == {"item.id": "item", "lot": "lot", "location.id": "a"}
+    log = db[repository.QUANTITY_LOGS_COLLECTION].insert_one.call_args.args[0]
+    assert (log["delta"], log["quantity"], log["reason"]) == (-5, -2, "count")
+
+
+def test_move_stock_upserts_the_destination(mocker, repository, collection, db):
+    mocker.patch(
+        "pharmagob.mongodb_repositories.location_contents.now_ms", return_value=10
+    )
+    collection.bulk_write.return_value = _bulk_result(mocker, matched=1, upserted=1)
+
+    result = repository.move_stock([MOVE])
+
+    assert result.ok and result.moved == [0]
+    assert collection.bulk_write.call_args.args[0] == [
+        UpdateOne(
+            {
+                "item.id": "item",
+                "lot": "lot",
+                "location.id": "a",
+                "$expr": {"$gte": [AVAILABLE_QUANTITY, 5]},
+            },
+            {"$inc": {"quantity": -5}, "$set": {"updated_at": 10}},
+        ),
+        # managed paths never come from the defaults
+        UpdateOne(
+            {"item.id": "item", "lot": "lot", "location.id": "b"},
+            {
+                "$inc": {"quantity": 5},
+                "$set": {"updated_at": 10},
+                "$setOnInsert": {"umu_id": "u1", "created_at": 10},
+            },
+            upsert=True,
+        ),
+    ]
+    assert db[repository.QUANTITY_LOGS_COLLECTION].insert_many.called
+    assert db[repository.EVENTS_COLLECTION].insert_many.called
+
+
+def test_move_stock_rolls_back_a_short_batch(mocker, repository, collection, db):
+    # the source guard did not match: the transaction must abort
+    collection.bulk_write.return_value = _bulk_result(mocker, matched=1)
+    collection.find.return_value = [
+        {
+            "item": {"id": "item"},
+            "lot": "lot",
+            "location": {"id": "a"},
+            "quantity": 7,
+            "reserved": 4,
+        }
+    ]
+
+    with pytest.raises(InsufficientStockError) as error:
+        repository.move_stock([MOVE])
+
+    assert error.value.moves == [0]
+    db[repository.QUANTITY_LOGS_COLLECTION].insert_many.assert_not_called()
+    db[repository.EVENTS_COLLECTION].insert_many.assert_not_called()
+
+
+def test_move_stock_without_transaction_skips_short_moves(
+    mocker, repository, collection, db
+):
+    mocker.patch(
+        "pharmagob.mongodb_repositories.location_contents.now_ms", return_value=10
+    )
+    second = StockMove(
+        item_id="item", lot="lot", from_location_id="c", to_location_id="b", quantity=1
+    )
+    collection.find_one_and_update.side_effect = [None, {"_id": 2}]
+
+    result = repository.move_stock([MOVE, second], transactional=False)
+
+    assert (result.failed, result.moved) == ([0], [1])
+    assert collection.bulk_write.call_args.args[0] == [
+        destination_operation(second, 10)
+    ]
+    db.client.start_session.assert_not_called()
@@ -0,0 +1,41 @@
+import pytest
+
+from pharmagob.mongodb_repositories.logs import BaseLogRepository
+
+
+class _ArchivedLogs(BaseLogRepository):
+    ARCHIVE_COLLECTION = "logs_archive"
+
+
+@pytest.fixture
+def collection_name():
+    return "logs"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return _ArchivedLogs(db_manager, "logs", flush_interval=0)
+
+
+def test_archive_deletes_only_the_merged_ids(mocker, repository, collection):
+    cursor = collection.find.return_value
+    cursor.__iter__.return_value = iter([{"_id": 1}, {"_id": 2}])
+    collection.delete_many.return_value = mocker.MagicMock(deleted_count=2)
+
+    assert repository.archive(older_than=1000) == 2
+
+    ids = {"_id": {"$in": [1, 2]}}
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[0] == {"$match": ids}
+    assert pipeline[1]["$merge"]["into"] == "logs_archive"
+    collection.delete_many.assert_called_once_with(ids)
+    cursor.close.assert_called_once()
+
+
+def test_archive_without_entries_writes_nothing(repository, collection):
+    collection.find.return_value.__iter__.return_value = iter([])
+
+    assert repository.archive(older_than=1000) == 0
+
+    collection.aggregate.assert_not_called()
+    collection.delete_many.assert_not_called()
@@ -0,0 +1,60 @@
+from pharmagob.mongodb_repositories._pagination import (
+    decode_cursor_token,
+    encode_cursor_token,
+    keyset_filter,
+    keyset_sort,
+)
+
+SORT = [("expiration_date", 1), ("_id", 1)]
+
+
+def test_keyset_sort_appends_id():
+    assert keyset_sort([("expiration_date", -1)]) == [
+        ("expiration_date", -1),
+        ("_id", -1),
+    ]
+
+
+def test_keyset_filter_ascending():
+    assert keyset_filter(SORT, [5, "b"]) == {
+        "$or": [
+            {"expiration_date": {"$gt": 5}},
+            {"expiration_date": 5, "_id": {"$gt": "b"}},
+        ]
+    }
+
+
+def test_keyset_filter_ascending_after_null():
+    # nulls sort first: the rest of the nulls, then every non-null value
+    assert keyset_filter(SORT, [None, "b"]) == {
+        "$or": [
+            {"expiration_date": {"$ne": None}},
+            {"expiration_date": None, "_id": {"$gt": "b"}},
+        ]
+    }
+
+
+def test_keyset_filter_descending_keeps_the_nulls():
+    sort = [("expiration_date", -1), ("_id", -1)]
+
+    assert keyset_filter(sort, [5, "b"]) == {
+        "$or": [
+            {"$or": [{"expiration_date": {"$lt": 5}}, {"expiration_date": None}]},
+            {"expiration_date": 5, "_id": {"$lt": "b"}},
+        ]
+    }
+
+
+def test_keyset_filter_descending_after_null():
+    sort = [("expiration_date", -1), ("_id", -1)]
+
+    assert keyset_filter(sort, [None, "b"]) == {
+        "expiration_date": None,
+        "_id": {"$lt": "b"},
+    }
+
+
+def test_cursor_token_round_trip_with_missing_field():
+    token = encode_cursor_token(SORT, {"_id": "b"})
+
+    assert decode_cursor_token(token, SORT) == [None, "b"]
@@ -0,0 +1,70 @@
+import bson
+import pytest
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from pharmagob.mongodb_repositories._pagination import get_path
+from pharmagob.mongodb_repositories.location_contents import (
+    LocationContentRepository,
+)
+from pharmagob.mongodb_repositories.shipment_details import (
+    ShipmentDetailRepository,
+)
+
+
+@pytest.fixture
+def collection_name():
+    return "location_contents"
+
+
+@pytest.fixture
+def repository(db_manager, collection):
+    collection.codec_options = CodecOptions()
+    return LocationContentRepository(db_manager, "location_contents")
+
+
+@pytest.mark.parametrize(
+    "repository_class, index_name",
+    [
+        (LocationContentRepository, "umu_id_expiration_date_summary"),
+        (ShipmentDetailRepository, "shipment_id_umu_id_summary"),
+    ],
+)
+def test_summary_preset_is_covered_by_its_index(repository_class, index_name):
+    (index,) = [
+        spec for spec in repository_class.index_specs() if spec.name == index_name
+    ]
+
+    assert set(repository_class.PROJECTIONS["summary"]) <= {
+        path for path, _ in index.keys
+    }
+
+
+def test_preset_names_resolve_to_their_projection(repository, collection):
+    repository.get_paginated(projection="summary")
+    assert (
+        collection.find.call_args.kwargs["projection"]
+        == LocationContentRepository.PROJECTIONS["summary"]
+    )
+
+    repository.get_paginated(projection="full")
+    assert collection.find.call_args.kwargs["projection"] is None
+
+
+def test_unknown_preset_is_rejected(repository):
+    with pytest.raises(ValueError, match="thumbnail"):
+        repository.get_paginated(projection="thumbnail")
+
+
+def test_raw_reads_decode_raw_bson(repository, collection):
+    repository.get_paginated(raw=True)
+
+    options = collection.with_options.call_args.kwargs
+    assert options["codec_options"].document_class is RawBSONDocument
+
+
+def test_keyset_paths_work_on_raw_documents():
+    document = RawBSONDocument(bson.encode({"item": {"id": "i1"}, "lot": "L1"}))
+
+    assert get_path(document, "item.id") == "i1"
+    assert get_path(document, "lot.id") is None
@@ -0,0 +1,104 @@
+import pytest
+from pymongo.errors import OperationFailure
+
+from pharmagob.mongodb_repositories._reports import (
+    REPORT_STATUS_COMPLETED,
+    REPORT_STATUS_FAILED,
+    build_stock_report_pipeline,
+    chunk_filter,
+    report_chunks,
+)
+from pharmagob.mongodb_repositories.location_contents import (
+    LocationContentRepository,
+)
+
+
+@pytest.fixture
+def collection_name():
+    return "location_contents"
+
+
+@pytest.fixture
+def db(mocker, collection):
+    db = collection.database
+    others = {}
+    db.__getitem__.side_effect = lambda name: others.setdefault(
+        name, mocker.MagicMock(name=name)
+    )
+    return db
+
+
+@pytest.fixture
+def repository(db_manager, db):
+    return LocationContentRepository(db_manager, "location_contents")
+
+
+def test_report_chunks_end_with_the_documents_without_umu():
+    assert report_chunks(["b", None, "a"]) == ["a", "b", None]
+    assert report_chunks([]) == [None]
+
+
+def test_chunk_filter_of_the_missing_umu_matches_null_and_missing():
+    assert chunk_filter({}, None) == {"umu_id": None}
+    assert chunk_filter({"lot": "x"}, "a") == {"$and": [{"lot": "x"}, {"umu_id": "a"}]}
+
+
+def test_report_rows_are_merged_on_a_composed_id():
+    group, project, merge = build_stock_report_pipeline({}, "report_r1")[1:]
+
+    assert group["$group"]["_id"] == {
+        "umu_id": {"$ifNull": ["$umu_id", None]},
+        "item_id": {"$ifNull": ["$item.id", None]},
+    }
+    assert "_id" not in project["$project"]
+    assert merge["$merge"]["on"] == "_id"
+
+
+def test_report_runs_every_chunk_and_completes(mocker, repository, collection, db):
+    collection.distinct.return_value = ["u1", None]
+    chunks = db["report_r1_chunks"]
+    chunks.distinct.return_value = []
+    reports = mocker.MagicMock()
+
+    handle = repository.start_report_aggregation("r1", {"lot": "x"}, reports=reports)
+
+    assert handle.result(timeout=5) == "report_r1"
+    matches = [
+        call.args[0][0]["$match"] for call in collection.aggregate.call_args_list
+    ]
+    assert matches == [
+        chunk_filter({"lot": "x"}, "u1"),
+        chunk_filter({"lot": "x"}, None),
+    ]
+    assert [call.args[0] for call in chunks.update_one.call_args_list] == [
+        {"_id": "u1"},
+        {"_id": None},
+    ]
+    assert handle.progress == 100
+    reports.update_status.assert_called_with("r1", REPORT_STATUS_COMPLETED, 100)
+
+
+def test_report_resumes_after_the_finished_chunks(repository, collection, db):
+    collection.distinct.return_value = ["u1", "u2"]
+    db["report_r1_chunks"].distinct.return_value = ["u1"]
+
+    assert repository.trigger_report_aggregation("r1", {}) == "report_r1"
+
+    matches = [
+        call.args[0][0]["$match"] for call in collection.aggregate.call_args_list
+    ]
+    assert matches == [{"umu_id": "u2"}, {"umu_id": None}]
+
+
+def test_failed_report_is_raised_by_the_handle(mocker, repository, collection, db):
+    collection.distinct.return_value = ["u1"]
+    db["report_r1_chunks"].distinct.return_value = []
+    collection.aggregate.side_effect = OperationFailure("boom", code=51132)
+    reports = mocker.MagicMock()
+
+    handle = repository.start_report_aggregation("r1", {}, reports=reports)
+
+    with pytest.raises(OperationFailure):
+        handle.result(timeout=5)
+    reports.update_status.assert_called_once_with("r1", REPORT_STATUS_FAILED, 0)
+    db["report_r1_chunks"].update_one.assert_not_called()
@@ -0,0 +1,89 @@
+import pytest
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, Secondary, SecondaryPreferred
+
+from pharmagob.mongodb_repositories._routing import ReadRouting
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def reader(mocker, collection):
+    """The handle the reads get from `with_options`, apart from `collection`."""
+    reader = mocker.MagicMock(name="reader")
+    collection.with_options.return_value = reader
+    return reader
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"read_preference": "secondaryish"},
+        {"read_concern": "eventual"},
+        {"max_staleness_seconds": 120},
+        {"read_preference": "primary", "max_staleness_seconds": 120},
+    ],
+)
+def test_invalid_routing_is_rejected(options):
+    with pytest.raises(ValueError):
+        ReadRouting(**options)
+
+
+def test_replace_keeps_the_unset_fields():
+    routing = ReadRouting("secondary", "majority", 120)
+
+    assert routing.replace(read_preference=None) == routing
+    assert routing.replace(read_preference="primary") == ReadRouting(
+        "primary", "majority"
+    )
+
+
+def test_collection_options():
+    assert ReadRouting().collection_options() == {}
+    assert ReadRouting("secondary", "majority", 120).collection_options() == {
+        "read_preference": Secondary(max_staleness=120),
+        "read_concern": ReadConcern("majority"),
+    }
+
+
+def test_reads_follow_the_routing_and_writes_stay_on_the_collection(
+    db_manager, collection, reader
+):
+    repository = ShipmentRepository(
+        db_manager, "shipments", read_preference="secondary"
+    )
+
+    repository.get_paginated()
+    repository.create({"_id": "s1"})
+
+    assert collection.with_options.call_args.kwargs == {"read_preference": Secondary()}
+    reader.find.assert_called_once()
+    collection.insert_one.assert_called_once()
+    reader.insert_one.assert_not_called()
+
+
+def test_analytics_reads_prefer_secondaries(db_manager, collection, reader):
+    repository = ShipmentRepository(db_manager, "shipments")
+
+    repository.get_paginated()
+    list(repository.iter_all())
+
+    collection.find.assert_called_once()  # the default read keeps the collection
+    reader.find.assert_called_once()
+    assert collection.with_options.call_args.kwargs == {
+        "read_preference": SecondaryPreferred()
+    }
+
+
+def test_using_routes_a_copy_only(db_manager, collection, reader):
+    repository = ShipmentRepository(db_manager, "shipments")
+
+    list(repository.using(read_preference="primary").iter_all())
+    repository.get_paginated()
+
+    assert collection.with_options.call_args.kwargs == {"read_preference": Primary()}
+    collection.find.assert_called_once()
@@ -0,0 +1,320 @@
+import operator
+
+import pytest
+
+from pharmagob.mongodb_repositories._search import (
+    SEARCH_TOKEN_FIELD,
+    SearchSpec,
+    build_search_pipeline,
+    parse_search_meta_count,
+)
+from pharmagob.mongodb_repositories.shipments import ShipmentRepository
+
+SPEC = SearchSpec(
+    "autocomplete_reference",
+    "reference",
+    default_sort={"created_at": -1},
+    ranges=("created_at",),
+    equals=("umu_id", "reference"),
+    in_filters=("status",),
+    not_in_filters=("status",),
+    field_types={"umu_id": "string"},
+    exact_pattern=r"TR-\d{4}",
+)
+
+DOCUMENTS = [
+    {
+        "_id": 1,
+        "reference": "TR-0001",
+        "umu_id": "u1",
+        "status": "open",
+        "created_at": 5,
+    },
+    {
+        "_id": 2,
+        "reference": "TR-0001",
+        "umu_id": "u2",
+        "status": "open",
+        "created_at": 5,
+    },
+    {
+        "_id": 3,
+        "reference": "TR-0001",
+        "umu_id": "u1",
+        "status": "done",
+        "created_at": 5,
+    },
+    {
+        "_id": 4,
+        "reference": "TR-0001",
+        "umu_id": "u1",
+        "status": "open",
+        "created_at": 9,
+    },
+    {
+        "_id": 5,
+        "reference": "TR-00010",
+        "umu_id": "u1",
+        "status": "open",
+        "created_at": 5,
+    },
+    {
+        "_id": 6,
+        "reference": "TR-0002",
+        "umu_id": "u1",
+        "status": "open",
+        "created_at": 5,
+    },
+]
+
+
+def _path(document, path):
+    for key in path.split("."):
+        document = (document or {}).get(key)
+    return document
+
+
+def _search_clause(clause, document):
+    ((name, body),) = clause.items()
+    value = _path(document, body["path"])
+    if name == "autocomplete":
+        return isinstance(value, str) and value.startswith(body["query"])
+    if name == "range":
+        bounds = (("gt", operator.gt), ("lt", operator.lt))
+        return all(compare(value, body[key]) for key, compare in bounds if key in body)
+    if name == "equals":
+        return value == body["value"]
+    return value in body["value"]
+
+
+def _search(stage, documents):
+    """A local `$search`: the compound sections over the documents, unsorted."""
+    sections = {
+        "must": all,
+        "filter": all,
+        "mustNot": lambda matches: not any(matches),
+    }
+    return [
+        document["_id"]
+        for document in documents
+        if all(
+            sections[section](_search_clause(clause, document) for clause in clauses)
+            for section, clauses in stage["compound"].items()
+        )
+    ]
+
+
+_OPERATORS = {
+    "$eq": operator.eq,
+    "$gt": operator.gt,
+    "$lt": operator.lt,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+
+def _matches(filter, document):
+    for path, condition in filter.items():
+        if path == "$and":
+            if not all(_matches(part, document) for part in condition):
+                return False
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        value = _path(document, path)
+        if not all(
+            _OPERATORS[name](value, operand) for name, operand in condition.items()
+        ):
+            return False
+    return True
+
+
+def _find(filter, documents):
+    """A local `find` for the operators of `exact_filter`."""
+    return [document["_id"] for document in documents if _matches(filter, document)]
+
+
+@pytest.fixture
+def collection_name():
+    return "shipments"
+
+
+@pytest.fixture
+def repository(db_manager):
+    return ShipmentRepository(db_manager, "shipments")
+
+
+def test_exact_lookup_pages_stay_on_the_index(repository, collection):
+    collection.find.return_value = [{"_id": "s3"}]
+
+    total, results = repository.search_by_order_number(
+        "OC-2024-0001", page=2, limit=2, exact=True
+    )
+
+    assert (total, results) == (3, [{"_id": "s3"}])
+    assert collection.find.call_args.kwargs["skip"] == 2
+    collection.aggregate.assert_not_called()
+
+
+def test_exact_lookup_past_the_last_page_is_empty(repository, collection):
+    collection.find.return_value = []
+    collection.find_one.return_value = {"_id": "s1"}
+    collection.count_documents.return_value = 1
+
+    total, results = repository.search_by_order_number(
+        "OC-2024-0001", page=3, limit=2, exact=True
+    )
+
+    assert (total, results) == (1, [])
+    collection.aggregate.assert_not_called()
+
+
+def test_exact_lookup_passes_the_budget_as_max_time_ms(db_manager, collection):
+    repository = ShipmentRepository(db_manager, "shipments", max_time_ms=500)
+    collection.find.return_value = []
+    collection.find_one.return_value = {"_id": "s1"}
+    collection.count_documents.return_value = 1
+
+    repository.search_by_order_number("OC-2024-0001", page=2, limit=2, exact=True)
+
+    find_options = collection.find.call_args.kwargs
+    find_one_options = collection.find_one.call_args.kwargs
+    assert 0 < find_options["max_time_ms"] <= 500
+    assert 0 < find_one_options["max_time_ms"] <= 500
+    assert "maxTimeMS" not in find_options
+    assert "maxTimeMS" not in find_one_options
+
+
+def test_compile_places_every_filter_in_its_compound_section():
+    stage = SPEC.compile(
+        "TR-00",
+        ranges={"created_at": (1, None)},
+        equals={"umu_id": "u1", "reference": ""},
+        in_filters={"status": ["open"]},
+        not_in_filters={"status": []},
+    )
+
+    assert stage == {
+        "index": "autocomplete_reference",
+        "compound": {
+            "must": [
+                {"autocomplete": {"query": "TR-00", "path": "reference"}},
+                {"range": {"path": "created_at", "gt": 1}},
+            ],
+            "filter": [
+                {"equals": {"path": "umu_id", "value": "u1"}},
+                {"in": {"path": "status", "value": ["open"]}},
+            ],
+        },
+        "sort": {"created_at": -1},
+    }
+
+
+def test_compile_rejects_an_undeclared_filter():
+    with pytest.raises(ValueError, match="lot"):
+        SPEC.compile("TR", equals={"lot": "x"})
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"equals": {"umu_id": "u1"}},
+        {"ranges": {"created_at": (None, 7)}},
+        {"in_filters": {"status": ["open"]}, "not_in_filters": {"status": ["done"]}},
+        {"equals": {"reference": "TR-0002"}},
+    ],
+)
+def test_exact_filter_finds_what_the_search_of_the_full_value_finds(filters):
+    search = _search(SPEC.compile("TR-0001", **filters), DOCUMENTS)
+    exact = _find(SPEC.exact_filter("TR-0001", **filters), DOCUMENTS)
+
+    # the autocomplete also matches the longer TR-00010, the lookup does not
+    assert [_id for _id in search if _id != 5] == exact
+
+
+def test_exact_filter_of_a_partial_value_is_none():
+    assert SPEC.exact_filter("TR-00") is None
+    assert SPEC.exact_filter("   ") is None
+    assert SPEC.exact_filter("TR-0001", exact=False) is None
+    assert SPEC.exact_filter(" TR-00 ", exact=True) == {"reference": "TR-00"}
+
+
+def test_index_fields_maps_every_declared_path():
+    assert SPEC.index_fields() == {
+        "reference": ["autocomplete", "token"],
+        "created_at": ["number"],
+        "umu_id": ["string"],
+        "status": ["token"],
+    }
+
+
+def test_counted_search_page_takes_the_total_from_search_meta():
+    pipeline = build_search_pipeline(
+        {"index": "i"}, page=3, limit=10, count={"type": "total"}
+    )
+
+    assert pipeline == [
+        {"$search": {"index": "i", "count": {"type": "total"}}},
+        {"$skip": 20},
+        {"$limit": 10},
+        {
+            "$facet": {
+                "results": [],
+                "meta": [{"$replaceWith": "$$SEARCH_META"}, {"$limit": 1}],
+            }
+        },
+    ]
+
+
+def test_token_search_page_does_not_skip():
+    pipeline = build_search_pipeline(
+        {"index": "i"}, page=3, limit=10, search_before="token"
+    )
+
+    assert pipeline == [
+        {"$search": {"index": "i", "searchBefore": "token"}},
+        {"$limit": 10},
+        {"$addFields": {SEARCH_TOKEN_FIELD: {"$meta": "searchSequenceToken"}}},
+    ]
+
+
+@pytest.mark.parametrize(
+    "meta, expected",
+    [
+        ({"count": {"total": 12}}, 12),
+        ({"count": {"lowerBound": 1001}}, 1001),
+        ({"count": {}}, 0),
+        (None, 0),
+    ],
+)
+def test_parse_search_meta_count(meta, expected):
+    assert parse_search_meta_count(meta) == expected
+
+
+def test_search_before_returns_the_page_in_order(repository, collection):
+    collection.aggregate.return_value = iter([{"_id": "s3"}, {"_id": "s2"}])
+
+    total, results = repository.search_by_order_number(
+        "OC", count_policy="skip", search_before="token", exact=False
+    )
+
+    assert (total, results) == (None, [{"_id": "s2"}, {"_id": "s3"}])
+    pipeline = collection.aggregate.call_args.kwargs["pipeline"]
+    assert pipeline[0]["$search"]["searchBefore"] == "token"
+
+
+def test_empty_search_page_counts_with_search_meta(mocker, repository, collection):
+    page = mocker.MagicMock()
+    page.next.return_value = {"results": [], "meta": []}
+    collection.aggregate.side_effect = [page, iter([{"count": {"total": 4}}])]
+
+    total, results = repository.search_by_order_number(
+        "OC", page=3, limit=2, count_policy="exact", exact=False
+    )
+
+    assert (total, results) == (4, [])
+    (meta_stage,) = collection.aggregate.call_args.kwargs["pipeline"]
+    assert meta_stage["$searchMeta"]["count"] == {"type": "total"}
+    assert "searchBefore" not in meta_stage["$searchMeta"]
+    assert "$search" in collection.aggregate.call_args_list[0].kwargs["pipeline"][0]
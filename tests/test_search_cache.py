@@ -0,0 +1,52 @@
+import asyncio
+
+from pharmagob.mongodb_repositories._search_cache import SearchSessionCache
+
+
+def test_follower_retries_when_the_leader_is_cancelled():
+    async def scenario():
+        cache = SearchSessionCache()
+        calls = []
+        release = asyncio.Event()
+
+        async def loader():
+            calls.append(len(calls))
+            await release.wait()
+            return [len(calls)]
+
+        leader = asyncio.ensure_future(cache.aload("key", loader))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.aload("key", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return calls, await follower, leader.cancelled()
+
+    calls, result, cancelled = asyncio.run(scenario())
+
+    assert cancelled
+    assert calls == [0, 1]
+    assert result == [2]
+
+
+def test_followers_share_the_result_of_the_leader():
+    async def scenario():
+        cache = SearchSessionCache()
+        calls = []
+
+        async def loader():
+            calls.append(None)
+            await asyncio.sleep(0)
+            return [{"_id": 1}]
+
+        results = await asyncio.gather(
+            cache.aload("key", loader), cache.aload("key", loader)
+        )
+        return calls, results, cache.shared
+
+    calls, results, shared = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert results == [[{"_id": 1}], [{"_id": 1}]]
+    assert shared == 1
@@ -0,0 +1,182 @@
+import pytest
+from pymongo import UpdateOne
+
+from pharmagob.mongodb_repositories._stock_totals import (
+    TotalsBatch,
+    checkpoint_update,
+    rebuild_pipeline,
+    recompute_operations,
+)
+from pharmagob.mongodb_repositories.stock_totals import StockTotalsRepository
+
+KEY = {"umu_id": "u1", "item_id": "i1"}
+
+
+def _content(quantity, umu_id="u1", item_id="i1", description=None):
+    item = {"id": item_id}
+    if description is not None:
+        item["short_description"] = description
+    return {"umu_id": umu_id, "item": item, "quantity": quantity}
+
+
+def _change(operation, before=None, after=None):
+    return {
+        "operationType": operation,
+        "fullDocumentBeforeChange": before,
+        "fullDocument": after,
+    }
+
+
+def test_batch_merges_the_deltas_of_one_total():
+    batch = TotalsBatch()
+    batch.add_change(_change("insert", after=_content(5, description="Paracetamol")))
+    batch.add_change(_change("update", before=_content(5), after=_content(3)))
+    batch.add_change(_change("delete", before=_content(1, item_id="i2")))
+
+    assert len(batch) == 3
+    assert batch.deltas == {("u1", "i1"): 3, ("u1", "i2"): -1}
+    assert batch.operations(10) == [
+        UpdateOne(
+            {"_id": KEY},
+            {
+                "$inc": {"total_quantity": 3},
+                "$set": {"updated_at": 10},
+                "$setOnInsert": {**KEY, "description": "Paracetamol"},
+            },
+            upsert=True,
+        ),
+        UpdateOne(
+            {"_id": {"umu_id": "u1", "item_id": "i2"}},
+            {
+                "$inc": {"total_quantity": -1},
+                "$set": {"updated_at": 10},
+                "$setOnInsert": {"umu_id": "u1", "item_id": "i2"},
+            },
+            upsert=True,
+        ),
+    ]
+
+
+def test_batch_moves_stock_between_totals():
+    batch = TotalsBatch()
+    batch.add_change(
+        _change("replace", before=_content(4), after=_content(4, umu_id="u2"))
+    )
+
+    assert batch.deltas == {("u1", "i1"): -4, ("u2", "i1"): 4}
+
+
+def test_batch_without_images_marks_the_totals_dirty():
+    batch = TotalsBatch()
+    batch.add_change(_change("update", after=_content(2)))
+    batch.add_change(_change("update", before=_content(2, item_id="i2")))
+    batch.add_change(_change("delete"))
+
+    assert batch.dirty == {("u1", "i1"), ("u1", "i2")}
+    assert batch.unresolved == 1
+    assert batch.operations(10) == []
+
+
+def test_batch_is_invalidated_by_a_drop():
+    batch = TotalsBatch()
+    batch.add_change(_change("drop"))
+
+    assert batch.invalidated
+
+
+def test_null_keys_are_kept_apart():
+    batch = TotalsBatch()
+    batch.add_change(_change("insert", after={"quantity": 2}))
+
+    assert batch.deltas == {(None, None): 2}
+    (operation,) = batch.operations(10)
+    assert operation == UpdateOne(
+        {"_id": {"umu_id": None, "item_id": None}},
+        {
+            "$inc": {"total_quantity": 2},
+            "$set": {"updated_at": 10},
+            "$setOnInsert": {"umu_id": None, "item_id": None},
+        },
+        upsert=True,
+    )
+
+
+def test_recompute_zeroes_the_totals_without_stock():
+    rows = [{**KEY, "total_quantity": 7, "description": "Paracetamol"}]
+
+    assert recompute_operations([("u1", "i1"), ("u1", "i2")], rows, 10) == [
+        UpdateOne(
+            {"_id": KEY},
+            {
+                "$set": {
+                    **KEY,
+                    "total_quantity": 7,
+                    "updated_at": 10,
+                    "description": "Paracetamol",
+                }
+            },
+            upsert=True,
+        ),
+        UpdateOne(
+            {"_id": {"umu_id": "u1", "item_id": "i2"}},
+            {
+                "$set": {
+                    "umu_id": "u1",
+                    "item_id": "i2",
+                    "total_quantity": 0,
+                    "updated_at": 10,
+                }
+            },
+            upsert=True,
+        ),
+    ]
+
+
+def test_checkpoint_update_records_what_could_not_be_applied():
+    assert checkpoint_update(
+        10, resume_token={"_data": "a"}, dirty=[("u1", "i1")], unresolved=2
+    ) == {
+        "$set": {"updated_at": 10, "resume_token": {"_data": "a"}},
+        "$addToSet": {"dirty": {"$each": [KEY]}},
+        "$inc": {"unresolved": 2},
+    }
+    assert checkpoint_update(10, watermark=5) == {
+        "$set": {"updated_at": 10, "watermark": 5}
+    }
+
+
+def test_rebuild_merges_on_the_id_of_the_total():
+    pipeline = rebuild_pipeline("pharmagob", "stock_totals", 10)
+
+    assert pipeline[1]["$group"]["_id"] == {
+        "umu_id": {"$ifNull": ["$umu_id", None]},
+        "item_id": {"$ifNull": ["$item.id", None]},
+    }
+    assert pipeline[-1]["$merge"]["on"] == "_id"
+    assert pipeline[-1]["$merge"]["into"] == {
+        "db": "pharmagob",
+        "coll": "stock_totals",
+    }
+
+
+@pytest.fixture
+def collection_name():
+    return "stock_totals"
+
+
+def test_rebuild_creates_the_key_index_first(mocker, db_manager, collection):
+    repository = StockTotalsRepository(db_manager, "stock_totals")
+    location_contents = mocker.MagicMock()
+    calls = mocker.MagicMock()
+    calls.attach_mock(collection.create_indexes, "create_indexes")
+    calls.attach_mock(location_contents._collection.aggregate, "aggregate")
+
+    repository.rebuild(location_contents, change_stream=False)
+
+    assert [name for name, _, _ in calls.mock_calls] == [
+        "create_indexes",
+        "aggregate",
+    ]
+    (model,) = collection.create_indexes.call_args.args[0]
+    assert model.document["key"] == {"umu_id": 1, "item_id": 1}
+    assert model.document["unique"]
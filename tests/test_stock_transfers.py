@@ -0,0 +1,156 @@
+import pytest
+from pymongo import UpdateOne
+
+from pharmagob.mongodb_repositories._stock_transfers import (
+    latest_events_pipeline,
+    with_transfer_id,
+)
+from pharmagob.mongodb_repositories.stock_transfer_events import (
+    StockTransferEventsRepository,
+)
+from pharmagob.mongodb_repositories.stock_transfers import StockTransfersRepository
+
+EVENT = {
+    "_id": "e2",
+    "stock_transfer_id": "t1",
+    "transition_timestamp": 20,
+    "status": "received",
+}
+
+
+@pytest.fixture
+def collection_name():
+    return "stock_transfer_events"
+
+
+@pytest.fixture
+def db(mocker, collection):
+    db = collection.database
+    others = {}
+    db.__getitem__.side_effect = lambda name: others.setdefault(
+        name, mocker.MagicMock(name=name)
+    )
+    return db
+
+
+@pytest.fixture
+def repository(db_manager, db):
+    return StockTransferEventsRepository(db_manager, "stock_transfer_events")
+
+
+def test_latest_events_pipeline_projects_inside_the_event():
+    assert latest_events_pipeline(["t1"], umu_id="u1", projection=["status"]) == [
+        {"$match": {"stock_transfer_id": {"$in": ["t1"]}, "umu_id": "u1"}},
+        {"$sort": {"stock_transfer_id": 1, "transition_timestamp": -1}},
+        {"$group": {"_id": "$stock_transfer_id", "event": {"$first": "$$ROOT"}}},
+        {"$project": {"event.status": 1}},
+    ]
+
+
+@pytest.mark.parametrize(
+    "projection, expected",
+    [
+        (None, None),
+        (["status"], ["status", "stock_transfer_id"]),
+        ({"status": 1, "_id": 0}, {"status": 1, "_id": 0, "stock_transfer_id": 1}),
+        # an exclusion projection keeps stock_transfer_id already
+        ({"notes": 0}, {"notes": 0}),
+    ],
+)
+def test_with_transfer_id(projection, expected):
+    assert with_transfer_id(projection) == expected
+
+
+def test_latest_events_follow_the_input_order(repository, collection):
+    collection.aggregate.return_value = iter(
+        [{"_id": "t2", "event": {"_id": "e9"}}, {"_id": "t1", "event": EVENT}]
+    )
+
+    events = repository.get_latest_by_stock_transfer_ids(["t1", "t3", "t2", "t1"])
+
+    assert events == [EVENT, None, {"_id": "e9"}, EVENT]
+    pipeline = collection.aggregate.call_args.args[0]
+    assert pipeline[0]["$match"] == {"stock_transfer_id": {"$in": ["t1", "t3", "t2"]}}
+
+
+def test_timelines_are_grouped_per_transfer(repository, collection):
+    collection.find.return_value = iter(
+        [
+            {"stock_transfer_id": "t2", "transition_timestamp": 5},
+            {"stock_transfer_id": "t1", "transition_timestamp": 10},
+            {"stock_transfer_id": "t1", "transition_timestamp": 20},
+        ]
+    )
+
+    timelines = repository.get_timelines(["t1", "t2", "t3"], projection=["status"])
+
+    assert list(timelines) == ["t1", "t2", "t3"]
+    assert [event["transition_timestamp"] for event in timelines["t1"]] == [10, 20]
+    assert timelines["t3"] == []
+    # oldest first walks the (stock_transfer_id, -transition_timestamp) index back
+    assert collection.find.call_args.kwargs["sort"] == [
+        ("stock_transfer_id", -1),
+        ("transition_timestamp", 1),
+    ]
+    assert collection.find.call_args.kwargs["projection"] == [
+        "status",
+        "stock_transfer_id",
+    ]
+
+
+def test_append_only_advances_an_older_last_event(mocker, repository, collection, db):
+    transfers = db[repository.TRANSFERS_COLLECTION]
+    transfers.update_one.return_value = mocker.MagicMock(modified_count=0)
+
+    assert repository.append(EVENT) is False
+
+    collection.insert_one.assert_called_once()
+    assert transfers.update_one.call_args.args == (
+        {"_id": "t1", "last_event_timestamp": {"$not": {"$gte": 20}}},
+        {
+            "$set": {
+                "last_event": "received",
+                "last_event_timestamp": 20,
+                "last_event_id": "e2",
+            }
+        },
+    )
+
+
+def test_refresh_last_events_writes_the_newest_events(
+    mocker, db_manager, collection, db
+):
+    events = db[StockTransfersRepository.EVENTS_COLLECTION]
+    events.aggregate.return_value = iter([{"_id": "t1", "event": EVENT}])
+    collection.bulk_write.return_value = mocker.MagicMock(
+        inserted_count=0,
+        matched_count=1,
+        modified_count=1,
+        upserted_count=0,
+        deleted_count=0,
+    )
+    repository = StockTransfersRepository(db_manager, "stock_transfers")
+
+    assert repository.refresh_last_events(["t1", "t1"]) == 1
+
+    # only the fields of last_event leave the server
+    assert events.aggregate.call_args.args[0][-1] == {
+        "$project": {
+            "event._id": 1,
+            "event.stock_transfer_id": 1,
+            "event.transition_timestamp": 1,
+            "event.status": 1,
+        }
+    }
+    assert collection.bulk_write.call_args.args[0] == [
+        UpdateOne(
+            {"_id": "t1", "last_event_timestamp": {"$not": {"$gte": 20}}},
+            {
+                "$set": {
+                    "last_event": "received",
+                    "last_event_timestamp": 20,
+                    "last_event_id": "e2",
+                }
+            },
+        )
+    ]
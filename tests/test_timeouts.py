@@ -0,0 +1,31 @@
+import pytest
+from pymongo.errors import ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError
+
+from pharmagob.mongodb_repositories._timeouts import is_timeout, write_timeout
+
+
+def test_max_time_ms_expiration_is_a_timeout():
+    assert is_timeout(ExecutionTimeout("operation exceeded time limit", code=50))
+
+
+@pytest.mark.parametrize(
+    "error", [ServerSelectionTimeoutError("no primary"), NetworkTimeout("timed out")]
+)
+def test_connection_timeouts_outside_a_budget_are_not(error):
+    assert not is_timeout(error)
+
+
+def test_client_side_timeouts_of_a_write_budget_are():
+    with pytest.raises(NetworkTimeout) as info:
+        with write_timeout(100):
+            raise NetworkTimeout("timed out")
+
+    assert is_timeout(info.value)
+
+
+def test_write_without_budget_leaves_timeouts_alone():
+    with pytest.raises(ServerSelectionTimeoutError) as info:
+        with write_timeout(None):
+            raise ServerSelectionTimeoutError("no primary")
+
+    assert not is_timeout(info.value)
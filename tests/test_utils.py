@@ -0,0 +1,15 @@
+import pytest
+
+from pharmagob.mongodb_repositories._utils import convert_conditions_to_mongo
+
+
+def test_not_group_negates_its_conditions():
+    assert convert_conditions_to_mongo([("not", [("status", "=", "closed")])]) == {
+        "$nor": [{"status": {"$eq": "closed"}}]
+    }
+
+
+@pytest.mark.parametrize("group", ["and", "or", "not"])
+def test_empty_group_is_rejected(group):
+    with pytest.raises(ValueError, match="group is empty"):
+        convert_conditions_to_mongo([(group, [])])